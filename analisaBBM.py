@@ -0,0 +1,790 @@
+import pandas as pd
+import numpy as np
+import re
+import hashlib
+
+# ==============================================================================
+# 1. FUNGSI UTILITAS
+# ==============================================================================
+def clean_unit_name(name):
+    if pd.isna(name): return ""
+    name = str(name).upper().strip()
+    name = name.replace("FORKLIFT", "FORKLIF")
+    return re.sub(r'[^A-Z0-9]', '', name)
+
+def hash_file_bytes(file_obj, chunk_size=1 << 20):
+    # Sidik jari isi file (bukan nama/objeknya), dibaca per potongan lalu posisi baca dikembalikan
+    h = hashlib.sha256()
+    pos = file_obj.tell()
+    file_obj.seek(0)
+    for chunk in iter(lambda: file_obj.read(chunk_size), b''): h.update(chunk)
+    file_obj.seek(pos)
+    return h.hexdigest()
+
+# ==============================================================================
+# 2. PEMROSESAN DATA MENTAH (MASTER + TRANSAKSI BBM)
+# ==============================================================================
+# Tahap proses yang dilaporkan ke callback progress(stage, fraction, stats):
+# fraction = perkiraan porsi pekerjaan selesai (0-1), stats = jumlah sheet/kolom/baris yang sudah diproses
+PROSES_TAHAP = ['read', 'match', 'pivot', 'benchmark', 'trend']
+
+def process_raw_data(file_master, file_bbm, progress=None):
+    master_data_map = {} 
+    master_keys_set = set()
+    stats = {'sheets_parsed': 0, 'sheets_total': 0, 'columns_matched': 0, 'rows_produced': 0}
+    def lapor(stage, fraction):
+        if progress is not None: progress(stage, fraction, dict(stats))
+
+    # --- A. BACA MASTER DATA ---
+    lapor('read', 0.0)
+    df_map = pd.read_excel(file_master, sheet_name='Sheet2', header=1)
+    
+    col_name = next((c for c in df_map.columns if 'NAMA' in str(c).upper()), None)
+    col_jenis = next((c for c in df_map.columns if 'ALAT' in str(c).upper() and 'BERAT' in str(c).upper() and c != col_name), None)
+    col_type = next((c for c in df_map.columns if 'TYPE' in str(c).upper() or 'MERK' in str(c).upper()), None)
+    col_hp = next((c for c in df_map.columns if any(k == str(c).upper() for k in ['HP', 'HORSE POWER'])), None)
+    col_cap = next((c for c in df_map.columns if any(k in str(c).upper() for k in ['CAP', 'KAPASITAS'])), None)
+    col_loc = 'DES 2025' if 'DES 2025' in df_map.columns else df_map.columns[2]
+
+    rename_dict = {
+        col_name: 'Unit_Original', 
+        col_jenis: 'Jenis_Alat', 
+        col_hp: 'Horse_Power', 
+        col_cap: 'Capacity_Raw', 
+        col_loc: 'Lokasi'
+    }
+    if col_type:
+        rename_dict[col_type] = 'Type_Merk'
+
+    df_map.rename(columns=rename_dict, inplace=True)
+    
+    if 'Type_Merk' not in df_map.columns:
+        df_map['Type_Merk'] = "-"
+
+    df_map.dropna(subset=['Unit_Original'], inplace=True)
+    df_map['Unit_ID'] = df_map['Unit_Original'].apply(clean_unit_name)
+    df_map = df_map[~df_map['Unit_Original'].astype(str).str.upper().str.contains('DUMMY', na=False)]
+    df_map = df_map[~df_map['Unit_Original'].astype(str).str.upper().str.contains('FALCON', na=False)]
+    df_map['Horse_Power'] = pd.to_numeric(df_map['Horse_Power'], errors='coerce').fillna(0)
+
+    for _, row in df_map.iterrows():
+        clean_id = row['Unit_ID']
+        if clean_id:
+            u_name = str(row['Unit_Original']).strip().upper()
+            cap_val = 0
+            
+            if clean_id == clean_unit_name("L 9025 US"):
+                cap_val = 40
+            else:
+                try:
+                    raw_cap = str(row['Capacity_Raw'])
+                    match = re.search(r"(\d+(\.\d+)?)", raw_cap)
+                    if match:
+                        val_float = float(match.group(1))
+                        cap_val = int(val_float + 0.5)
+                except: pass
+                
+                if cap_val == 0:
+                    try:
+                        match_name = re.search(r"(\d+(\.\d+)?)\s*(T|TON|K)", u_name)
+                        if match_name:
+                            val_float = float(match_name.group(1))
+                            cap_val = int(val_float + 0.5)
+                    except: pass
+
+            # Fix Typo Type/Merk secara spesifik
+            t_merk = str(row['Type_Merk']).strip().upper()
+            
+            # Ganti MITSUBHISI (Typo H) menjadi MITSUBISHI
+            t_merk = t_merk.replace("MITSUBHISI", "MITSUBISHI")
+            
+            # Ganti ITSUBISHI (Kurang M) menjadi MITSUBISHI
+            if t_merk == "ITSUBISHI":
+                t_merk = "MITSUBISHI"
+            elif t_merk.startswith("ITSUBISHI "):
+                t_merk = "MITSUBISHI " + t_merk[10:]
+            elif " ITSUBISHI" in t_merk:
+                t_merk = t_merk.replace(" ITSUBISHI", " MITSUBISHI")
+
+            master_data_map[clean_id] = {
+                'Unit_Name': row['Unit_Original'],
+                'Jenis_Alat': row['Jenis_Alat'],
+                'Type_Merk': t_merk,
+                'Horse_Power': row['Horse_Power'], 
+                'Capacity': cap_val,
+                'Lokasi': row['Lokasi']
+            }
+            master_keys_set.add(clean_id)
+
+    # --- B. BACA DATA TRANSAKSI BBM MENTAH ---
+    raw_data_list = []
+    xls = pd.ExcelFile(file_bbm)
+    target_sheets = ['JAN', 'FEB', 'MAR', 'APR', 'MEI', 'JUN', 'JUL', 'AGT', 'SEP', 'OKT', 'NOV', 'DES']
+    stats['sheets_total'] = sum(sheet in xls.sheet_names for sheet in target_sheets)
+    lapor('read', 0.05)
+    
+    for sheet in target_sheets:
+        if sheet in xls.sheet_names:
+            # Porsi 5%-75% dibagi rata per sheet: ±15% untuk membaca sheet, sisanya mencocokkan kolom unit
+            sheet_start = 0.05 + 0.70 * stats['sheets_parsed'] / stats['sheets_total']
+            lapor('read', sheet_start)
+            df = pd.read_excel(xls, sheet_name=sheet, header=None)
+            lapor('match', sheet_start + 0.15 * 0.70 / stats['sheets_total'])
+            unit_names_row = df.iloc[0].ffill()
+            headers = df.iloc[2]
+            dates = df.iloc[3:, 0]
+            
+            for col in range(1, df.shape[1]):
+                header_str = str(headers[col]).strip().upper()
+                if header_str in ['HM', 'LITER', 'KELUAR', 'PEMAKAIAN']:
+                    raw_unit_name = str(unit_names_row[col]).strip().upper()
+                    if raw_unit_name == "" or "UNNAMED" in raw_unit_name or "TOTAL" in raw_unit_name: continue
+                    if raw_unit_name.startswith(('GENSET', 'KOMPRESSOR', 'MESIN', 'TANGKI', 'SPBU', 'MOBIL')): continue
+                    
+                    clean_trx_id = clean_unit_name(raw_unit_name)
+                    matched_id = None
+                    
+                    # Manual Mapping
+                    if "FL RENTAL 01" in raw_unit_name and "TIMIKA" not in raw_unit_name:
+                        matched_id = clean_unit_name("FL RENTAL 01 TIMIKA") if clean_unit_name("FL RENTAL 01 TIMIKA") in master_data_map else None
+                    elif "TOBATI" in raw_unit_name and "KALMAR 32T" in raw_unit_name:
+                        matched_id = clean_unit_name("TOP LOADER KALMAR 35T/TOBATI") if clean_unit_name("TOP LOADER KALMAR 35T/TOBATI") in master_data_map else None
+                    elif "L 8477 UUC" in raw_unit_name:
+                        matched_id = clean_unit_name("L 9902 UR / S75") if clean_unit_name("L 9902 UR / S75") in master_data_map else None
+                    elif "L 9054 UT" in raw_unit_name:
+                        matched_id = clean_unit_name("L 9054 UT") if clean_unit_name("L 9054 UT") in master_data_map else None
+                    
+                    # Auto Mapping
+                    if not matched_id and clean_trx_id in master_data_map: matched_id = clean_trx_id
+                    if not matched_id and "EX." in raw_unit_name:
+                        try:
+                            clean_after = clean_unit_name(raw_unit_name.split("EX.")[-1].replace(")", "").strip())
+                            if clean_after in master_data_map: matched_id = clean_after
+                            elif clean_after:
+                                for k in master_keys_set:
+                                    if clean_after in k: matched_id = k; break
+                        except: pass
+                    if not matched_id and " (" in raw_unit_name:
+                        try:
+                            clean_before = clean_unit_name(raw_unit_name.split(" (")[0].strip())
+                            if clean_before in master_data_map: matched_id = clean_before
+                        except: pass
+
+                    # Ekstrak Data
+                    if matched_id:
+                        metric_type = 'HM' if header_str == 'HM' else 'LITER'
+                        vals = pd.to_numeric(df.iloc[3:, col], errors='coerce')
+                        info = master_data_map[matched_id]
+                        temp_df = pd.DataFrame({
+                            'Date': dates, 'Unit_Name': info['Unit_Name'], 
+                            'Jenis_Alat': info['Jenis_Alat'], 
+                            'Type_Merk': info['Type_Merk'],
+                            'Horse_Power': info['Horse_Power'],
+                            'Capacity': info['Capacity'], 'Lokasi': info['Lokasi'],
+                            'Metric': metric_type, 'Value': vals
+                        })
+                        temp_df.dropna(subset=['Value', 'Date'], inplace=True)
+                        stats['columns_matched'] += 1
+                        stats['rows_produced'] += len(temp_df)
+                        if not temp_df.empty: raw_data_list.append(temp_df)
+            stats['sheets_parsed'] += 1
+
+    # --- C. KALKULASI DELTA HM & PIVOT ---
+    lapor('pivot', 0.75)
+    if not raw_data_list: return None, None, None, None
+    df_all = pd.concat(raw_data_list, ignore_index=True)
+    df_all['Date'] = pd.to_datetime(df_all['Date'], dayfirst=True, errors='coerce')
+    df_all.dropna(subset=['Date'], inplace=True)
+    
+    # Simpan data mentah untuk Grafik Tren Bulanan
+    df_trend_raw = df_all.copy()
+
+    # Pivot Total
+    df_pivot = df_all.pivot_table(index=['Unit_Name', 'Lokasi', 'Jenis_Alat', 'Type_Merk', 'Horse_Power', 'Capacity', 'Date'], columns='Metric', values='Value', aggfunc='sum').reset_index()
+    if 'HM' not in df_pivot.columns: df_pivot['HM'] = 0
+    if 'LITER' not in df_pivot.columns: df_pivot['LITER'] = 0
+    df_pivot['HM'], df_pivot['LITER'] = df_pivot['HM'].fillna(0), df_pivot['LITER'].fillna(0)
+    df_pivot.sort_values(by=['Unit_Name', 'Date'], inplace=True)
+    
+    # Hitung Delta HM
+    df_pivot['HM_Clean'] = df_pivot['HM'].replace(0, np.nan).groupby(df_pivot['Unit_Name']).ffill().fillna(0)
+    df_pivot['Delta_HM'] = df_pivot.groupby('Unit_Name')['HM_Clean'].diff().fillna(0)
+    df_pivot.loc[(df_pivot['Delta_HM'] < 0) | (df_pivot['Delta_HM'] > 100), 'Delta_HM'] = 0 
+    
+    # --- D. DETEKSI ANOMALI PENGISIAN & BENCHMARK ---
+    lapor('benchmark', 0.85)
+    df_pivot = detect_refuel_anomalies(df_pivot)
+    df_active, df_inactive = compute_benchmark(df_pivot)
+
+    # --- E. GENERATE DATA TREN BULANAN ---
+    lapor('trend', 0.92)
+    df_trend_raw['Month_Year'] = df_trend_raw['Date'].dt.to_period('M').astype(str)
+    df_pivot_trend = df_trend_raw.pivot_table(index=['Unit_Name', 'Month_Year', 'Date'], columns='Metric', values='Value', aggfunc='sum').reset_index()
+    if 'HM' not in df_pivot_trend.columns: df_pivot_trend['HM'] = 0
+    if 'LITER' not in df_pivot_trend.columns: df_pivot_trend['LITER'] = 0
+    df_pivot_trend.sort_values(by=['Unit_Name', 'Date'], inplace=True)
+    
+    df_pivot_trend['HM_Clean'] = df_pivot_trend['HM'].replace(0, np.nan).groupby(df_pivot_trend['Unit_Name']).ffill().fillna(0)
+    df_pivot_trend['Delta_HM'] = df_pivot_trend.groupby('Unit_Name')['HM_Clean'].diff().fillna(0)
+    df_pivot_trend.loc[(df_pivot_trend['Delta_HM'] < 0) | (df_pivot_trend['Delta_HM'] > 100), 'Delta_HM'] = 0 
+    
+    trend_monthly = df_pivot_trend.groupby(['Unit_Name', 'Month_Year']).agg({'LITER': 'sum', 'Delta_HM': 'sum'}).reset_index()
+    trend_monthly['Fuel_Ratio'] = trend_monthly.apply(lambda r: r['LITER'] / r['Delta_HM'] if r['Delta_HM'] > 0 else 0, axis=1)
+    trend_monthly.rename(columns={'Month_Year': 'Bulan'}, inplace=True)
+    lapor('trend', 1.0)
+
+    return df_active, df_inactive, trend_monthly, df_pivot.reset_index(drop=True).rename_axis(columns=None)
+
+
+# ==============================================================================
+# 3. DETEKSI ANOMALI PENGISIAN BBM HARIAN
+# ==============================================================================
+# Setiap pengisian (LITER > 0) per unit per hari dibandingkan dengan distribusi
+# pengisian unit itu sendiri memakai Median & MAD (robust z-score), sehingga satu
+# pengisian ekstrem (mis. 2.000 L pada forklift) tidak ikut menggeser acuannya.
+ANOMALI_Z_THRESHOLD = 3.5
+ANOMALI_MIN_PENGISIAN = 5
+
+# Versi logika pipeline; naikkan bila aturan pemrosesan berubah agar hasil cache lama tidak terpakai
+PIPELINE_VERSION = 1
+CONFIG_VERSION = (PIPELINE_VERSION, ANOMALI_Z_THRESHOLD, ANOMALI_MIN_PENGISIAN)
+
+def detect_refuel_anomalies(df_daily, threshold=ANOMALI_Z_THRESHOLD, min_refuel=ANOMALI_MIN_PENGISIAN):
+    df_daily = df_daily.copy()
+    liter = df_daily['LITER'].where(df_daily['LITER'] > 0)
+    grp = liter.groupby(df_daily['Unit_Name'])
+
+    median = grp.transform('median')
+    mad = (liter - median).abs().groupby(df_daily['Unit_Name']).transform('median')
+    n_refuel = grp.transform('count')
+
+    # MAD = 0 (pengisian selalu sama) -> pakai Mean Absolute Deviation sebagai cadangan
+    mean_ad = (liter - median).abs().groupby(df_daily['Unit_Name']).transform('mean')
+    score = np.where(mad > 0, 0.6745 * (liter - median) / mad,
+                     np.where(mean_ad > 0, (liter - median) / (1.253314 * mean_ad), 0.0))
+    score = pd.Series(score, index=df_daily.index).where(liter.notna() & (n_refuel >= min_refuel), 0.0)
+
+    df_daily['Liter_Median_Unit'] = median.fillna(0).round(2)
+    df_daily['Anomali_Score'] = score.fillna(0).round(2)
+    df_daily['Is_Anomali'] = df_daily['Anomali_Score'] > threshold
+    return df_daily
+
+# ==============================================================================
+# 4. BENCHMARK & STATUS EFISIENSI
+# ==============================================================================
+UNIT_COLS = ['Unit_Name', 'Lokasi', 'Jenis_Alat', 'Type_Merk', 'Horse_Power', 'Capacity']
+
+def compute_benchmark(df_daily, exclude_anomali=False):
+    df_calc = df_daily
+    if exclude_anomali and 'Is_Anomali' in df_daily.columns:
+        # Jam kerja tetap dihitung, hanya liter dari pengisian anomali yang dikeluarkan
+        df_calc = df_daily.assign(LITER=df_daily['LITER'].where(~df_daily['Is_Anomali'], 0))
+
+    agg_map = {'LITER': 'sum', 'Delta_HM': 'sum'}
+    if 'Is_Anomali' in df_calc.columns: agg_map['Is_Anomali'] = 'sum'
+    final_stats = df_calc.groupby(UNIT_COLS).agg(agg_map).reset_index()
+    final_stats.rename(columns={'LITER': 'Total_Liter', 'Delta_HM': 'Total_HM_Work', 'Is_Anomali': 'Jumlah_Anomali'}, inplace=True)
+    return benchmark_from_totals(final_stats)
+
+def benchmark_from_totals(final_stats):
+    final_stats = final_stats.copy()
+    final_stats['Fuel_Ratio'] = np.where(final_stats['Total_HM_Work'] > 0, final_stats['Total_Liter'] / final_stats['Total_HM_Work'].where(final_stats['Total_HM_Work'] > 0), 0)
+
+    df_valid = final_stats[(final_stats['Total_HM_Work'] > 0) & (final_stats['Total_Liter'] > 0)].copy()
+    benchmark_stats = df_valid.groupby('Horse_Power')['Fuel_Ratio'].median().reset_index()
+    benchmark_stats.rename(columns={'Fuel_Ratio': 'Group_Benchmark_Median'}, inplace=True)
+
+    df_final = pd.merge(final_stats, benchmark_stats, on='Horse_Power', how='left')
+
+    inaktif_mask = (df_final['Total_HM_Work'] <= 0) | (df_final['Total_Liter'] <= 0)
+    df_final['Performance_Status'] = np.where(inaktif_mask, "INAKTIF",
+                                              np.where(df_final['Fuel_Ratio'] <= df_final['Group_Benchmark_Median'], "EFISIEN", "BOROS"))
+    df_final['Potensi_Pemborosan_Liter'] = 0.0
+    boros_mask = df_final['Performance_Status'] == "BOROS"
+    df_final.loc[boros_mask, 'Potensi_Pemborosan_Liter'] = ((df_final.loc[boros_mask, 'Fuel_Ratio'] - df_final.loc[boros_mask, 'Group_Benchmark_Median']) * df_final.loc[boros_mask, 'Total_HM_Work'])
+
+    df_final['Fuel_Ratio'] = df_final['Fuel_Ratio'].round(2)
+    df_final['Group_Benchmark_Median'] = df_final['Group_Benchmark_Median'].round(2)
+    df_final['Potensi_Pemborosan_Liter'] = df_final['Potensi_Pemborosan_Liter'].round(2)
+
+    df_active = df_final[df_final['Performance_Status'] != "INAKTIF"].copy()
+    df_inactive = df_final[df_final['Performance_Status'] == "INAKTIF"].copy()
+    return df_active, df_inactive
+
+# ==============================================================================
+# 5. FUEL RATIO FILL-TO-FILL (INTERVAL ANTAR PENGISIAN)
+# ==============================================================================
+# Pengisian tidak terjadi setiap hari, sehingga LITER dan Delta_HM harian tidak
+# sejajar. Liter pada pengisian ke-k dianggap mengganti BBM yang terpakai selama
+# jam kerja sejak pengisian ke-(k-1). Interval sebelum pengisian pertama dan
+# sesudah pengisian terakhir tidak lengkap sehingga tidak dihitung.
+def compute_fill_to_fill(df_daily):
+    df_seg = df_daily[['Unit_Name', 'Date', 'LITER', 'Delta_HM']].sort_values(['Unit_Name', 'Date'], kind='stable')
+    is_fill = (df_seg['LITER'] > 0).astype(np.int64)
+    unit_code = pd.factorize(df_seg['Unit_Name'])[0]
+
+    # Nomor interval: jumlah pengisian sebelum hari tsb, hari pengisian menutup intervalnya
+    fill_cum = is_fill.groupby(unit_code).cumsum().to_numpy()
+    seg_id = fill_cum - is_fill.to_numpy()
+
+    df_seg = df_seg.assign(Interval_Ke=seg_id, Is_Fill=is_fill.to_numpy())
+    df_seg = df_seg[df_seg['Interval_Ke'] > 0]
+
+    df_interval = df_seg.groupby(['Unit_Name', 'Interval_Ke'], sort=False).agg(
+        Tanggal_Mulai=('Date', 'min'), Tanggal_Isi=('Date', 'max'),
+        Liter=('LITER', 'sum'), Jam_Kerja=('Delta_HM', 'sum'), Jumlah_Isi=('Is_Fill', 'sum'), Jumlah_Hari=('Date', 'size')
+    ).reset_index()
+    df_interval = df_interval[df_interval['Jumlah_Isi'] > 0].drop(columns='Jumlah_Isi')
+    df_interval['Fuel_Ratio'] = (df_interval['Liter'] / df_interval['Jam_Kerja'].where(df_interval['Jam_Kerja'] > 0)).round(2)
+
+    valid = df_interval[df_interval['Fuel_Ratio'].notna()]
+    grp = valid.groupby('Unit_Name')['Fuel_Ratio']
+    df_f2f = pd.DataFrame({
+        'Jumlah_Interval': df_interval.groupby('Unit_Name').size(),
+        'Interval_Tanpa_Jam_Kerja': df_interval['Fuel_Ratio'].isna().groupby(df_interval['Unit_Name']).sum(),
+        'F2F_Total_Liter': valid.groupby('Unit_Name')['Liter'].sum(),
+        'F2F_Total_Jam_Kerja': valid.groupby('Unit_Name')['Jam_Kerja'].sum(),
+        'F2F_Ratio_Median': grp.median(),
+        'F2F_Ratio_P25': grp.quantile(0.25),
+        'F2F_Ratio_P75': grp.quantile(0.75),
+        'F2F_Ratio_Std': grp.std(),
+    })
+    df_f2f['F2F_Ratio_Tertimbang'] = df_f2f['F2F_Total_Liter'] / df_f2f['F2F_Total_Jam_Kerja'].where(df_f2f['F2F_Total_Jam_Kerja'] > 0)
+    df_f2f['F2F_Ratio_CV'] = df_f2f['F2F_Ratio_Std'] / df_f2f['F2F_Ratio_Tertimbang']
+    df_f2f = df_f2f.fillna({'Jumlah_Interval': 0, 'Interval_Tanpa_Jam_Kerja': 0, 'F2F_Total_Liter': 0, 'F2F_Total_Jam_Kerja': 0})
+    df_f2f = df_f2f.round(2).rename_axis('Unit_Name').reset_index()
+    return df_interval.reset_index(drop=True), df_f2f
+
+# ==============================================================================
+# 6. DETEKSI PENGISIAN TANPA JAM KERJA & JAM KERJA TANPA PENGISIAN
+# ==============================================================================
+# - Isi Tanpa Jam Kerja : LITER > 0 tetapi Delta_HM == 0 (indikasi kebocoran / HM tidak dicatat)
+# - Kerja Tanpa Isi     : rangkaian hari berturut-turut dengan HM bertambah tanpa pengisian
+IDLE_MIN_HARI_TANPA_ISI = 10
+
+def detect_idle_fuel(df_daily, min_hari_tanpa_isi=IDLE_MIN_HARI_TANPA_ISI):
+    df_det = df_daily[['Unit_Name', 'Lokasi', 'Jenis_Alat', 'Date', 'LITER', 'Delta_HM']].sort_values(['Unit_Name', 'Date'], kind='stable').reset_index(drop=True)
+    unit_baru = (df_det['Unit_Name'] != df_det['Unit_Name'].shift()).to_numpy()
+
+    # Hari pertama setiap unit selalu Delta_HM = 0 (tidak ada pembacaan sebelumnya), jadi dilewati
+    isi_tanpa_jam = (df_det['LITER'] > 0) & (df_det['Delta_HM'] == 0) & ~unit_baru
+    df_isi_tanpa_jam = df_det[isi_tanpa_jam].reset_index(drop=True)
+
+    kerja_tanpa_isi = ((df_det['Delta_HM'] > 0) & (df_det['LITER'] <= 0)).to_numpy()
+    run_id = np.cumsum(~kerja_tanpa_isi | unit_baru)
+    df_run = df_det[kerja_tanpa_isi].assign(Run_ID=run_id[kerja_tanpa_isi])
+    df_kerja_tanpa_isi = df_run.groupby('Run_ID').agg(
+        Unit_Name=('Unit_Name', 'first'), Lokasi=('Lokasi', 'first'), Jenis_Alat=('Jenis_Alat', 'first'),
+        Tanggal_Mulai=('Date', 'min'), Tanggal_Akhir=('Date', 'max'), Jumlah_Hari=('Date', 'size'), Jam_Kerja=('Delta_HM', 'sum')
+    )
+    df_kerja_tanpa_isi = df_kerja_tanpa_isi[df_kerja_tanpa_isi['Jumlah_Hari'] >= min_hari_tanpa_isi].reset_index(drop=True)
+
+    df_summary = pd.DataFrame({
+        'Hari_Isi_Tanpa_Jam_Kerja': df_isi_tanpa_jam.groupby('Unit_Name').size(),
+        'Liter_Isi_Tanpa_Jam_Kerja': df_isi_tanpa_jam.groupby('Unit_Name')['LITER'].sum(),
+        'Periode_Kerja_Tanpa_Isi': df_kerja_tanpa_isi.groupby('Unit_Name').size(),
+        'Hari_Kerja_Tanpa_Isi_Terpanjang': df_kerja_tanpa_isi.groupby('Unit_Name')['Jumlah_Hari'].max(),
+        'Jam_Kerja_Tanpa_Isi': df_kerja_tanpa_isi.groupby('Unit_Name')['Jam_Kerja'].sum(),
+    }).fillna(0).round(2).rename_axis('Unit_Name').reset_index()
+    df_summary = df_summary.merge(df_det.drop_duplicates('Unit_Name')[['Unit_Name', 'Lokasi', 'Jenis_Alat']], on='Unit_Name', how='left')
+    return df_summary, df_isi_tanpa_jam, df_kerja_tanpa_isi
+
+# ==============================================================================
+# 7. INDEX PREFIX-SUM PER UNIT (TOTAL RENTANG TANGGAL BEBAS)
+# ==============================================================================
+# Kumulatif LITER & Delta_HM per unit disimpan sekali setelah proses. Total untuk
+# rentang tanggal apa pun = cum[akhir] - cum[awal], cukup dua pencarian per unit
+# tanpa menghitung ulang seluruh pipeline.
+PREFIX_METRICS = ['LITER', 'LITER_Non_Anomali', 'Delta_HM', 'Is_Anomali']
+
+def build_prefix_index(df_daily):
+    df_idx = df_daily.copy()
+    df_idx['Is_Anomali'] = df_idx['Is_Anomali'].astype(np.int64) if 'Is_Anomali' in df_idx.columns else 0
+    df_idx['LITER_Non_Anomali'] = df_idx['LITER'].where(df_idx['Is_Anomali'] == 0, 0)
+
+    df_idx['Unit_Code'] = df_idx.groupby(UNIT_COLS, sort=True).ngroup()
+    df_idx.sort_values(['Unit_Code', 'Date'], kind='stable', inplace=True)
+
+    day = df_idx['Date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    code = df_idx['Unit_Code'].to_numpy(dtype=np.int64)
+    day_offset = day.min() if len(day) else 0
+    day_span = (day.max() - day_offset + 2) if len(day) else 1
+
+    cum = {}
+    for metric in PREFIX_METRICS:
+        # Diawali 0 agar total [lo, hi) = cum[hi] - cum[lo]
+        cum[metric] = np.concatenate([[0.0], np.cumsum(df_idx[metric].to_numpy(dtype=np.float64))])
+
+    return {
+        'units': df_idx.drop_duplicates('Unit_Code')[['Unit_Code'] + UNIT_COLS].set_index('Unit_Code').sort_index(),
+        'key': code * day_span + (day - day_offset),
+        'day_offset': day_offset,
+        'day_span': day_span,
+        'cum': cum,
+        'date_min': df_idx['Date'].min(),
+        'date_max': df_idx['Date'].max(),
+    }
+
+def query_range_totals(prefix_index, start_date, end_date):
+    units = prefix_index['units']
+    codes = units.index.to_numpy(dtype=np.int64)
+    start_day = np.datetime64(pd.Timestamp(start_date).date(), 'D').astype(np.int64) - prefix_index['day_offset']
+    end_day = np.datetime64(pd.Timestamp(end_date).date(), 'D').astype(np.int64) - prefix_index['day_offset']
+    start_day = np.clip(start_day, 0, prefix_index['day_span'] - 1)
+    end_day = np.clip(end_day, -1, prefix_index['day_span'] - 2)
+
+    lo = np.searchsorted(prefix_index['key'], codes * prefix_index['day_span'] + start_day, side='left')
+    hi = np.searchsorted(prefix_index['key'], codes * prefix_index['day_span'] + end_day, side='right')
+    # Rentang kosong / terbalik (awal > akhir) menghasilkan total 0, bukan selisih kumulatif negatif
+    hi = np.maximum(hi, lo)
+
+    df_totals = units.reset_index(drop=True)
+    for metric, cum in prefix_index['cum'].items():
+        df_totals[metric] = np.round(cum[hi] - cum[lo], 6)
+    df_totals['Jumlah_Hari_Data'] = hi - lo
+    return df_totals
+
+def compute_benchmark_range(prefix_index, start_date, end_date, exclude_anomali=False):
+    df_totals = query_range_totals(prefix_index, start_date, end_date)
+    final_stats = df_totals[UNIT_COLS].copy()
+    final_stats['Total_Liter'] = df_totals['LITER_Non_Anomali'] if exclude_anomali else df_totals['LITER']
+    final_stats['Total_HM_Work'] = df_totals['Delta_HM']
+    final_stats['Jumlah_Anomali'] = df_totals['Is_Anomali'].astype(np.int64)
+    return benchmark_from_totals(final_stats)
+
+# ==============================================================================
+# 8. PERBANDINGAN DUA PERIODE (DARI INDEX PREFIX-SUM)
+# ==============================================================================
+def compare_periods(prefix_index, periode_a, periode_b, exclude_anomali=False):
+    hasil = []
+    for periode in (periode_a, periode_b):
+        df_act, df_ina = compute_benchmark_range(prefix_index, periode[0], periode[1], exclude_anomali=exclude_anomali)
+        hasil.append(pd.concat([df_act, df_ina], ignore_index=True)[UNIT_COLS + ['Total_Liter', 'Total_HM_Work', 'Fuel_Ratio', 'Group_Benchmark_Median', 'Performance_Status', 'Potensi_Pemborosan_Liter']])
+
+    df_compare = hasil[0].merge(hasil[1], on=UNIT_COLS, how='outer', suffixes=('_A', '_B'))
+    df_compare['Delta_Fuel_Ratio'] = (df_compare['Fuel_Ratio_B'] - df_compare['Fuel_Ratio_A']).round(2)
+    df_compare['Delta_Pemborosan_Liter'] = (df_compare['Potensi_Pemborosan_Liter_B'] - df_compare['Potensi_Pemborosan_Liter_A']).round(2)
+    df_compare['Status_Berubah'] = df_compare['Performance_Status_A'] != df_compare['Performance_Status_B']
+    df_compare['Perubahan_Status'] = np.where(df_compare['Status_Berubah'], df_compare['Performance_Status_A'] + " → " + df_compare['Performance_Status_B'], "-")
+
+    # Delta Fuel Ratio hanya bermakna jika unit aktif di kedua periode
+    aktif_keduanya = (df_compare['Performance_Status_A'] != "INAKTIF") & (df_compare['Performance_Status_B'] != "INAKTIF")
+    df_compare.loc[~aktif_keduanya, 'Delta_Fuel_Ratio'] = np.nan
+    return df_compare
+
+# ==============================================================================
+# 9. INDEX BITMAP UNTUK FILTER BERTINGKAT SIDEBAR
+# ==============================================================================
+# Satu bitmap boolean per nilai untuk setiap dimensi filter, dibangun sekali per
+# hasil benchmark. Opsi filter & tampilan terfilter cukup dari operasi AND bitmap,
+# tanpa membuat salinan DataFrame di setiap tahap.
+TRUCKING_TYPES = ['TRONTON', 'TRAILER']
+KATEGORI_TRUCKING = "Trucking (Tronton & Trailer)"
+KATEGORI_NON_TRUCKING = "Alat Berat (Non-Trucking)"
+FILTER_DIMENSIONS = ['Kategori', 'Lokasi', 'Jenis_Alat', 'Type_Merk']
+
+def build_filter_index(df_units):
+    kategori = np.where(df_units['Jenis_Alat'].isin(TRUCKING_TYPES), KATEGORI_TRUCKING, KATEGORI_NON_TRUCKING)
+    dim_values = {'Kategori': kategori, 'Lokasi': df_units['Lokasi'], 'Jenis_Alat': df_units['Jenis_Alat'], 'Type_Merk': df_units['Type_Merk'].astype(str)}
+
+    filter_index = {'n': len(df_units), 'dims': {}}
+    for dim in FILTER_DIMENSIONS:
+        codes, uniques = pd.factorize(pd.Series(dim_values[dim]))
+        # Matriks nilai x unit: baris ke-i adalah bitmap unit dengan nilai uniques[i]
+        matrix = codes[np.newaxis, :] == np.arange(len(uniques))[:, np.newaxis]
+        filter_index['dims'][dim] = {'values': np.asarray(uniques, dtype=object), 'lookup': {v: i for i, v in enumerate(uniques)}, 'matrix': matrix}
+    return filter_index
+
+def filter_mask(filter_index, selections):
+    mask = np.ones(filter_index['n'], dtype=bool)
+    for dim, value in selections.items():
+        if value is None: continue
+        dim_index = filter_index['dims'][dim]
+        pos = dim_index['lookup'].get(value)
+        if pos is None: return np.zeros(filter_index['n'], dtype=bool)
+        mask &= dim_index['matrix'][pos]
+    return mask
+
+def filter_options(filter_index, dim, base_mask):
+    dim_index = filter_index['dims'][dim]
+    present = (dim_index['matrix'] & base_mask).any(axis=1)
+    return sorted(dim_index['values'][present].tolist(), key=str)
+
+# ==============================================================================
+# 10. INDEX PENCARIAN UNIT (N-GRAM NAMA + LOOKUP NUMERIK)
+# ==============================================================================
+# Nama unit dinormalisasi (huruf & angka saja) lalu dipecah menjadi n-gram 1-3
+# karakter. Kata kunci dicari dari irisan posting list n-gram, sehingga waktu
+# pencarian tidak bergantung pada jumlah unit. Horse Power & Kapasitas dicari
+# secara numerik (angka tepat atau rentang "a-b") dari array yang sudah terurut.
+SEARCH_NGRAM_MAX = 3
+SEARCH_NUMERIC_COLS = {'Horse Power': 'Horse_Power', 'Kapasitas': 'Capacity'}
+
+def build_search_index(df_units):
+    names = [clean_unit_name(n) for n in df_units['Unit_Name']]
+    postings = {}
+    for pos, name in enumerate(names):
+        for n in range(1, SEARCH_NGRAM_MAX + 1):
+            for i in range(len(name) - n + 1):
+                postings.setdefault(name[i:i + n], set()).add(pos)
+
+    numeric = {}
+    for col in SEARCH_NUMERIC_COLS.values():
+        values = pd.to_numeric(df_units[col], errors='coerce').to_numpy(dtype=np.float64)
+        order = np.argsort(values, kind='stable')
+        numeric[col] = {'order': order, 'sorted': values[order]}
+
+    fuel_ratio = pd.to_numeric(df_units['Fuel_Ratio'], errors='coerce').fillna(0).to_numpy()
+    return {
+        'names': np.array(names, dtype=object),
+        'postings': {gram: np.fromiter(sorted(pos_set), dtype=np.int64) for gram, pos_set in postings.items()},
+        'numeric': numeric,
+        'fuel_ratio': fuel_ratio,
+        'n': len(names),
+    }
+
+def parse_numeric_query(keyword):
+    match = re.fullmatch(r"\s*(\d+(?:[.,]\d+)?)\s*(?:-\s*(\d+(?:[.,]\d+)?)\s*)?", str(keyword))
+    if not match: return None
+    low = float(match.group(1).replace(',', '.'))
+    high = float(match.group(2).replace(',', '.')) if match.group(2) else low
+    return min(low, high), max(low, high)
+
+def search_units(search_index, category, keyword):
+    # Mengembalikan posisi baris hasil (sudah diranking), atau None jika kata kunci tidak valid
+    if category in SEARCH_NUMERIC_COLS:
+        bounds = parse_numeric_query(keyword)
+        if bounds is None: return None
+        num = search_index['numeric'][SEARCH_NUMERIC_COLS[category]]
+        lo = np.searchsorted(num['sorted'], bounds[0], side='left')
+        hi = np.searchsorted(num['sorted'], bounds[1], side='right')
+        positions = num['order'][lo:hi]
+        # Terdekat ke nilai tengah rentang, lalu Fuel Ratio tertinggi
+        distance = np.abs(num['sorted'][lo:hi] - (bounds[0] + bounds[1]) / 2)
+        return positions[np.lexsort((-search_index['fuel_ratio'][positions], distance))]
+
+    query = clean_unit_name(keyword)
+    if not query: return np.arange(0)
+    grams = [query[i:i + SEARCH_NGRAM_MAX] for i in range(max(len(query) - SEARCH_NGRAM_MAX, 0) + 1)]
+    candidates = None
+    for gram in sorted(set(grams), key=lambda g: len(search_index['postings'].get(g, ()))):
+        posting = search_index['postings'].get(gram)
+        if posting is None: return np.arange(0)
+        candidates = posting if candidates is None else np.intersect1d(candidates, posting, assume_unique=True)
+        if len(candidates) == 0: return candidates
+
+    names = search_index['names'][candidates]
+    if len(query) > SEARCH_NGRAM_MAX:
+        found = np.array([query in name for name in names], dtype=bool)
+        candidates, names = candidates[found], names[found]
+
+    # Ranking: nama persis > awalan nama > mengandung kata kunci, lalu Fuel Ratio tertinggi
+    tier = np.where(names == query, 0, np.where(np.array([name.startswith(query) for name in names], dtype=bool), 1, 2))
+    return candidates[np.lexsort((-search_index['fuel_ratio'][candidates], tier))]
+
+# ==============================================================================
+# 11. SERI TREN BULANAN PER UNIT (DIKELOMPOKKAN SEKALI)
+# ==============================================================================
+def group_trend_by_unit(trend_monthly):
+    trend_sorted = trend_monthly.sort_values(['Unit_Name', 'Bulan'], kind='stable')
+    units, starts = np.unique(trend_sorted['Unit_Name'].to_numpy(dtype=object), return_index=True)
+    bounds = np.append(starts, len(trend_sorted))
+    bulan = trend_sorted['Bulan'].to_numpy(dtype=object)
+    ratio = trend_sorted['Fuel_Ratio'].to_numpy(dtype=np.float64)
+    return {unit: {'Bulan': bulan[s:e], 'Fuel_Ratio': ratio[s:e]} for unit, s, e in zip(units, bounds[:-1], bounds[1:])}
+
+def slice_trend(trend_unit, bulan_awal=None, bulan_akhir=None):
+    lo = 0 if bulan_awal is None else np.searchsorted(trend_unit['Bulan'], bulan_awal, side='left')
+    hi = len(trend_unit['Bulan']) if bulan_akhir is None else np.searchsorted(trend_unit['Bulan'], bulan_akhir, side='right')
+    return trend_unit['Bulan'][lo:hi], trend_unit['Fuel_Ratio'][lo:hi]
+
+# ==============================================================================
+# 12. EXPORT HASIL ANALISA (EXCEL CONSTANT-MEMORY & PARQUET)
+# ==============================================================================
+# Excel ditulis baris demi baris dengan xlsxwriter mode constant_memory (data sheet langsung di-flush ke
+# file sementara), jadi hanya satu potongan baris yang dikonversi ke objek Python pada satu waktu.
+EXPORT_CHUNK_ROWS = 5000
+
+def trend_wide(trend_monthly, df_units, bulan_awal=None, bulan_akhir=None):
+    trend = trend_monthly[trend_monthly['Unit_Name'].isin(df_units['Unit_Name'])]
+    if bulan_awal is not None: trend = trend[trend['Bulan'].between(bulan_awal, bulan_akhir)]
+    df_wide = trend.pivot_table(index='Unit_Name', columns='Bulan', values='Fuel_Ratio', aggfunc='sum').rename_axis(columns=None)
+    return df_units[['Unit_Name', 'Jenis_Alat', 'Lokasi']].merge(df_wide.reset_index(), on='Unit_Name', how='inner')
+
+def write_excel_stream(sheets, file_obj, chunk_rows=EXPORT_CHUNK_ROWS):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(file_obj, {'constant_memory': True, 'nan_inf_to_errors': True, 'default_date_format': 'dd-mm-yyyy'})
+    header_fmt = workbook.add_format({'bold': True})
+    for sheet_name, df_sheet in sheets.items():
+        worksheet = workbook.add_worksheet(sheet_name[:31])
+        worksheet.write_row(0, 0, [str(c) for c in df_sheet.columns], header_fmt)
+        for start in range(0, len(df_sheet), chunk_rows):
+            chunk = df_sheet.iloc[start:start + chunk_rows]
+            values = chunk.astype(object).where(chunk.notna(), None).to_numpy(dtype=object)
+            for offset, row in enumerate(values):
+                worksheet.write_row(start + offset + 1, 0, row)
+    workbook.close()
+    return file_obj
+
+def write_parquet_zip(sheets, file_obj):
+    import zipfile
+
+    # Satu file .parquet per view; parquet sudah terkompresi sehingga ZIP cukup menyimpan (tanpa kompres ulang)
+    with zipfile.ZipFile(file_obj, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for sheet_name, df_sheet in sheets.items():
+            with zf.open(f"{sheet_name}.parquet", 'w') as entry:
+                df_sheet.to_parquet(entry, index=False)
+    return file_obj
+
+# ==============================================================================
+# 13. KUBUS BULANAN UNIT × BULAN (HEATMAP PEMBOROSAN)
+# ==============================================================================
+# Fakta harian diringkas sekali saat pemrosesan menjadi array padat [unit, bulan, metrik]; heatmap per
+# Lokasi/Jenis_Alat cukup memotong kubus (unit terfilter × rentang bulan) tanpa agregasi ulang data harian.
+CUBE_METRICS = ['LITER', 'LITER_Non_Anomali', 'Delta_HM']
+HEATMAP_METRIK_WASTE = "Potensi Pemborosan (Liter)"
+HEATMAP_METRIK_RATIO = "Fuel Ratio vs Benchmark (%)"
+
+def build_monthly_cube(df_daily):
+    is_anomali = df_daily['Is_Anomali'].to_numpy(dtype=bool) if 'Is_Anomali' in df_daily.columns else np.zeros(len(df_daily), dtype=bool)
+    unit_code = df_daily.groupby(UNIT_COLS, sort=True).ngroup().to_numpy(dtype=np.int64)
+    bulan_code, bulan = pd.factorize(df_daily['Date'].dt.to_period('M').astype(str), sort=True)
+    n_units, n_bulan = (unit_code.max() + 1 if len(unit_code) else 0), len(bulan)
+
+    liter = df_daily['LITER'].to_numpy(dtype=np.float64)
+    metric_values = {'LITER': liter, 'LITER_Non_Anomali': np.where(is_anomali, 0.0, liter), 'Delta_HM': df_daily['Delta_HM'].to_numpy(dtype=np.float64)}
+    flat = unit_code * n_bulan + bulan_code
+    values = np.stack([np.bincount(flat, weights=metric_values[m], minlength=n_units * n_bulan).reshape(n_units, n_bulan) for m in CUBE_METRICS], axis=-1)
+
+    units = df_daily[UNIT_COLS].assign(Unit_Code=unit_code).drop_duplicates('Unit_Code').set_index('Unit_Code').sort_index()
+    return {'units': units, 'bulan': np.asarray(bulan, dtype=object), 'values': values}
+
+def heatmap_from_cube(cube, df_units, dimensi='Lokasi', metrik=HEATMAP_METRIK_WASTE, exclude_anomali=False, bulan_awal=None, bulan_akhir=None):
+    # Posisi unit terfilter di kubus + benchmark grupnya (mengikuti benchmark yang sedang aktif di dashboard)
+    pos = cube['units'].reset_index().merge(df_units[UNIT_COLS + ['Group_Benchmark_Median']], on=UNIT_COLS, how='inner')
+    lo = 0 if bulan_awal is None else np.searchsorted(cube['bulan'], bulan_awal, side='left')
+    hi = len(cube['bulan']) if bulan_akhir is None else np.searchsorted(cube['bulan'], bulan_akhir, side='right')
+
+    sub = cube['values'][pos['Unit_Code'].to_numpy(dtype=np.int64), lo:hi]
+    liter = sub[..., CUBE_METRICS.index('LITER_Non_Anomali' if exclude_anomali else 'LITER')]
+    jam = sub[..., CUBE_METRICS.index('Delta_HM')]
+    liter_benchmark = pos['Group_Benchmark_Median'].fillna(0).to_numpy(dtype=np.float64)[:, None] * jam
+
+    group_code, groups = pd.factorize(pos[dimensi].astype(str), sort=True)
+    def per_grup(arr): return np.stack([np.bincount(group_code, weights=arr[:, j], minlength=len(groups)) for j in range(arr.shape[1])], axis=1) if arr.shape[1] else np.zeros((len(groups), 0))
+
+    if metrik == HEATMAP_METRIK_WASTE:
+        nilai = per_grup(np.where(jam > 0, np.clip(liter - liter_benchmark, 0, None), 0.0))
+    else:
+        total_liter, total_benchmark = per_grup(np.where(jam > 0, liter, 0.0)), per_grup(liter_benchmark)
+        nilai = np.where(total_benchmark > 0, (total_liter / np.where(total_benchmark > 0, total_benchmark, 1) - 1) * 100, np.nan)
+    return pd.DataFrame(nilai, index=pd.Index(groups, name=dimensi), columns=pd.Index(cube['bulan'][lo:hi], name='Bulan'))
+
+def cube_totals(cube, df_units, dimensi='Lokasi', metric='LITER', bulan_awal=None, bulan_akhir=None):
+    # Total satu metrik kubus per kelompok & bulan (format panjang) untuk unit yang sedang ditampilkan
+    pos = cube['units'].reset_index().merge(df_units[UNIT_COLS].drop_duplicates(), on=UNIT_COLS, how='inner')
+    lo = 0 if bulan_awal is None else np.searchsorted(cube['bulan'], bulan_awal, side='left')
+    hi = len(cube['bulan']) if bulan_akhir is None else np.searchsorted(cube['bulan'], bulan_akhir, side='right')
+
+    sub = cube['values'][pos['Unit_Code'].to_numpy(dtype=np.int64), lo:hi, CUBE_METRICS.index(metric)]
+    group_code, groups = pd.factorize(pos[dimensi].astype(str), sort=True)
+    total = np.zeros((len(groups), hi - lo))
+    np.add.at(total, group_code, sub)
+    df_total = pd.DataFrame(total, index=pd.Index(groups, name=dimensi), columns=pd.Index(cube['bulan'][lo:hi], name='Bulan'))
+    return df_total.stack().rename(metric).reset_index()
+
+# ==============================================================================
+# 14. TREN FUEL RATIO MEMBURUK (REGRESI LINEAR SEMUA UNIT SEKALIGUS)
+# ==============================================================================
+# Kemiringan Fuel Ratio bulanan tiap unit dihitung dari jumlahan (n, Σx, Σy, Σxx, Σxy, Σyy) per unit
+# dengan bincount, tanpa loop per unit. Bulan tanpa jam kerja (Fuel_Ratio 0) tidak ikut dihitung.
+# Signifikansi = t-statistik kemiringan dibanding nilai kritis t dua sisi 5% (tabel, tanpa scipy).
+TREN_MIN_BULAN = 4
+T_KRITIS_5PERSEN = np.array([np.inf, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+                             2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+                             2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042])
+
+def compute_trend_slopes(trend_monthly, bulan_awal=None, bulan_akhir=None, min_bulan=TREN_MIN_BULAN):
+    trend = trend_monthly[(trend_monthly['Delta_HM'] > 0) & (trend_monthly['Fuel_Ratio'] > 0)]
+    if bulan_awal is not None: trend = trend[trend['Bulan'].between(bulan_awal, bulan_akhir)]
+
+    unit_code, units = pd.factorize(trend['Unit_Name'], sort=True)
+    x = pd.PeriodIndex(trend['Bulan'], freq='M').asi8.astype(np.float64)
+    y = trend['Fuel_Ratio'].to_numpy(dtype=np.float64)
+    def per_unit(w): return np.bincount(unit_code, weights=w, minlength=len(units))
+
+    n = per_unit(np.ones_like(y))
+    sx, sy = per_unit(x), per_unit(y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sxx = per_unit(x * x) - sx * sx / n
+        sxy = per_unit(x * y) - sx * sy / n
+        syy = per_unit(y * y) - sy * sy / n
+        slope = np.where(sxx > 0, sxy / sxx, np.nan)
+        sse = np.clip(syy - slope * sxy, 0, None)
+        se = np.sqrt(sse / (n - 2) / sxx)
+        t_stat = np.where(se > 0, slope / se, np.sign(slope) * np.inf)
+        rata_rata = sy / n
+
+    df_f = (n - 2).astype(np.int64)
+    t_kritis = np.where(df_f < len(T_KRITIS_5PERSEN), T_KRITIS_5PERSEN[np.clip(df_f, 0, len(T_KRITIS_5PERSEN) - 1)], 1.96)
+    signifikan = np.abs(t_stat) > t_kritis
+
+    df_slope = pd.DataFrame({
+        'Unit_Name': units, 'Jumlah_Bulan': n.astype(np.int64), 'Fuel_Ratio_Rata_Rata': rata_rata,
+        'Slope_Per_Bulan': slope, 'Slope_Persen_Per_Bulan': slope / rata_rata * 100,
+        'T_Stat': t_stat, 'Signifikan': signifikan
+    })
+    df_slope = df_slope[df_slope['Jumlah_Bulan'] >= min_bulan].copy()
+    df_slope['Status_Tren'] = np.where(~df_slope['Signifikan'], "STABIL", np.where(df_slope['Slope_Per_Bulan'] > 0, "MEMBURUK", "MEMBAIK"))
+    return df_slope.sort_values('Slope_Persen_Per_Bulan', ascending=False).reset_index(drop=True)
+
+# ==============================================================================
+# 15. KELENGKAPAN DATA BULANAN (MATRIX UNIT × BULAN)
+# ==============================================================================
+# Keberadaan data tiap unit per bulan disimpan sekali sebagai matrix boolean [unit, bulan] yang mencakup
+# seluruh bulan dari bulan pertama s/d terakhir (bulan tanpa data sama sekali tetap menjadi kolom). Ringkasan
+# per unit (bitmask bulan hilang, celah terpanjang, status) dihitung dari potongan kolom matrix tersebut.
+STATUS_LENGKAP = "LENGKAP"
+STATUS_TIDAK_LENGKAP = "TIDAK LENGKAP"
+STATUS_TIDAK_ADA_DATA = "TIDAK ADA DATA"
+
+def build_coverage_matrix(units, dates, bulan_awal=None, bulan_akhir=None):
+    periode = pd.Series(dates).dt.to_period('M')
+    bulan_awal = pd.Period(bulan_awal, freq='M') if bulan_awal is not None else periode.min()
+    bulan_akhir = pd.Period(bulan_akhir, freq='M') if bulan_akhir is not None else periode.max()
+    bulan = pd.period_range(bulan_awal, bulan_akhir, freq='M') if pd.notna(bulan_awal) else pd.PeriodIndex([], freq='M')
+
+    unit_code, unit_index = pd.factorize(pd.Series(units).astype(str), sort=True)
+    # Nomor bulan relatif terhadap bulan pertama rentang (NaT & bulan di luar rentang diabaikan)
+    bulan_code = pd.PeriodIndex(periode).asi8 - (bulan[0].ordinal if len(bulan) else 0)
+    dalam = periode.notna().to_numpy() & (bulan_code >= 0) & (bulan_code < len(bulan))
+
+    ada = np.zeros((len(unit_index), len(bulan)), dtype=bool)
+    ada[unit_code[dalam], bulan_code[dalam]] = True
+    return {'units': pd.Index(unit_index, name='Unit_Name'), 'bulan': np.asarray(bulan.astype(str), dtype=object), 'ada': ada}
+
+def coverage_summary(coverage, bulan_awal=None, bulan_akhir=None):
+    lo = 0 if bulan_awal is None else np.searchsorted(coverage['bulan'], bulan_awal, side='left')
+    hi = len(coverage['bulan']) if bulan_akhir is None else np.searchsorted(coverage['bulan'], bulan_akhir, side='right')
+    bulan = coverage['bulan'][lo:hi]
+    hilang = ~coverage['ada'][:, lo:hi]
+    n_bulan = hilang.shape[1]
+
+    # Celah terpanjang: panjang rangkaian True berturut-turut = cumsum dikurangi cumsum pada bulan ada terakhir
+    cum = np.cumsum(hilang, axis=1)
+    celah = cum - np.maximum.accumulate(np.where(hilang, 0, cum), axis=1) if n_bulan else cum
+
+    # Bitmask bulan hilang: bit ke-i = bulan ke-i rentang (little-endian, panjang rentang bebas)
+    packed = np.packbits(hilang, axis=1, bitorder='little')
+    jumlah_hilang = hilang.sum(axis=1)
+
+    df_cov = pd.DataFrame({
+        'Jumlah_Bulan_Ada': n_bulan - jumlah_hilang,
+        'Jumlah_Bulan_Hilang': jumlah_hilang,
+        'Bulan_Hilang_Terpanjang': celah.max(axis=1) if n_bulan else np.zeros(len(hilang), dtype=np.int64),
+        'Mask_Bulan_Hilang': [int.from_bytes(row.tobytes(), 'little') for row in packed],
+        'Bulan_Yang_Hilang': pd.DataFrame(hilang, columns=bulan).dot(pd.Index(bulan, dtype=object) + ", ").str.rstrip(", ").to_numpy() if n_bulan else "",
+        'Status_Kelengkapan': np.select([jumlah_hilang == 0, jumlah_hilang == n_bulan], [STATUS_LENGKAP, STATUS_TIDAK_ADA_DATA], STATUS_TIDAK_LENGKAP),
+    }, index=coverage['units'])
+    return df_cov.reset_index()
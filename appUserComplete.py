@@ -4,9 +4,18 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import os
-import re
+import io
+import importlib.util
+import tempfile
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import warnings
 
+import analisaBBM as abbm
+import hmuCabang as hmu
+import summaryCabang as sc
+
 warnings.filterwarnings('ignore')
 
 # ==============================================================================
@@ -28,6 +37,25 @@ st.sidebar.caption("Program akan memproses data menjadi Laporan Benchmark dan La
 
 master_file = st.sidebar.file_uploader("1. Upload Master Data (cost & bbm 2022 sd 2025 HP & Type.xlsx)", type=['xlsx'])
 bbm_file = st.sidebar.file_uploader("2. Upload Transaksi BBM Mentah (BBM AAB.xlsx)", type=['xlsx'])
+hmu_files = st.sidebar.file_uploader("3. (Opsional) Upload Laporan HMU Cabang (Rpt HMU)", type=['xlsx', 'csv'], accept_multiple_files=True)
+container_file = st.sidebar.file_uploader("4. (Opsional) Upload Data Container Cabang (2025 data cabang alat berat.xlsx)", type=['xlsx'])
+
+# Hash isi file dihitung sekali saat file diterima (per file_id), bukan setiap kali fungsi cache dipanggil
+def hash_upload(uploaded):
+    memo = st.session_state.setdefault('upload_hash', {})
+    if uploaded.file_id not in memo:
+        if len(memo) >= 32: memo.clear()
+        memo[uploaded.file_id] = abbm.hash_file_bytes(uploaded)
+    return memo[uploaded.file_id]
+
+master_hash = hash_upload(master_file) if master_file else None
+bbm_hash = hash_upload(bbm_file) if bbm_file else None
+hmu_hashes = tuple(sorted(hash_upload(f) for f in hmu_files))
+container_hash = hash_upload(container_file) if container_file else None
+
+# Rekonsiliasi HM selalu dijalankan bila laporan HMU diupload; jam kerja HMU untuk Fuel Ratio bersifat opsional
+pakai_jam_hmu = st.sidebar.checkbox("Gunakan jam kerja laporan HMU untuk Fuel Ratio", value=False, disabled=not hmu_files,
+                                    help="Delta HM harian dihitung dari laporan HMU cabang; hari tanpa pembacaan HMU tetap memakai HM transaksi BBM")
 
 mulai_proses = st.sidebar.button("Mulai Proses Analisa", type="primary", use_container_width=True)
 
@@ -36,225 +64,119 @@ st.sidebar.markdown("---")
 # ==============================================================================
 # 3. FUNGSI PEMROSESAN DATA (GABUNGAN JUPYTER + STREAMLIT)
 # ==============================================================================
-def clean_unit_name(name):
-    if pd.isna(name): return ""
-    name = str(name).upper().strip()
-    name = name.replace("FORKLIFT", "FORKLIF")
-    return re.sub(r'[^A-Z0-9]', '', name)
-
-@st.cache_data(show_spinner=False)
-def process_raw_data(file_master, file_bbm):
-    master_data_map = {} 
-    master_keys_set = set()
-
-    # --- A. BACA MASTER DATA ---
-    df_map = pd.read_excel(file_master, sheet_name='Sheet2', header=1)
-    
-    col_name = next((c for c in df_map.columns if 'NAMA' in str(c).upper()), None)
-    col_jenis = next((c for c in df_map.columns if 'ALAT' in str(c).upper() and 'BERAT' in str(c).upper() and c != col_name), None)
-    col_type = next((c for c in df_map.columns if 'TYPE' in str(c).upper() or 'MERK' in str(c).upper()), None)
-    col_hp = next((c for c in df_map.columns if any(k == str(c).upper() for k in ['HP', 'HORSE POWER'])), None)
-    col_cap = next((c for c in df_map.columns if any(k in str(c).upper() for k in ['CAP', 'KAPASITAS'])), None)
-    col_loc = 'DES 2025' if 'DES 2025' in df_map.columns else df_map.columns[2]
-
-    rename_dict = {
-        col_name: 'Unit_Original', 
-        col_jenis: 'Jenis_Alat', 
-        col_hp: 'Horse_Power', 
-        col_cap: 'Capacity_Raw', 
-        col_loc: 'Lokasi'
+# --- JOB PEMROSESAN DI LATAR BELAKANG ---
+# Proses berjalan di thread pool milik server (dibuat sekali lewat cache_resource), bukan di thread script,
+# sehingga sesi tetap responsif dan hasil tetap tersimpan walau halaman di-refresh di tengah proses.
+# Registry job = penyimpanan hasil bersama seluruh sesi: kunci = (hash master, hash BBM, versi konfigurasi),
+# jumlah hasil selesai & umurnya dibatasi. Upload file yang sama ikut bergabung ke job yang sudah ada.
+JOB_MAX_WORKERS = 2
+PROSES_CACHE_MAX_ENTRIES = 8
+PROSES_CACHE_TTL = 6 * 60 * 60
+# Porsi progress bar untuk process_raw_data bila ada laporan HMU; sisanya untuk baca laporan & rekonsiliasi
+PROGRESS_PORSI_BBM = 0.8
+
+@st.cache_resource
+def job_runner():
+    return {
+        'executor': ThreadPoolExecutor(max_workers=JOB_MAX_WORKERS, thread_name_prefix='proses_bbm'),
+        'jobs': {}, 'lock': threading.Lock()
     }
-    if col_type:
-        rename_dict[col_type] = 'Type_Merk'
-
-    df_map.rename(columns=rename_dict, inplace=True)
-    
-    if 'Type_Merk' not in df_map.columns:
-        df_map['Type_Merk'] = "-"
-
-    df_map.dropna(subset=['Unit_Original'], inplace=True)
-    df_map['Unit_ID'] = df_map['Unit_Original'].apply(clean_unit_name)
-    df_map = df_map[~df_map['Unit_Original'].astype(str).str.upper().str.contains('DUMMY', na=False)]
-    df_map = df_map[~df_map['Unit_Original'].astype(str).str.upper().str.contains('FALCON', na=False)]
-    df_map['Horse_Power'] = pd.to_numeric(df_map['Horse_Power'], errors='coerce').fillna(0)
-
-    for _, row in df_map.iterrows():
-        clean_id = row['Unit_ID']
-        if clean_id:
-            u_name = str(row['Unit_Original']).strip().upper()
-            cap_val = 0
-            
-            if clean_id == clean_unit_name("L 9025 US"):
-                cap_val = 40
-            else:
-                try:
-                    raw_cap = str(row['Capacity_Raw'])
-                    match = re.search(r"(\d+(\.\d+)?)", raw_cap)
-                    if match:
-                        val_float = float(match.group(1))
-                        cap_val = int(val_float + 0.5)
-                except: pass
-                
-                if cap_val == 0:
-                    try:
-                        match_name = re.search(r"(\d+(\.\d+)?)\s*(T|TON|K)", u_name)
-                        if match_name:
-                            val_float = float(match_name.group(1))
-                            cap_val = int(val_float + 0.5)
-                    except: pass
-
-            # Fix Typo Type/Merk secara spesifik
-            t_merk = str(row['Type_Merk']).strip().upper()
-            
-            # Ganti MITSUBHISI (Typo H) menjadi MITSUBISHI
-            t_merk = t_merk.replace("MITSUBHISI", "MITSUBISHI")
-            
-            # Ganti ITSUBISHI (Kurang M) menjadi MITSUBISHI
-            if t_merk == "ITSUBISHI":
-                t_merk = "MITSUBISHI"
-            elif t_merk.startswith("ITSUBISHI "):
-                t_merk = "MITSUBISHI " + t_merk[10:]
-            elif " ITSUBISHI" in t_merk:
-                t_merk = t_merk.replace(" ITSUBISHI", " MITSUBISHI")
-
-            master_data_map[clean_id] = {
-                'Unit_Name': row['Unit_Original'],
-                'Jenis_Alat': row['Jenis_Alat'],
-                'Type_Merk': t_merk,
-                'Horse_Power': row['Horse_Power'], 
-                'Capacity': cap_val,
-                'Lokasi': row['Lokasi']
-            }
-            master_keys_set.add(clean_id)
-
-    # --- B. BACA DATA TRANSAKSI BBM MENTAH ---
-    raw_data_list = []
-    xls = pd.ExcelFile(file_bbm)
-    target_sheets = ['JAN', 'FEB', 'MAR', 'APR', 'MEI', 'JUN', 'JUL', 'AGT', 'SEP', 'OKT', 'NOV', 'DES']
-    
-    for sheet in target_sheets:
-        if sheet in xls.sheet_names:
-            df = pd.read_excel(xls, sheet_name=sheet, header=None)
-            unit_names_row = df.iloc[0].ffill()
-            headers = df.iloc[2]
-            dates = df.iloc[3:, 0]
-            
-            for col in range(1, df.shape[1]):
-                header_str = str(headers[col]).strip().upper()
-                if header_str in ['HM', 'LITER', 'KELUAR', 'PEMAKAIAN']:
-                    raw_unit_name = str(unit_names_row[col]).strip().upper()
-                    if raw_unit_name == "" or "UNNAMED" in raw_unit_name or "TOTAL" in raw_unit_name: continue
-                    if raw_unit_name.startswith(('GENSET', 'KOMPRESSOR', 'MESIN', 'TANGKI', 'SPBU', 'MOBIL')): continue
-                    
-                    clean_trx_id = clean_unit_name(raw_unit_name)
-                    matched_id = None
-                    
-                    # Manual Mapping
-                    if "FL RENTAL 01" in raw_unit_name and "TIMIKA" not in raw_unit_name:
-                        matched_id = clean_unit_name("FL RENTAL 01 TIMIKA") if clean_unit_name("FL RENTAL 01 TIMIKA") in master_data_map else None
-                    elif "TOBATI" in raw_unit_name and "KALMAR 32T" in raw_unit_name:
-                        matched_id = clean_unit_name("TOP LOADER KALMAR 35T/TOBATI") if clean_unit_name("TOP LOADER KALMAR 35T/TOBATI") in master_data_map else None
-                    elif "L 8477 UUC" in raw_unit_name:
-                        matched_id = clean_unit_name("L 9902 UR / S75") if clean_unit_name("L 9902 UR / S75") in master_data_map else None
-                    elif "L 9054 UT" in raw_unit_name:
-                        matched_id = clean_unit_name("L 9054 UT") if clean_unit_name("L 9054 UT") in master_data_map else None
-                    
-                    # Auto Mapping
-                    if not matched_id and clean_trx_id in master_data_map: matched_id = clean_trx_id
-                    if not matched_id and "EX." in raw_unit_name:
-                        try:
-                            clean_after = clean_unit_name(raw_unit_name.split("EX.")[-1].replace(")", "").strip())
-                            if clean_after in master_data_map: matched_id = clean_after
-                            elif clean_after:
-                                for k in master_keys_set:
-                                    if clean_after in k: matched_id = k; break
-                        except: pass
-                    if not matched_id and " (" in raw_unit_name:
-                        try:
-                            clean_before = clean_unit_name(raw_unit_name.split(" (")[0].strip())
-                            if clean_before in master_data_map: matched_id = clean_before
-                        except: pass
-
-                    # Ekstrak Data
-                    if matched_id:
-                        metric_type = 'HM' if header_str == 'HM' else 'LITER'
-                        vals = pd.to_numeric(df.iloc[3:, col], errors='coerce')
-                        info = master_data_map[matched_id]
-                        temp_df = pd.DataFrame({
-                            'Date': dates, 'Unit_Name': info['Unit_Name'], 
-                            'Jenis_Alat': info['Jenis_Alat'], 
-                            'Type_Merk': info['Type_Merk'],
-                            'Horse_Power': info['Horse_Power'],
-                            'Capacity': info['Capacity'], 'Lokasi': info['Lokasi'],
-                            'Metric': metric_type, 'Value': vals
-                        })
-                        temp_df.dropna(subset=['Value', 'Date'], inplace=True)
-                        if not temp_df.empty: raw_data_list.append(temp_df)
-
-    # --- C. KALKULASI DELTA HM & PIVOT ---
-    if not raw_data_list: return None, None, None
-    df_all = pd.concat(raw_data_list, ignore_index=True)
-    df_all['Date'] = pd.to_datetime(df_all['Date'], dayfirst=True, errors='coerce')
-    df_all.dropna(subset=['Date'], inplace=True)
-    
-    # Simpan data mentah untuk Grafik Tren Bulanan
-    df_trend_raw = df_all.copy()
-
-    # Pivot Total
-    df_pivot = df_all.pivot_table(index=['Unit_Name', 'Lokasi', 'Jenis_Alat', 'Type_Merk', 'Horse_Power', 'Capacity', 'Date'], columns='Metric', values='Value', aggfunc='sum').reset_index()
-    if 'HM' not in df_pivot.columns: df_pivot['HM'] = 0
-    if 'LITER' not in df_pivot.columns: df_pivot['LITER'] = 0
-    df_pivot['HM'], df_pivot['LITER'] = df_pivot['HM'].fillna(0), df_pivot['LITER'].fillna(0)
-    df_pivot.sort_values(by=['Unit_Name', 'Date'], inplace=True)
-    
-    # Hitung Delta HM
-    df_pivot['HM_Clean'] = df_pivot['HM'].replace(0, np.nan).groupby(df_pivot['Unit_Name']).ffill().fillna(0)
-    df_pivot['Delta_HM'] = df_pivot.groupby('Unit_Name')['HM_Clean'].diff().fillna(0)
-    df_pivot.loc[(df_pivot['Delta_HM'] < 0) | (df_pivot['Delta_HM'] > 100), 'Delta_HM'] = 0 
-    
-    # --- D. BENCHMARK & STATUS ---
-    final_stats = df_pivot.groupby(['Unit_Name', 'Lokasi', 'Jenis_Alat', 'Type_Merk', 'Horse_Power', 'Capacity']).agg({'LITER': 'sum', 'Delta_HM': 'sum'}).reset_index()
-    final_stats.rename(columns={'LITER': 'Total_Liter', 'Delta_HM': 'Total_HM_Work'}, inplace=True)
-    final_stats['Fuel_Ratio'] = final_stats.apply(lambda row: row['Total_Liter'] / row['Total_HM_Work'] if row['Total_HM_Work'] > 0 else 0, axis=1)
-    
-    df_valid = final_stats[(final_stats['Total_HM_Work'] > 0) & (final_stats['Total_Liter'] > 0)].copy()
-    benchmark_stats = df_valid.groupby('Horse_Power')['Fuel_Ratio'].median().reset_index()
-    benchmark_stats.rename(columns={'Fuel_Ratio': 'Group_Benchmark_Median'}, inplace=True)
-    
-    df_final = pd.merge(final_stats, benchmark_stats, on='Horse_Power', how='left')
-    
-    def get_status(row):
-        if row['Total_HM_Work'] <= 0 or row['Total_Liter'] <= 0: return "INAKTIF"
-        return "EFISIEN" if row['Fuel_Ratio'] <= row['Group_Benchmark_Median'] else "BOROS"
-
-    df_final['Performance_Status'] = df_final.apply(get_status, axis=1)
-    df_final['Potensi_Pemborosan_Liter'] = 0
-    boros_mask = df_final['Performance_Status'] == "BOROS"
-    df_final.loc[boros_mask, 'Potensi_Pemborosan_Liter'] = ((df_final.loc[boros_mask, 'Fuel_Ratio'] - df_final.loc[boros_mask, 'Group_Benchmark_Median']) * df_final.loc[boros_mask, 'Total_HM_Work'])
-    
-    df_final['Fuel_Ratio'] = df_final['Fuel_Ratio'].round(2)
-    df_final['Group_Benchmark_Median'] = df_final['Group_Benchmark_Median'].round(2)
-    df_final['Potensi_Pemborosan_Liter'] = df_final['Potensi_Pemborosan_Liter'].round(2)
-
-    df_active = df_final[df_final['Performance_Status'] != "INAKTIF"].copy()
-    df_inactive = df_final[df_final['Performance_Status'] == "INAKTIF"].copy()
-
-    # --- E. GENERATE DATA TREN BULANAN ---
-    df_trend_raw['Month_Year'] = df_trend_raw['Date'].dt.to_period('M').astype(str)
-    df_pivot_trend = df_trend_raw.pivot_table(index=['Unit_Name', 'Month_Year', 'Date'], columns='Metric', values='Value', aggfunc='sum').reset_index()
-    if 'HM' not in df_pivot_trend.columns: df_pivot_trend['HM'] = 0
-    if 'LITER' not in df_pivot_trend.columns: df_pivot_trend['LITER'] = 0
-    df_pivot_trend.sort_values(by=['Unit_Name', 'Date'], inplace=True)
-    
-    df_pivot_trend['HM_Clean'] = df_pivot_trend['HM'].replace(0, np.nan).groupby(df_pivot_trend['Unit_Name']).ffill().fillna(0)
-    df_pivot_trend['Delta_HM'] = df_pivot_trend.groupby('Unit_Name')['HM_Clean'].diff().fillna(0)
-    df_pivot_trend.loc[(df_pivot_trend['Delta_HM'] < 0) | (df_pivot_trend['Delta_HM'] > 100), 'Delta_HM'] = 0 
-    
-    trend_monthly = df_pivot_trend.groupby(['Unit_Name', 'Month_Year']).agg({'LITER': 'sum', 'Delta_HM': 'sum'}).reset_index()
-    trend_monthly['Fuel_Ratio'] = trend_monthly.apply(lambda r: r['LITER'] / r['Delta_HM'] if r['Delta_HM'] > 0 else 0, axis=1)
-    trend_monthly.rename(columns={'Month_Year': 'Bulan'}, inplace=True)
 
-    return df_active, df_inactive, trend_monthly
+def bersihkan_job(jobs):
+    now = time.time()
+    selesai = sorted((j.get('t_selesai', now), k) for k, j in jobs.items() if j['future'].done())
+    for i, (t_selesai, k) in enumerate(selesai):
+        if now - t_selesai > PROSES_CACHE_TTL or i < len(selesai) - PROSES_CACHE_MAX_ENTRIES: del jobs[k]
+
+def jalankan_proses(master_bytes, bbm_bytes, hmu_uploads, pakai_jam_hmu, progress):
+    porsi_bbm = PROGRESS_PORSI_BBM if hmu_uploads else 1.0
+    hasil = abbm.process_raw_data(io.BytesIO(master_bytes), io.BytesIO(bbm_bytes), lambda stage, fraction, stats: progress(stage, fraction * porsi_bbm, stats))
+    if not hmu_uploads or hasil[3] is None: return hasil + (None,)
+
+    # Tahap HMU = satu langkah per file laporan + satu langkah rekonsiliasi di akhir
+    def lapor_hmu(files_parsed, files_total):
+        progress('rekonsiliasi', porsi_bbm + (1 - porsi_bbm) * files_parsed / (files_total + 1), {'files_parsed': files_parsed, 'files_total': files_total})
+    lapor_hmu(0, len(hmu_uploads))
+    df_hmu, stats_hmu = hmu.load_hmu_uploads(hmu_uploads, progress=lapor_hmu)
+    hasil_hmu = {'rekon': hmu.reconcile_hm(hasil[3], df_hmu), 'coverage': abbm.build_coverage_matrix(df_hmu['Unit_Clean'], df_hmu['Date']),
+                 'tanggal_gagal': stats_hmu.get('unparsed_dates', {}), 'file_gagal': stats_hmu.get('failed', {})}
+    if pakai_jam_hmu: hasil = hmu.recompute_with_hmu_hours(hasil[3], df_hmu)
+    return hasil + (hasil_hmu,)
+
+def submit_job(job_key, master_bytes, bbm_bytes, hmu_uploads=(), pakai_jam_hmu=False):
+    runner = job_runner()
+    with runner['lock']:
+        bersihkan_job(runner['jobs'])
+        job = runner['jobs'].get(job_key)
+        if job is not None and not (job['future'].done() and job['future'].exception() is not None): return job
+
+        job = {'t_mulai': time.time(), 't_tahap': {}, 'progress': ('read', 0.0, None)}
+        def progress(stage, fraction, stats):
+            job['t_tahap'].setdefault(stage, time.time())
+            job['progress'] = (stage, fraction, stats)
+        job['future'] = runner['executor'].submit(jalankan_proses, master_bytes, bbm_bytes, hmu_uploads, pakai_jam_hmu, progress)
+        job['future'].add_done_callback(lambda _: job.__setitem__('t_selesai', time.time()))
+        runner['jobs'][job_key] = job
+        return job
+
+def ambil_job(job_key):
+    return job_runner()['jobs'].get(job_key)
+
+# --- PROGRESS BAR PER TAHAP (SISA WAKTU DARI THROUGHPUT YANG TERUKUR) ---
+LABEL_TAHAP = {
+    'read': "Membaca sheet", 'match': "Mencocokkan kolom unit", 'pivot': "Pivot & Delta HM",
+    'benchmark': "Deteksi anomali & benchmark", 'trend': "Tren bulanan", 'rekonsiliasi': "Rekonsiliasi HM vs laporan HMU"
+}
+
+def tampilkan_progress_job(job):
+    stage, fraction, stats = job['progress']
+    now = time.time()
+    elapsed = now - job['t_mulai']
+    if stats and 'files_total' in stats:
+        # Tahap laporan HMU: sisa waktu dari laju tahap ini sendiri (detik per file), bukan rata-rata seluruh job
+        elapsed_tahap = now - job['t_tahap'].get(stage, now)
+        sisa = f"{elapsed_tahap * (stats['files_total'] + 1 - stats['files_parsed']) / stats['files_parsed']:.0f} dtk" if stats['files_parsed'] else "menghitung..."
+        detail = f" — laporan {stats['files_parsed']}/{stats['files_total']}"
+    else:
+        sisa = f"{elapsed * (1 - fraction) / fraction:.0f} dtk" if fraction > 0.05 else "menghitung..."
+        detail = (f" — sheet {stats['sheets_parsed']}/{stats['sheets_total']}, {stats['columns_matched']} kolom cocok, "
+                  f"{stats['rows_produced']:,} baris") if stats else ""
+    st.progress(min(max(fraction, 0.0), 1.0), text=f"{LABEL_TAHAP.get(stage, stage)}{detail} | berjalan {elapsed:.0f} dtk, sisa ± {sisa}")
+
+# Data harian sesuai rentang tanggal sidebar; pengisian anomali dianggap 0 liter bila dikecualikan
+# (sama seperti LITER_Non_Anomali pada index prefix-sum & kubus bulanan)
+def filter_daily(df_daily, rentang, exclude_anomali=False):
+    if rentang is not None: df_daily = df_daily[df_daily['Date'].between(pd.Timestamp(rentang[0]), pd.Timestamp(rentang[1]))]
+    if exclude_anomali and 'Is_Anomali' in df_daily.columns: df_daily = df_daily.assign(LITER=df_daily['LITER'].where(~df_daily['Is_Anomali'].astype(bool), 0))
+    return df_daily
+
+# Wrapper cache per tahap di-key dengan data_key (kunci job yang menghasilkan data) + parameter tampilan;
+# DataFrame diberikan sebagai argumen _ agar tidak di-hash ulang pada setiap rerun
+@st.cache_data(show_spinner=False, max_entries=8)
+def hitung_fill_to_fill(data_key, rentang, exclude_anomali, _df_daily):
+    return abbm.compute_fill_to_fill(filter_daily(_df_daily, rentang, exclude_anomali))
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def hitung_tren_slope(data_key, trend_range, _df_trend):
+    return abbm.compute_trend_slopes(_df_trend, *(trend_range or (None, None)))
+
+# Agregat container per cabang & bulan di-cache per (hash isi file, versi konfigurasi parser), terpisah dari
+# job BBM sehingga menambah/mengganti file container tidak memproses ulang transaksi BBM
+@st.cache_data(show_spinner=False, max_entries=4)
+def hitung_container_cabang(file_hash, config_version, _file_bytes):
+    df_records, _ = sc.read_branch_records(io.BytesIO(_file_bytes))
+    return sc.container_moves(sc.aggregate_branch_summary(df_records))
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def hitung_idle_fuel(data_key, rentang, min_hari_tanpa_isi, _df_daily):
+    return abbm.detect_idle_fuel(filter_daily(_df_daily, rentang), min_hari_tanpa_isi=min_hari_tanpa_isi)
+
+PARQUET_TERSEDIA = importlib.util.find_spec('pyarrow') is not None
+
+# Hari dengan pembacaan HM atau pengisian BBM (baris bernilai 0 semua tidak dihitung sebagai data)
+def hari_tercatat(df_daily):
+    tercatat = (df_daily['HM'] > 0) | (df_daily['LITER'] > 0)
+    return df_daily.loc[tercatat, 'Unit_Name'], df_daily.loc[tercatat, 'Date']
 
 
 # ==============================================================================
@@ -264,128 +186,191 @@ if 'df_unit' not in st.session_state:
     st.session_state['df_unit'] = None
     st.session_state['df_inaktif'] = None
     st.session_state['df_trend'] = None
+    st.session_state['df_daily'] = None
+    st.session_state['prefix_index'] = None
+    st.session_state['job_aktif'] = None
+    st.session_state['data_key'] = None
 
 if mulai_proses:
     if master_file and bbm_file:
-        with st.spinner("Processing data yang diberikan (estimasi 10-20 detik)..."):
-            df_active, df_inactive, df_trend = process_raw_data(master_file, bbm_file)
-            st.session_state['df_unit'] = df_active
-            st.session_state['df_inaktif'] = df_inactive
-            st.session_state['df_trend'] = df_trend
-        st.success("Data selesai diproses!")
+        job_key = (master_hash, bbm_hash, hmu_hashes, pakai_jam_hmu and bool(hmu_files), abbm.CONFIG_VERSION, hmu.REKON_CONFIG_VERSION)
+        submit_job(job_key, master_file.getvalue(), bbm_file.getvalue(), [(f.name, f.getvalue()) for f in hmu_files], pakai_jam_hmu)
+        st.session_state['job_aktif'] = job_key
     else:
         st.error("Upload kedua file terlebih dahulu sebelum memulai proses.")
 
+# Halaman memantau status job; hasil dipasang ke session_state saat job selesai
+@st.fragment(run_every=1.0)
+def pantau_job(job_key):
+    job = ambil_job(job_key)
+    if job is None or job['future'].done(): st.rerun()
+    tampilkan_progress_job(job)
+
+job_key = st.session_state.get('job_aktif')
+if job_key is not None:
+    job = ambil_job(job_key)
+    if job is None:
+        st.session_state['job_aktif'] = None
+        st.error("Job pemrosesan tidak ditemukan (kedaluwarsa). Silakan mulai proses kembali.")
+    elif not job['future'].done():
+        pantau_job(job_key)
+    elif job['future'].exception() is not None:
+        st.session_state['job_aktif'] = None
+        st.error(f"Pemrosesan gagal: {job['future'].exception()}")
+    else:
+        df_active, df_inactive, df_trend, df_daily, hasil_hmu = job['future'].result()
+        st.session_state['job_aktif'] = None
+        st.session_state['data_key'] = job_key
+        st.session_state['df_unit'] = df_active
+        st.session_state['df_inaktif'] = df_inactive
+        st.session_state['df_trend'] = df_trend
+        st.session_state['df_daily'] = df_daily
+        st.session_state['prefix_index'] = abbm.build_prefix_index(df_daily) if df_daily is not None else None
+        st.session_state['monthly_cube'] = abbm.build_monthly_cube(df_daily) if df_daily is not None else None
+        st.session_state['benchmark_view'] = None
+        st.session_state['trend_per_unit'] = abbm.group_trend_by_unit(df_trend) if df_trend is not None else None
+        st.session_state['trend_fig_cache'] = {}
+        st.session_state['hasil_hmu'] = hasil_hmu
+        st.session_state['coverage_bbm'] = abbm.build_coverage_matrix(*hari_tercatat(df_daily)) if df_daily is not None else None
+        st.success("Data selesai diproses!")
+
 df_unit = st.session_state['df_unit']
 df_inaktif = st.session_state['df_inaktif']
 df_trend_global = st.session_state['df_trend']
-
-# --- FUNGSI FORMAT SATUAN (TON/FEET) DENGAN HANDLING ANGKA 0 ---
-def format_capacity_with_unit(row):
-    cap = row.get('Capacity', 0)
-    try:
-        cap_float = float(cap)
-        if pd.isna(cap_float) or cap_float == 0:
-            return "0"  
-        cap_val = int(cap_float)
-    except:
-        return str(cap)
-
-    jenis = str(row.get('Jenis_Alat', '')).upper()
-    if jenis in ['CRANE', 'FORKLIFT', 'REACH STACKER', 'SIDE LOADER', 'TOP LOADER']: return f"{cap_val} Ton"
-    elif jenis in ['TRONTON', 'TRAILER']: return f"{cap_val} Feet"
-    return str(cap_val)
+df_daily_global = st.session_state['df_daily']
+prefix_index = st.session_state.get('prefix_index')
+trend_per_unit = st.session_state.get('trend_per_unit')
+monthly_cube = st.session_state.get('monthly_cube')
+hasil_hmu = st.session_state.get('hasil_hmu')
+data_key = st.session_state.get('data_key')
+coverage_bbm = st.session_state.get('coverage_bbm')
+
+# --- FUNGSI FORMAT SATUAN (TON/FEET) DENGAN HANDLING ANGKA 0 (VEKTOR, TANPA APPLY PER BARIS) ---
+JENIS_SATUAN_TON = ['CRANE', 'FORKLIFT', 'REACH STACKER', 'SIDE LOADER', 'TOP LOADER']
+JENIS_SATUAN_FEET = ['TRONTON', 'TRAILER']
+
+def format_capacity_series(df):
+    cap = pd.to_numeric(df['Capacity'], errors='coerce')
+    jenis = df['Jenis_Alat'].astype(str).str.upper()
+    satuan = np.select([jenis.isin(JENIS_SATUAN_TON), jenis.isin(JENIS_SATUAN_FEET)], [" Ton", " Feet"], "")
+    hasil = cap.fillna(0).astype(np.int64).astype(str) + satuan
+    hasil = hasil.where(cap.fillna(0) != 0, "0")
+    # Nilai non-angka ditampilkan apa adanya
+    return hasil.where(cap.notna() | df['Capacity'].isna(), df['Capacity'].astype(str))
+
+# --- LAPISAN TAMPILAN TABEL STATUS BBM ---
+# Tabel kecil tetap memakai Styler (warna sel Fuel_Ratio) dengan CSS yang dibangun
+# sekaligus per kolom. Di atas STYLER_MAX_ROWS, Styler (render HTML seluruh tabel)
+# diganti dataframe native + column_config dan status ditandai dengan ikon warna.
+STYLER_MAX_ROWS = 1000
+WARNA_STATUS = {'EFISIEN': 'background-color: #2ca02c; color: white', 'BOROS': 'background-color: #d62728; color: white'}
+IKON_STATUS = {'EFISIEN': '🟢 EFISIEN', 'BOROS': '🔴 BOROS'}
+
+def tampilkan_tabel_status(df_display, number_formats):
+    waktu_mulai = time.perf_counter()
+    status = df_display['Status_BBM'].astype(str).str.upper()
+    number_formats = {col: fmt for col, fmt in number_formats.items() if col in df_display.columns}
+
+    if len(df_display) <= STYLER_MAX_ROWS:
+        css = pd.DataFrame('', index=df_display.index, columns=df_display.columns)
+        css['Fuel_Ratio'] = status.map(WARNA_STATUS).fillna('')
+        st.dataframe(df_display.style.format(number_formats).apply(lambda _: css, axis=None))
+    else:
+        df_native = df_display.assign(Status_BBM=status.map(IKON_STATUS).fillna(df_display['Status_BBM']))
+        # '{:,.0f}' -> '%,.0f': pemisah ribuan tetap dipertahankan, sama seperti tampilan Styler
+        column_config = {col: st.column_config.NumberColumn(format="%" + fmt.strip('{}:')) for col, fmt in number_formats.items() if pd.api.types.is_numeric_dtype(df_native[col])}
+        st.dataframe(df_native, column_config=column_config, hide_index=True)
+        st.caption(f"{len(df_display):,} baris ditampilkan dalam mode cepat (disiapkan di server dalam {(time.perf_counter() - waktu_mulai) * 1000:,.0f} ms, belum termasuk render di browser)")
+
+# --- BATAS MODE DATA BESAR UNTUK GRAFIK ---
+BAR_MAX_UNITS = 60
+BAR_TOP_N = 25
+HIST_BINS = 50
+SCATTER_WEBGL_MIN_POINTS = 300
+SCATTER_MAX_POINTS = 3000
+TREND_FIG_CACHE_MAX = 200
 
 # ==============================================================================
 # 4. KONTEN UTAMA DASHBOARD
 # ==============================================================================
 if df_unit is not None:
-    # --- PENCARIAN UNIT ---
-    st.subheader("Cari Data Spesifik")
+    # --- ANOMALI PENGISIAN BBM (BENCHMARK DENGAN / TANPA ANOMALI) ---
+    st.sidebar.subheader("Anomali Pengisian BBM")
+    exclude_anomali = st.sidebar.checkbox("Kecualikan pengisian anomali dari benchmark", value=False, help=f"Pengisian harian dengan robust z-score (Median/MAD per unit) di atas {abbm.ANOMALI_Z_THRESHOLD} dianggap anomali")
+
+    # --- RENTANG TANGGAL ANALISA (DARI INDEX PREFIX-SUM) ---
+    range_changed = False
+    if prefix_index is not None:
+        st.sidebar.subheader("Rentang Tanggal")
+        date_min, date_max = prefix_index['date_min'].date(), prefix_index['date_max'].date()
+        if date_min < date_max:
+            selected_range = st.sidebar.slider("Rentang Tanggal Analisa:", min_value=date_min, max_value=date_max, value=(date_min, date_max), format="DD-MM-YYYY")
+        else:
+            selected_range = (date_min, date_max)
+        range_changed = tuple(selected_range) != (date_min, date_max)
+    trend_range = (selected_range[0].strftime('%Y-%m'), selected_range[1].strftime('%Y-%m')) if range_changed else None
+    date_range = tuple(selected_range) if range_changed else None
+
+    # --- HASIL BENCHMARK AKTIF + INDEX FILTER (DIBANGUN SEKALI PER KOMBINASI RENTANG/ANOMALI) ---
+    benchmark_key = (exclude_anomali, date_range)
+    if st.session_state.get('benchmark_view') is None or st.session_state['benchmark_view'][0] != benchmark_key:
+        # Total, Fuel Ratio & benchmark rentang dihitung ulang dari index (dua lookup per unit)
+        if prefix_index is not None and (exclude_anomali or range_changed):
+            df_unit, df_inaktif = abbm.compute_benchmark_range(prefix_index, selected_range[0], selected_range[1], exclude_anomali=exclude_anomali)
+        if df_inaktif is None: df_inaktif = df_unit.iloc[0:0]
+        df_units_all = pd.concat([df_unit.assign(Aktif=True), df_inaktif.assign(Aktif=False)], ignore_index=True)
+        st.session_state['benchmark_view'] = (benchmark_key, df_unit, df_inaktif, df_units_all, abbm.build_filter_index(df_units_all), abbm.build_search_index(df_units_all))
+    _, df_unit, df_inaktif, df_units_all, filter_index, search_index = st.session_state['benchmark_view']
+    mask_aktif = df_units_all['Aktif'].to_numpy()
+
+    # --- PENCARIAN UNIT (FRAGMENT: KETIKAN HANYA MERENDER ULANG BAGIAN INI) ---
+    @st.fragment
+    def tampilkan_pencarian(df_units_all, search_index):
+        st.subheader("Cari Data Spesifik")
     
-    # Dropdown Pemilihan Kategori (Hanya Nama Unit & Horse Power)
-    search_category = st.selectbox("Pilih Kategori Pencarian:", ["Nama Unit", "Horse Power"])
+        # Dropdown Pemilihan Kategori (Nama Unit, Horse Power & Kapasitas)
+        search_category = st.selectbox("Pilih Kategori Pencarian:", ["Nama Unit"] + list(abbm.SEARCH_NUMERIC_COLS))
     
-    # Input Pencarian
-    search_keyword = st.text_input(f"Ketik {search_category}:", key="search_keyword", placeholder=f"Cari {search_category}...").upper()
+        # Input Pencarian
+        search_keyword = st.text_input(f"Ketik {search_category}:", key="search_keyword", placeholder=f"Cari {search_category}..." if search_category == "Nama Unit" else f"Cari {search_category} (angka atau rentang, mis. 100-200)...").upper()
     
-    if search_keyword:
-        mask_active = pd.Series([False] * len(df_unit))
-        mask_inactive = pd.Series([False] * (len(df_inaktif) if df_inaktif is not None else 0))
-        valid_search = True
-
-        if search_category == "Nama Unit":
-            mask_active = df_unit['Unit_Name'].astype(str).str.contains(search_keyword, na=False)
-            if df_inaktif is not None: mask_inactive = df_inaktif['Unit_Name'].astype(str).str.contains(search_keyword, na=False)
-        elif search_category == "Horse Power":
-            try:
-                float(search_keyword) 
-                mask_active = df_unit['Horse_Power'].astype(str).str.contains(search_keyword, na=False)
-                if df_inaktif is not None: mask_inactive = df_inaktif['Horse_Power'].astype(str).str.contains(search_keyword, na=False)
-            except ValueError:
-                st.warning("⚠️ Untuk pencarian Horse Power, mohon masukkan angka.")
-                valid_search = False
-
-        if valid_search:
-            res_active = df_unit[mask_active].copy()
-            res_active['Status'] = 'AKTIF'
-            
-            res_inactive = pd.DataFrame()
-            if df_inaktif is not None:
-                res_inactive = df_inaktif[mask_inactive].copy()
-                res_inactive['Status'] = 'INAKTIF'
-                
-            res_all = pd.concat([res_active, res_inactive], ignore_index=True)
+        if search_keyword:
+            # Pencarian dari index yang dibangun sekali per hasil benchmark (hasil sudah diranking)
+            search_positions = abbm.search_units(search_index, search_category, search_keyword)
+
+            if search_positions is None:
+                st.warning(f"⚠️ Untuk pencarian {search_category}, mohon masukkan angka atau rentang angka (contoh: 100 atau 100-200).")
+            else:
+                res_all = df_units_all.iloc[search_positions].reset_index(drop=True)
+                res_all['Status'] = np.where(res_all['Aktif'], 'AKTIF', 'INAKTIF')
             
-            if not res_all.empty:
-                st.info(f"Ditemukan {len(res_all)} Unit:")
-                if 'Fuel_Ratio' in res_all.columns: res_all.sort_values(by='Fuel_Ratio', ascending=False, inplace=True)
-                
-                cols_to_show = ['Unit_Name', 'Jenis_Alat', 'Type_Merk', 'Status', 'Horse_Power', 'Capacity', 'Lokasi', 'Total_Liter', 'Total_HM_Work', 'Group_Benchmark_Median', 'Fuel_Ratio', 'Performance_Status', 'Potensi_Pemborosan_Liter']
-                for c in cols_to_show:
-                    if c not in res_all.columns: res_all[c] = 0 if c in ['Total_Liter', 'Total_HM_Work', 'Fuel_Ratio', 'Potensi_Pemborosan_Liter', 'Group_Benchmark_Median'] else "-"
-                
-                df_search_display = res_all[cols_to_show].copy()
+                if not res_all.empty:
+                    st.info(f"Ditemukan {len(res_all)} Unit:")
                 
-                # Penyesuaian Teks Untuk Unit Inaktif dan Nilai Benchmark
-                df_search_display['Capacity'] = df_search_display.apply(format_capacity_with_unit, axis=1)
+                    cols_to_show = ['Unit_Name', 'Jenis_Alat', 'Type_Merk', 'Status', 'Horse_Power', 'Capacity', 'Lokasi', 'Total_Liter', 'Total_HM_Work', 'Group_Benchmark_Median', 'Fuel_Ratio', 'Performance_Status', 'Potensi_Pemborosan_Liter']
+                    for c in cols_to_show:
+                        if c not in res_all.columns: res_all[c] = 0 if c in ['Total_Liter', 'Total_HM_Work', 'Fuel_Ratio', 'Potensi_Pemborosan_Liter', 'Group_Benchmark_Median'] else "-"
                 
-                df_search_display['Group_Benchmark_Median'] = df_search_display['Group_Benchmark_Median'].apply(
-                    lambda x: "None" if pd.isna(x) or x == 0 else f"{float(x):.2f}"
-                )
+                    df_search_display = res_all[cols_to_show].copy()
                 
-                def format_fuel_ratio(row):
-                    if row['Status'] == 'INAKTIF': return "Tidak Ada Karena Unit Inaktif"
-                    return f"{float(row['Fuel_Ratio']):.2f}"
+                    # Penyesuaian Teks Untuk Unit Inaktif dan Nilai Benchmark
+                    is_inaktif = (df_search_display['Status'] == 'INAKTIF').to_numpy()
+                    df_search_display['Capacity'] = format_capacity_series(df_search_display)
 
-                def format_pemborosan(row):
-                    if row['Status'] == 'INAKTIF': return "Tidak Ada Karena Unit Inaktif"
-                    return f"{float(row['Potensi_Pemborosan_Liter']):,.0f}"
+                    benchmark = pd.to_numeric(df_search_display['Group_Benchmark_Median'], errors='coerce')
+                    df_search_display['Group_Benchmark_Median'] = benchmark.map('{:.2f}'.format).where(benchmark.fillna(0) != 0, "None")
+                    df_search_display['Fuel_Ratio'] = np.where(is_inaktif, "Tidak Ada Karena Unit Inaktif", pd.to_numeric(df_search_display['Fuel_Ratio'], errors='coerce').map('{:.2f}'.format))
+                    df_search_display['Potensi_Pemborosan_Liter'] = np.where(is_inaktif, "Tidak Ada Karena Unit Inaktif", pd.to_numeric(df_search_display['Potensi_Pemborosan_Liter'], errors='coerce').map('{:,.0f}'.format))
+                    df_search_display['Performance_Status'] = np.where(is_inaktif, "UNIT INAKTIF", df_search_display['Performance_Status'])
 
-                def format_status_bbm(row):
-                    if row['Status'] == 'INAKTIF': return "UNIT INAKTIF"
-                    return row['Performance_Status']
+                    rename_map_search = {'Unit_Name': 'Unit', 'Type_Merk': 'Type/Merk', 'Total_Liter': 'Total_Pengisian_BBM', 'Total_HM_Work': 'Total_Jam_Kerja', 'Group_Benchmark_Median': 'Benchmark', 'Performance_Status': 'Status_BBM', 'Potensi_Pemborosan_Liter': 'Potensi_Pemborosan_BBM'}
+                    df_search_display.rename(columns=rename_map_search, inplace=True)
 
-                df_search_display['Fuel_Ratio'] = df_search_display.apply(format_fuel_ratio, axis=1)
-                df_search_display['Potensi_Pemborosan_Liter'] = df_search_display.apply(format_pemborosan, axis=1)
-                df_search_display['Performance_Status'] = df_search_display.apply(format_status_bbm, axis=1) 
-                
-                rename_map_search = {'Unit_Name': 'Unit', 'Type_Merk': 'Type/Merk', 'Total_Liter': 'Total_Pengisian_BBM', 'Total_HM_Work': 'Total_Jam_Kerja', 'Group_Benchmark_Median': 'Benchmark', 'Performance_Status': 'Status_BBM', 'Potensi_Pemborosan_Liter': 'Potensi_Pemborosan_BBM'}
-                df_search_display.rename(columns=rename_map_search, inplace=True)
-
-                # Fix konsistensi warna teks pencarian
-                def highlight_search(row):
-                    status_bbm = str(row['Status_BBM']).upper()
-                    if status_bbm == 'EFISIEN':
-                        return [f'background-color: #2ca02c; color: white' if col == 'Fuel_Ratio' else '' for col in row.index]
-                    elif status_bbm == 'BOROS':
-                        return [f'background-color: #d62728; color: white' if col == 'Fuel_Ratio' else '' for col in row.index]
-                    else:
-                        return ['' for _ in row.index]
+                    tampilkan_tabel_status(df_search_display, {'Horse_Power': '{:.0f}', 'Total_Pengisian_BBM': '{:,.0f}', 'Total_Jam_Kerja': '{:,.0f}'})
+                else:
+                    st.warning("Unit Tidak Ditemukan.")
 
-                st.dataframe(df_search_display.style.format({'Horse_Power': '{:.0f}', 'Total_Pengisian_BBM': '{:,.0f}', 'Total_Jam_Kerja': '{:,.0f}'}).apply(highlight_search, axis=1))
-            else:
-                st.warning("Unit Tidak Ditemukan.")
+    tampilkan_pencarian(df_units_all, search_index)
 
     st.markdown("---")
 
@@ -393,72 +378,34 @@ if df_unit is not None:
     st.sidebar.subheader("Filter Dashboard")
 
     # [UPDATE] 1. Filter Kategori Utama (Radio Button, Tanpa 'Semua')
-    cat_options = ["Trucking (Tronton & Trailer)", "Alat Berat (Non-Trucking)"]
+    cat_options = [abbm.KATEGORI_TRUCKING, abbm.KATEGORI_NON_TRUCKING]
     selected_cat = st.sidebar.radio("Pilih Kategori Unit:", cat_options)
 
-    # Filter Data Temporary to generate options for next filters
-    df_filtered_step1 = df_unit.copy()
-    trucking_types = ['TRONTON', 'TRAILER']
-    
-    if selected_cat == "Trucking (Tronton & Trailer)":
-        df_filtered_step1 = df_filtered_step1[df_filtered_step1['Jenis_Alat'].isin(trucking_types)]
-    elif selected_cat == "Alat Berat (Non-Trucking)":
-        df_filtered_step1 = df_filtered_step1[~df_filtered_step1['Jenis_Alat'].isin(trucking_types)]
+    # Opsi filter berikutnya diambil dari AND bitmap index (tanpa salinan DataFrame)
+    mask_step1 = abbm.filter_mask(filter_index, {'Kategori': selected_cat})
 
     # [UPDATE] 2. Filter Lokasi (Based on Category)
-    loc_options = ["Semua"] + sorted(df_filtered_step1['Lokasi'].unique().tolist())
+    loc_options = ["Semua"] + abbm.filter_options(filter_index, 'Lokasi', mask_step1 & mask_aktif)
     selected_loc = st.sidebar.selectbox("Pilih Lokasi:", loc_options)
 
     # [UPDATE] 3. Filter Jenis Alat (Based on Category & Location)
-    df_filtered_step2 = df_filtered_step1.copy()
-    if selected_loc != "Semua":
-        df_filtered_step2 = df_filtered_step2[df_filtered_step2['Lokasi'] == selected_loc]
+    mask_step2 = mask_step1 & abbm.filter_mask(filter_index, {'Lokasi': None if selected_loc == "Semua" else selected_loc})
 
-    type_options = ["Semua"] + sorted(df_filtered_step2['Jenis_Alat'].unique().tolist())
+    type_options = ["Semua"] + abbm.filter_options(filter_index, 'Jenis_Alat', mask_step2 & mask_aktif)
     selected_type = st.sidebar.selectbox("Pilih Jenis Alat:", type_options)
 
     # [UPDATE] 4. Filter Type/Merk (Based on Category, Location, Type)
-    df_filtered_step3 = df_filtered_step2.copy()
-    if selected_type != "Semua":
-        df_filtered_step3 = df_filtered_step3[df_filtered_step3['Jenis_Alat'] == selected_type]
+    mask_step3 = mask_step2 & abbm.filter_mask(filter_index, {'Jenis_Alat': None if selected_type == "Semua" else selected_type})
 
-    type_merk_options = ["Semua"] + sorted(df_filtered_step3['Type_Merk'].astype(str).unique().tolist())
+    type_merk_options = ["Semua"] + abbm.filter_options(filter_index, 'Type_Merk', mask_step3 & mask_aktif)
     selected_type_merk = st.sidebar.selectbox("Pilih Type/Merk:", type_merk_options)
 
-    st.sidebar.subheader("Biaya Bahan Bakar")
-    harga_solar = st.sidebar.number_input("Harga Solar (IDR):", value=6800, step=100, key='solar_alat')
-
     # --- FILTER FINAL BERDASARKAN SEMUA SELEKSI ---
-    df_active = df_unit.copy()
-    df_inactive_show = df_inaktif.copy() if df_inaktif is not None else pd.DataFrame()
-
-    # 1. Apply Category
-    if selected_cat == "Trucking (Tronton & Trailer)":
-        df_active = df_active[df_active['Jenis_Alat'].isin(trucking_types)]
-        if not df_inactive_show.empty:
-             df_inactive_show = df_inactive_show[df_inactive_show['Jenis_Alat'].isin(trucking_types)]
-    elif selected_cat == "Alat Berat (Non-Trucking)":
-        df_active = df_active[~df_active['Jenis_Alat'].isin(trucking_types)]
-        if not df_inactive_show.empty:
-             df_inactive_show = df_inactive_show[~df_inactive_show['Jenis_Alat'].isin(trucking_types)]
-
-    # 2. Apply Location
-    if selected_loc != "Semua":
-        df_active = df_active[df_active['Lokasi'] == selected_loc]
-        if not df_inactive_show.empty:
-            df_inactive_show = df_inactive_show[df_inactive_show['Lokasi'] == selected_loc]
-
-    # 3. Apply Type
-    if selected_type != "Semua":
-        df_active = df_active[df_active['Jenis_Alat'] == selected_type]
-        if not df_inactive_show.empty:
-            df_inactive_show = df_inactive_show[df_inactive_show['Jenis_Alat'] == selected_type]
-
-    # 4. Apply Merk
-    if selected_type_merk != "Semua":
-        df_active = df_active[df_active['Type_Merk'] == selected_type_merk]
-        if not df_inactive_show.empty:
-            df_inactive_show = df_inactive_show[df_inactive_show['Type_Merk'] == selected_type_merk]
+    mask_final = mask_step3 & abbm.filter_mask(filter_index, {'Type_Merk': None if selected_type_merk == "Semua" else selected_type_merk})
+    df_active = df_units_all[mask_final & mask_aktif]
+    df_inactive_show = df_units_all[mask_final & ~mask_aktif]
+    sidebar_selections = {'Kategori': selected_cat, 'Lokasi': selected_loc, 'Jenis_Alat': selected_type, 'Type_Merk': selected_type_merk}
+    sidebar_selections = {dim: (None if value == "Semua" else value) for dim, value in sidebar_selections.items()}
 
     # --- MAIN CONTENT ---
     # [UPDATE] Variabel selected_type_merk ditambahkan ke judul
@@ -467,16 +414,26 @@ if df_unit is not None:
     if not df_inactive_show.empty:
         with st.expander(f"⚠️ {len(df_inactive_show)} Unit Tidak Masuk Analisa (Inaktif)"):
             df_inactive_display = df_inactive_show[['Unit_Name', 'Jenis_Alat', 'Type_Merk', 'Horse_Power', 'Capacity', 'Lokasi', 'Total_Liter', 'Total_HM_Work']].copy()
-            df_inactive_display['Capacity'] = df_inactive_display.apply(format_capacity_with_unit, axis=1)
+            df_inactive_display['Capacity'] = format_capacity_series(df_inactive_display)
             st.dataframe(df_inactive_display.rename(columns={'Type_Merk': 'Type/Merk', 'Total_Liter': 'Total_Pengisian_BBM', 'Total_HM_Work': 'Total_Jam_Kerja', 'Unit_Name': 'Unit'}))
             
+    if df_daily_global is not None and 'Is_Anomali' in df_daily_global.columns:
+        anomali_mask = df_daily_global['Is_Anomali'] & df_daily_global['Unit_Name'].isin(pd.concat([df_active['Unit_Name'], df_inactive_show.get('Unit_Name', pd.Series(dtype=object))]))
+        if range_changed:
+            anomali_mask &= df_daily_global['Date'].between(pd.Timestamp(selected_range[0]), pd.Timestamp(selected_range[1]))
+        df_anomali_show = df_daily_global[anomali_mask]
+        if not df_anomali_show.empty:
+            with st.expander(f"⚠️ {len(df_anomali_show)} Pengisian BBM Terindikasi Anomali ({df_anomali_show['LITER'].sum():,.0f} Liter)"):
+                df_anomali_display = df_anomali_show[['Unit_Name', 'Jenis_Alat', 'Lokasi', 'Date', 'LITER', 'Liter_Median_Unit', 'Delta_HM', 'Anomali_Score']].sort_values('Anomali_Score', ascending=False)
+                df_anomali_display['Date'] = df_anomali_display['Date'].dt.strftime('%d-%m-%Y')
+                st.dataframe(df_anomali_display.rename(columns={'Unit_Name': 'Unit', 'Date': 'Tanggal', 'LITER': 'Pengisian_BBM', 'Liter_Median_Unit': 'Median_Pengisian_Unit', 'Delta_HM': 'Jam_Kerja', 'Anomali_Score': 'Skor_Anomali'}), hide_index=True)
+
     if df_active.empty:
         st.warning(f"Tidak ada unit aktif untuk kategori {selected_loc} - {selected_type}.")
         st.stop()
 
     # --- KPI CALCULATIONS ---
     total_waste = df_active['Potensi_Pemborosan_Liter'].sum()
-    total_loss_rp = total_waste * harga_solar
 
     df_active.sort_values('Fuel_Ratio', ascending=True, inplace=True)
     best_unit = df_active.iloc[0]
@@ -487,110 +444,536 @@ if df_unit is not None:
         worst_val = f"({worst_unit['Fuel_Ratio']:.2f} L/Jam)"
     else: worst_txt = "-"; worst_val = ""
 
-    # --- METRICS ---
-    m1, m2, m3 = st.columns(3)
-    m1.metric("Populasi Aktif", f"{len(df_active)} Unit")
-    m2.metric("Estimasi Kerugian", f"Rp {total_loss_rp:,.0f}", help=f"{total_waste:,.0f} Liter Terbuang")
-    m3.metric(f"Unit Teririt: {best_unit['Unit_Name']}", f"{best_unit['Fuel_Ratio']:.2f} L/Jam")
+    # --- METRICS (FRAGMENT: PERUBAHAN HARGA SOLAR HANYA MERENDER ULANG BAGIAN INI) ---
+    @st.fragment
+    def tampilkan_kpi(jumlah_unit, total_waste, best_unit_name, best_unit_ratio):
+        col_harga, _ = st.columns([1, 3])
+        harga_solar = col_harga.number_input("Harga Solar (IDR):", value=6800, step=100, key='solar_alat')
+        total_loss_rp = total_waste * harga_solar
+
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Populasi Aktif", f"{jumlah_unit} Unit")
+        m2.metric("Estimasi Kerugian", f"Rp {total_loss_rp:,.0f}", help=f"{total_waste:,.0f} Liter Terbuang")
+        m3.metric(f"Unit Teririt: {best_unit_name}", f"{best_unit_ratio:.2f} L/Jam")
+        st.info(f"**Total Pemborosan**: **{total_waste:,.0f} Liter** setara dengan **Rp {total_loss_rp:,.0f}**")
+
+    tampilkan_kpi(len(df_active), total_waste, best_unit['Unit_Name'], best_unit['Fuel_Ratio'])
+
+    # --- EXPORT VIEW YANG SEDANG DIFILTER ---
+    # File baru dibangun saat tombol diklik (di thread terpisah dari script) dan ditulis ke file sementara
+    # di disk, sehingga export besar tidak memblokir sesi lain maupun menggandakan data di memori.
+    def export_sheets():
+        kolom_unit = [c for c in df_active.columns if c != 'Aktif']
+        return {
+            'Unit_Aktif': df_active[kolom_unit],
+            'Unit_Inaktif': df_inactive_show[kolom_unit],
+            'Tren_Bulanan': abbm.trend_wide(df_trend_global, pd.concat([df_active, df_inactive_show]), *(trend_range or (None, None)))
+        }
+
+    def buat_export(writer):
+        def generate():
+            with tempfile.TemporaryFile() as buffer:
+                writer(export_sheets(), buffer)
+                buffer.seek(0)
+                return buffer.read()
+        return generate
+
+    col_xlsx, col_parquet, _ = st.columns([1, 1, 2])
+    col_xlsx.download_button("⬇️ Export Excel (.xlsx)", data=buat_export(abbm.write_excel_stream),
+                             file_name="Laporan_BBM_Alat_Berat.xlsx", on_click="ignore",
+                             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    if PARQUET_TERSEDIA:
+        col_parquet.download_button("⬇️ Export Parquet (.zip)", data=buat_export(abbm.write_parquet_zip),
+                                    file_name="Laporan_BBM_Alat_Berat_parquet.zip", on_click="ignore", mime="application/zip")
 
     st.markdown("---")
 
     # --- TABS ---
-    tab_a, tab_b, tab_c, tab_d = st.tabs(["📋 Overview Data", "📊 Efisiensi Setiap Unit", "📉 Persebaran Efisiensi Setiap Unit", "⛽ Unit Terboros"])
+    # on_change="rerun" membuat tab stateful: hanya isi tab yang sedang dibuka yang dijalankan,
+    # sehingga tabel & grafik di tab lain tidak ikut dibangun pada setiap interaksi
+    tab_a, tab_b, tab_c, tab_d, tab_e, tab_f, tab_g, tab_h, tab_i, tab_j, tab_k, tab_l = st.tabs(["📋 Overview Data", "📊 Efisiensi Setiap Unit", "📉 Persebaran Efisiensi Setiap Unit", "⛽ Unit Terboros", "🔁 Fill-to-Fill", "🛢️ BBM Tanpa Jam Kerja", "⚖️ Perbandingan Periode", "🗺️ Heatmap Pemborosan", "📈 Tren Memburuk", "🔄 Rekonsiliasi HM", "🗓️ Kelengkapan Data", "📦 BBM per Container"], key='tab_dashboard', on_change="rerun")
 
     # Tab A: Data Detail
     with tab_a:
-        st.subheader("Detail Unit Aktif")
-        st.info(f"**Total Pemborosan**: **{total_waste:,.0f} Liter** setara dengan **Rp {total_loss_rp:,.0f}**")
+        if tab_a.open:
+            st.subheader("Detail Unit Aktif")
         
-        df_display_active = df_active[['Unit_Name', 'Jenis_Alat', 'Type_Merk', 'Horse_Power', 'Capacity', 'Lokasi', 'Total_Liter', 'Total_HM_Work', 'Group_Benchmark_Median', 'Fuel_Ratio', 'Performance_Status', 'Potensi_Pemborosan_Liter']].copy()
-        df_display_active.sort_values(by='Fuel_Ratio', ascending=False, inplace=True)
-        df_display_active['Capacity'] = df_display_active.apply(format_capacity_with_unit, axis=1)
+            df_display_active = df_active[['Unit_Name', 'Jenis_Alat', 'Type_Merk', 'Horse_Power', 'Capacity', 'Lokasi', 'Total_Liter', 'Total_HM_Work', 'Group_Benchmark_Median', 'Fuel_Ratio', 'Performance_Status', 'Potensi_Pemborosan_Liter']].copy()
+            df_display_active.sort_values(by='Fuel_Ratio', ascending=False, inplace=True)
+            df_display_active['Capacity'] = format_capacity_series(df_display_active)
         
-        rename_map_active = {'Unit_Name': 'Unit', 'Type_Merk': 'Type/Merk', 'Total_Liter': 'Total_Pengisian_BBM', 'Total_HM_Work': 'Total_Jam_Kerja', 'Group_Benchmark_Median': 'Benchmark', 'Performance_Status': 'Status_BBM', 'Potensi_Pemborosan_Liter': 'Potensi_Pemborosan_BBM'}
-        df_display_active.rename(columns=rename_map_active, inplace=True)
-
-        # Fix konsistensi warna teks
-        def highlight_status(row):
-            status = str(row['Status_BBM']).upper()
-            if status == 'EFISIEN':
-                return [f'background-color: #2ca02c; color: white' if col == 'Fuel_Ratio' else '' for col in row.index]
-            elif status == 'BOROS':
-                return [f'background-color: #d62728; color: white' if col == 'Fuel_Ratio' else '' for col in row.index]
-            else:
-                return ['' for _ in row.index]
+            rename_map_active = {'Unit_Name': 'Unit', 'Type_Merk': 'Type/Merk', 'Total_Liter': 'Total_Pengisian_BBM', 'Total_HM_Work': 'Total_Jam_Kerja', 'Group_Benchmark_Median': 'Benchmark', 'Performance_Status': 'Status_BBM', 'Potensi_Pemborosan_Liter': 'Potensi_Pemborosan_BBM'}
+            df_display_active.rename(columns=rename_map_active, inplace=True)
 
-        st.dataframe(df_display_active.style.format({'Horse_Power': '{:.0f}', 'Total_Pengisian_BBM': '{:,.0f}', 'Total_Jam_Kerja': '{:,.0f}', 'Fuel_Ratio': '{:.2f}', 'Benchmark': '{:.2f}', 'Potensi_Pemborosan_BBM': '{:,.0f}'}).apply(highlight_status, axis=1))
-        
-        st.markdown("---")
-        st.markdown("### Efisiensi BBM Bulanan Setiap Unit")
+            tampilkan_tabel_status(df_display_active, {'Horse_Power': '{:.0f}', 'Total_Pengisian_BBM': '{:,.0f}', 'Total_Jam_Kerja': '{:,.0f}', 'Fuel_Ratio': '{:.2f}', 'Benchmark': '{:.2f}', 'Potensi_Pemborosan_BBM': '{:,.0f}'})
         
-        list_unit_active = df_display_active['Unit'].unique().tolist()
+            st.markdown("---")
+            st.markdown("### Efisiensi BBM Bulanan Setiap Unit")
         
-        if list_unit_active and df_trend_global is not None:
-            selected_unit_active = st.selectbox("Pilih Unit yang Diinginkan:", list_unit_active, key='sb_active')
-            df_trend_filtered = df_trend_global[df_trend_global['Unit_Name'] == selected_unit_active]
-            
-            unit_benchmark = df_active[df_active['Unit_Name'] == selected_unit_active]['Group_Benchmark_Median'].iloc[0] if not df_active[df_active['Unit_Name'] == selected_unit_active].empty else 0
-
-            if not df_trend_filtered.empty:
-                fig_trend = px.line(df_trend_filtered, x='Bulan', y='Fuel_Ratio', markers=True, 
-                                    title=f"Pergerakan Fuel Ratio {selected_unit_active} (Bulanan)",
-                                    labels={'Bulan': 'Bulan', 'Fuel_Ratio': 'Fuel Ratio'})
-                
-                all_y = df_trend_filtered['Fuel_Ratio'].tolist() + [unit_benchmark]
-                min_y, max_y = min(all_y), max(all_y)
-                padding = (max_y - min_y) * 0.2 if max_y > min_y else (max_y * 0.2 if max_y > 0 else 1.0)
-                fig_trend.update_yaxes(range=[max(0, min_y - padding), max_y + padding])
+            # Fragment: memilih unit hanya merender ulang grafik tren
+            @st.fragment
+            def tampilkan_tren_unit(list_unit_active, benchmark_per_unit, trend_per_unit, trend_range):
+                if list_unit_active and trend_per_unit is not None:
+                    selected_unit_active = st.selectbox("Pilih Unit yang Diinginkan:", list_unit_active, key='sb_active')
+                    unit_benchmark = benchmark_per_unit.get(selected_unit_active, 0)
+
+                    # Grafik disimpan per (unit, benchmark, rentang) sehingga berpindah unit tidak membangun ulang grafik
+                    fig_key = (selected_unit_active, round(float(unit_benchmark), 2), trend_range)
+                    fig_cache = st.session_state.setdefault('trend_fig_cache', {})
+                    fig_trend = fig_cache.get(fig_key)
+
+                    if fig_trend is None and selected_unit_active in trend_per_unit:
+                        bulan, ratio = abbm.slice_trend(trend_per_unit[selected_unit_active], *(trend_range or (None, None)))
+                        if len(bulan):
+                            fig_trend = px.line(x=bulan, y=ratio, markers=True, 
+                                                title=f"Pergerakan Fuel Ratio {selected_unit_active} (Bulanan)",
+                                                labels={'x': 'Bulan', 'y': 'Fuel Ratio'})
+
+                            min_y, max_y = min(ratio.min(), unit_benchmark), max(ratio.max(), unit_benchmark)
+                            padding = (max_y - min_y) * 0.2 if max_y > min_y else (max_y * 0.2 if max_y > 0 else 1.0)
+                            fig_trend.update_yaxes(range=[max(0, min_y - padding), max_y + padding])
+
+                            fig_trend.add_hline(y=unit_benchmark, line_dash="dash", line_color="red", annotation_text=f"Benchmark: {unit_benchmark:.2f} L/Jam", annotation_position="top left", annotation_font_color="white")
+                            if len(fig_cache) >= TREND_FIG_CACHE_MAX: fig_cache.pop(next(iter(fig_cache)))
+                            fig_cache[fig_key] = fig_trend
+
+                    if fig_trend is not None:
+                        st.plotly_chart(fig_trend, use_container_width=True)
+                    else:
+                        st.warning("Data tren bulanan tidak tersedia untuk unit ini.")
 
-                fig_trend.add_hline(y=unit_benchmark, line_dash="dash", line_color="red", annotation_text=f"Benchmark: {unit_benchmark:.2f} L/Jam", annotation_position="top left", annotation_font_color="white")
-                st.plotly_chart(fig_trend, use_container_width=True)
-            else:
-                st.warning("Data tren bulanan tidak tersedia untuk unit ini.")
+            list_unit_active = df_display_active['Unit'].unique().tolist()
+            benchmark_per_unit = dict(zip(df_active['Unit_Name'], df_active['Group_Benchmark_Median']))
+            tampilkan_tren_unit(list_unit_active, benchmark_per_unit, trend_per_unit, trend_range)
 
     # Tab B: Peringkat
     with tab_b:
-        st.subheader("Peringkat Efisiensi Setiap Unit")
-        df_plot_bar = df_active.rename(columns={'Unit_Name': 'Unit'})
+        if tab_b.open:
+            st.subheader("Peringkat Efisiensi Setiap Unit")
+            df_plot_bar = df_active.rename(columns={'Unit_Name': 'Unit'})
+            large_bar = len(df_plot_bar) > BAR_MAX_UNITS
+
+            # Mode data besar: hanya N unit teririt & N unit terboros yang digambar per batang,
+            # sebaran seluruh unit ditampilkan sebagai histogram
+            if large_bar:
+                st.caption(f"Mode data besar: {len(df_plot_bar):,} unit. Ditampilkan {BAR_TOP_N} unit teririt, {BAR_TOP_N} unit terboros, dan sebaran Fuel Ratio seluruh unit.")
+                df_plot_bar = pd.concat([df_plot_bar.head(BAR_TOP_N), df_plot_bar.tail(BAR_TOP_N)]).drop_duplicates('Unit')
         
-        # Bar chart warna kategori & urutan terkecil ke terbesar
-        fig_bar = px.bar(df_plot_bar, x='Unit', y='Fuel_Ratio', color='Performance_Status',
-                         color_discrete_map={'EFISIEN': '#2ca02c', 'BOROS': '#d62728'},
-                         text_auto='.2f', 
-                         title=f"Konsumsi BBM (Liter/Jam)", 
-                         labels={'Fuel_Ratio': 'Fuel Ratio', 'Lokasi': 'Lokasi', 'Horse_Power': 'Horse Power', 'Group_Benchmark_Median': 'Benchmark'}, 
-                         hover_data={'Lokasi': True, 'Horse_Power': True, 'Group_Benchmark_Median': ':.2f'})
+            # Bar chart warna kategori & urutan terkecil ke terbesar
+            fig_bar = px.bar(df_plot_bar, x='Unit', y='Fuel_Ratio', color='Performance_Status',
+                             color_discrete_map={'EFISIEN': '#2ca02c', 'BOROS': '#d62728'},
+                             text_auto='.2f', 
+                             title=f"Konsumsi BBM (Liter/Jam)" if not large_bar else f"Konsumsi BBM (Liter/Jam): {BAR_TOP_N} Teririt & {BAR_TOP_N} Terboros", 
+                             labels={'Fuel_Ratio': 'Fuel Ratio', 'Lokasi': 'Lokasi', 'Horse_Power': 'Horse Power', 'Group_Benchmark_Median': 'Benchmark'}, 
+                             hover_data={'Lokasi': True, 'Horse_Power': True, 'Group_Benchmark_Median': ':.2f'})
         
-        fig_bar.update_layout(xaxis={'categoryorder':'array', 'categoryarray': df_plot_bar['Unit']})
+            fig_bar.update_layout(xaxis={'categoryorder':'array', 'categoryarray': df_plot_bar['Unit']})
         
-        st.plotly_chart(fig_bar, use_container_width=True)
+            st.plotly_chart(fig_bar, use_container_width=True)
+
+            if large_bar:
+                # Histogram dihitung di server (tepi bin sama untuk semua status), browser hanya menerima jumlah per bin
+                ratio = df_active['Fuel_Ratio'].to_numpy(dtype=np.float64)
+                valid = np.isfinite(ratio)
+                edges = np.histogram_bin_edges(ratio[valid], bins=HIST_BINS)
+                status = df_active['Performance_Status'].to_numpy()[valid]
+                df_hist = pd.concat([pd.DataFrame({'Fuel_Ratio': (edges[:-1] + edges[1:]) / 2, 'Jumlah_Unit': np.histogram(ratio[valid][status == s], bins=edges)[0],
+                                                   'Rentang': [f"{lo:.2f} - {hi:.2f}" for lo, hi in zip(edges[:-1], edges[1:])], 'Performance_Status': s})
+                                     for s in pd.unique(status)], ignore_index=True)
+                fig_hist = px.bar(df_hist, x='Fuel_Ratio', y='Jumlah_Unit', color='Performance_Status', barmode='overlay', opacity=0.75,
+                                  color_discrete_map={'EFISIEN': '#2ca02c', 'BOROS': '#d62728'}, hover_data={'Fuel_Ratio': False, 'Rentang': True},
+                                  title="Sebaran Fuel Ratio Seluruh Unit", labels={'Fuel_Ratio': 'Fuel Ratio (Liter/Jam)', 'Jumlah_Unit': 'Jumlah Unit', 'Performance_Status': 'Status_BBM'})
+                fig_hist.update_traces(width=edges[1] - edges[0])
+                fig_hist.update_layout(yaxis_title="Jumlah Unit", bargap=0)
+                st.plotly_chart(fig_hist, use_container_width=True)
         
     # Tab C: Scatter
     with tab_c:
-        st.subheader("Jam Kerja vs BBM")
-        color_map_status = {"EFISIEN": "#2ca02c", "BOROS": "#d62728"}
-        labels_map = {'Total_HM_Work': 'Total_Jam_Kerja', 'Total_Liter': 'Total_Pengisian_BBM', 'Potensi_Pemborosan_Liter': 'Potensi_Pemborosan_BBM', 'Performance_Status': 'Status_BBM', 'Unit_Name': 'Unit', 'Lokasi': 'Lokasi', 'Group_Benchmark_Median': 'Benchmark'}
-
-        # Menyiapkan kolom size
-        df_active['Scatter_Size'] = df_active['Potensi_Pemborosan_Liter'].apply(lambda x: 1000 + x if x > 0 else 1000)
-
-        fig_scat = px.scatter(df_active, x='Total_HM_Work', y='Total_Liter', color='Performance_Status', size='Scatter_Size', hover_name='Unit_Name', 
-                              hover_data={'Performance_Status': False, 'Total_HM_Work': ':,.0f', 'Total_Liter': ':,.0f', 'Scatter_Size': False, 'Fuel_Ratio': ':.2f', 'Group_Benchmark_Median': ':.2f', 'Potensi_Pemborosan_Liter': ':,.0f', 'Lokasi': True, 'Horse_Power': False}, 
-                              color_discrete_map=color_map_status, labels=labels_map, title="Sebaran Efisiensi Setiap Unit")
-        st.plotly_chart(fig_scat, use_container_width=True)
+        if tab_c.open:
+            st.subheader("Jam Kerja vs BBM")
+            color_map_status = {"EFISIEN": "#2ca02c", "BOROS": "#d62728"}
+            labels_map = {'Total_HM_Work': 'Total_Jam_Kerja', 'Total_Liter': 'Total_Pengisian_BBM', 'Potensi_Pemborosan_Liter': 'Potensi_Pemborosan_BBM', 'Performance_Status': 'Status_BBM', 'Unit_Name': 'Unit', 'Lokasi': 'Lokasi', 'Group_Benchmark_Median': 'Benchmark'}
+
+            # Menyiapkan kolom size
+            df_plot_scat = df_active.assign(Scatter_Size=1000 + df_active['Potensi_Pemborosan_Liter'].clip(lower=0))
+
+            # Batasi jumlah titik yang dikirim ke browser: unit terboros selalu tampil, sisanya sampel
+            if len(df_plot_scat) > SCATTER_MAX_POINTS:
+                df_top_waste = df_plot_scat.nlargest(SCATTER_MAX_POINTS // 2, 'Potensi_Pemborosan_Liter')
+                df_sample = df_plot_scat.drop(df_top_waste.index).sample(SCATTER_MAX_POINTS - len(df_top_waste), random_state=0)
+                st.caption(f"Mode data besar: {SCATTER_MAX_POINTS:,} dari {len(df_plot_scat):,} unit ditampilkan ({len(df_top_waste):,} pemborosan terbesar + sampel acak).")
+                df_plot_scat = pd.concat([df_top_waste, df_sample])
+
+            fig_scat = px.scatter(df_plot_scat, x='Total_HM_Work', y='Total_Liter', color='Performance_Status', size='Scatter_Size', hover_name='Unit_Name', 
+                                  hover_data={'Performance_Status': False, 'Total_HM_Work': ':,.0f', 'Total_Liter': ':,.0f', 'Scatter_Size': False, 'Fuel_Ratio': ':.2f', 'Group_Benchmark_Median': ':.2f', 'Potensi_Pemborosan_Liter': ':,.0f', 'Lokasi': True, 'Horse_Power': False}, 
+                                  color_discrete_map=color_map_status, labels=labels_map, title="Sebaran Efisiensi Setiap Unit",
+                                  render_mode='webgl' if len(df_plot_scat) >= SCATTER_WEBGL_MIN_POINTS else 'auto')
+            st.plotly_chart(fig_scat, use_container_width=True)
 
     # Tab D: Analisa Pemborosan
     with tab_d:
-        st.subheader("Kontribusi Pemborosan Terbesar")
-        df_boros = df_active[df_active['Potensi_Pemborosan_Liter'] > 0].copy()
-        df_boros.rename(columns={'Potensi_Pemborosan_Liter': 'Potensi_Pemborosan_BBM', 'Unit_Name': 'Unit'}, inplace=True)
+        if tab_d.open:
+            st.subheader("Kontribusi Pemborosan Terbesar")
+            df_boros = df_active[df_active['Potensi_Pemborosan_Liter'] > 0].copy()
+            df_boros.rename(columns={'Potensi_Pemborosan_Liter': 'Potensi_Pemborosan_BBM', 'Unit_Name': 'Unit'}, inplace=True)
         
-        if not df_boros.empty:
-            df_boros.sort_values('Potensi_Pemborosan_BBM', ascending=True, inplace=True)
-            fig_waste = px.bar(df_boros.tail(10), x='Potensi_Pemborosan_BBM', y='Unit', orientation='h', title="Unit dengan Potensi Pemborosan Tertinggi (Liter)", text_auto='.0f', color_discrete_sequence=['#c0392b'], labels={'Potensi_Pemborosan_BBM': 'Potensi Pemborosan BBM (Liter)', 'Lokasi': 'Lokasi'}, hover_data=['Lokasi'])
-            st.plotly_chart(fig_waste, use_container_width=True)
-        else:
-            st.success("Tidak ada unit yang terindikasi boros dalam kategori ini.")
+            if not df_boros.empty:
+                df_boros.sort_values('Potensi_Pemborosan_BBM', ascending=True, inplace=True)
+                fig_waste = px.bar(df_boros.tail(10), x='Potensi_Pemborosan_BBM', y='Unit', orientation='h', title="Unit dengan Potensi Pemborosan Tertinggi (Liter)", text_auto='.0f', color_discrete_sequence=['#c0392b'], labels={'Potensi_Pemborosan_BBM': 'Potensi Pemborosan BBM (Liter)', 'Lokasi': 'Lokasi'}, hover_data=['Lokasi'])
+                st.plotly_chart(fig_waste, use_container_width=True)
+            else:
+                st.success("Tidak ada unit yang terindikasi boros dalam kategori ini.")
+
+    # Tab E: Fuel Ratio Fill-to-Fill
+    with tab_e:
+        if tab_e.open:
+            @st.fragment
+            def tampilkan_fill_to_fill(df_daily_global, df_active, date_range, exclude_anomali):
+                st.subheader("Fuel Ratio Antar Pengisian (Fill-to-Fill)")
+                st.caption("Liter setiap pengisian dibagi jam kerja sejak pengisian sebelumnya. Median dan rentang P25-P75 menunjukkan kestabilan konsumsi BBM unit.")
+
+                if df_daily_global is not None:
+                    df_interval_f2f, df_f2f = hitung_fill_to_fill(data_key, date_range, exclude_anomali, df_daily_global)
+                    df_f2f_show = df_active[['Unit_Name', 'Jenis_Alat', 'Lokasi', 'Horse_Power', 'Fuel_Ratio', 'Group_Benchmark_Median']].merge(df_f2f, on='Unit_Name', how='left')
+                    df_f2f_show.sort_values('F2F_Ratio_Median', ascending=False, inplace=True)
+
+                    rename_map_f2f = {'Unit_Name': 'Unit', 'Fuel_Ratio': 'Fuel_Ratio_Periode', 'Group_Benchmark_Median': 'Benchmark', 'F2F_Ratio_Median': 'Fill_to_Fill_Median', 'F2F_Ratio_P25': 'Fill_to_Fill_P25', 'F2F_Ratio_P75': 'Fill_to_Fill_P75', 'F2F_Ratio_Tertimbang': 'Fill_to_Fill_Tertimbang', 'F2F_Ratio_CV': 'Koefisien_Variasi'}
+                    cols_f2f = ['Unit_Name', 'Jenis_Alat', 'Lokasi', 'Horse_Power', 'Fuel_Ratio', 'Group_Benchmark_Median', 'Jumlah_Interval', 'Interval_Tanpa_Jam_Kerja', 'F2F_Ratio_Median', 'F2F_Ratio_P25', 'F2F_Ratio_P75', 'F2F_Ratio_Tertimbang', 'F2F_Ratio_CV']
+                    st.dataframe(df_f2f_show[cols_f2f].rename(columns=rename_map_f2f), hide_index=True)
+
+                    unit_f2f = st.selectbox("Lihat Interval Pengisian Unit:", df_f2f_show['Unit_Name'].tolist(), key='sb_f2f')
+                    df_interval_unit = df_interval_f2f[df_interval_f2f['Unit_Name'] == unit_f2f]
+                    if not df_interval_unit.empty:
+                        fig_f2f = px.bar(df_interval_unit, x='Tanggal_Isi', y='Fuel_Ratio', title=f"Fuel Ratio Setiap Interval Pengisian {unit_f2f}",
+                                         labels={'Tanggal_Isi': 'Tanggal Pengisian', 'Fuel_Ratio': 'Fuel Ratio'}, hover_data={'Liter': ':,.0f', 'Jam_Kerja': ':,.1f', 'Jumlah_Hari': True})
+                        st.plotly_chart(fig_f2f, use_container_width=True)
+                    else:
+                        st.warning("Unit ini belum memiliki interval pengisian yang lengkap.")
+
+            tampilkan_fill_to_fill(df_daily_global, df_active, date_range, exclude_anomali)
+
+    # Tab F: Pengisian Tanpa Jam Kerja & Jam Kerja Tanpa Pengisian
+    with tab_f:
+        if tab_f.open:
+            @st.fragment
+            def tampilkan_bbm_tanpa_jam_kerja(df_daily_global, df_active, date_range):
+                st.subheader("Pengisian BBM Tanpa Jam Kerja")
+                st.caption("Hari dengan pengisian BBM tetapi HM tidak bertambah, serta rangkaian hari dengan HM bertambah tanpa pengisian. Keduanya indikasi kebocoran BBM atau data HM yang tidak tercatat.")
+
+                if df_daily_global is not None:
+                    min_hari_idle = st.slider("Minimal Hari Berturut-turut Kerja Tanpa Isi:", min_value=2, max_value=60, value=abbm.IDLE_MIN_HARI_TANPA_ISI, key='slider_idle')
+                    df_idle_summary, df_isi_tanpa_jam, df_kerja_tanpa_isi = hitung_idle_fuel(data_key, date_range, min_hari_idle, df_daily_global)
+
+                    units_idle = df_active['Unit_Name']
+                    df_idle_summary = df_idle_summary[df_idle_summary['Unit_Name'].isin(units_idle)].sort_values('Liter_Isi_Tanpa_Jam_Kerja', ascending=False)
+                    df_isi_tanpa_jam = df_isi_tanpa_jam[df_isi_tanpa_jam['Unit_Name'].isin(units_idle)]
+                    df_kerja_tanpa_isi = df_kerja_tanpa_isi[df_kerja_tanpa_isi['Unit_Name'].isin(units_idle)]
+
+                    i1, i2, i3 = st.columns(3)
+                    i1.metric("Hari Isi Tanpa Jam Kerja", f"{len(df_isi_tanpa_jam):,} Hari")
+                    i2.metric("BBM Tanpa Jam Kerja", f"{df_isi_tanpa_jam['LITER'].sum():,.0f} Liter")
+                    i3.metric("Periode Kerja Tanpa Isi", f"{len(df_kerja_tanpa_isi):,} Periode")
+
+                    rename_map_idle = {'Unit_Name': 'Unit', 'Date': 'Tanggal', 'LITER': 'Pengisian_BBM', 'Delta_HM': 'Jam_Kerja'}
+                    st.dataframe(df_idle_summary.rename(columns=rename_map_idle), hide_index=True)
+
+                    with st.expander(f"Detail {len(df_isi_tanpa_jam)} Hari Isi Tanpa Jam Kerja"):
+                        st.dataframe(df_isi_tanpa_jam.rename(columns=rename_map_idle), hide_index=True)
+                    with st.expander(f"Detail {len(df_kerja_tanpa_isi)} Periode Kerja Tanpa Isi (≥ {min_hari_idle} Hari)"):
+                        st.dataframe(df_kerja_tanpa_isi.rename(columns=rename_map_idle), hide_index=True)
+
+                    # Workbook baru dibangun saat tombol diklik
+                    st.download_button("Download Laporan BBM Tanpa Jam Kerja (.xlsx)",
+                                       data=lambda: abbm.write_excel_stream({'Ringkasan': df_idle_summary.rename(columns=rename_map_idle),
+                                                                             'Isi_Tanpa_Jam_Kerja': df_isi_tanpa_jam.rename(columns=rename_map_idle),
+                                                                             'Kerja_Tanpa_Isi': df_kerja_tanpa_isi.rename(columns=rename_map_idle)}, io.BytesIO()).getvalue(),
+                                       file_name="Laporan_BBM_Tanpa_Jam_Kerja.xlsx", on_click="ignore",
+                                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+            tampilkan_bbm_tanpa_jam_kerja(df_daily_global, df_active, date_range)
+
+    # Tab G: Perbandingan Dua Periode
+    with tab_g:
+        if tab_g.open:
+            @st.fragment
+            def tampilkan_perbandingan_periode(prefix_index, exclude_anomali, sidebar_selections):
+                st.subheader("Perbandingan Efisiensi Antar Periode")
+                st.caption("Fuel Ratio, benchmark dan pemborosan kedua periode dihitung dari index harian yang sudah diproses, tanpa membaca ulang file Excel.")
+
+                if prefix_index is not None:
+                    akhir_data = prefix_index['date_max']
+                    date_min, date_max = prefix_index['date_min'].date(), akhir_data.date()
+                    preset_options = ["Kuartal Terakhir vs Kuartal Sebelumnya", "Tahun Terakhir vs Tahun Sebelumnya", "Pilih Periode Sendiri"]
+                    preset = st.radio("Mode Perbandingan:", preset_options, horizontal=True, key='radio_compare')
+
+                    if preset == preset_options[0]:
+                        q_b = akhir_data.to_period('Q')
+                        periode_a, periode_b = ((q_b - 1).start_time.date(), (q_b - 1).end_time.date()), (q_b.start_time.date(), q_b.end_time.date())
+                    elif preset == preset_options[1]:
+                        y_b = akhir_data.to_period('Y')
+                        periode_a, periode_b = ((y_b - 1).start_time.date(), (y_b - 1).end_time.date()), (y_b.start_time.date(), y_b.end_time.date())
+                    else:
+                        c_a, c_b = st.columns(2)
+                        periode_a = c_a.date_input("Periode A:", value=(date_min, date_min + (date_max - date_min) / 2), min_value=date_min, max_value=date_max, format="DD-MM-YYYY", key='periode_a')
+                        periode_b = c_b.date_input("Periode B:", value=(date_min + (date_max - date_min) / 2, date_max), min_value=date_min, max_value=date_max, format="DD-MM-YYYY", key='periode_b')
+
+                    if len(periode_a) == 2 and len(periode_b) == 2:
+                        st.markdown(f"**Periode A**: {periode_a[0]:%d-%m-%Y} s/d {periode_a[1]:%d-%m-%Y} &nbsp;&nbsp; **Periode B**: {periode_b[0]:%d-%m-%Y} s/d {periode_b[1]:%d-%m-%Y}")
+                        df_compare = abbm.compare_periods(prefix_index, periode_a, periode_b, exclude_anomali=exclude_anomali)
+
+                        # Terapkan filter sidebar yang sama
+                        compare_mask = abbm.filter_mask(abbm.build_filter_index(df_compare), sidebar_selections)
+                        df_compare = df_compare[compare_mask]
+
+                        waste_a, waste_b = df_compare['Potensi_Pemborosan_Liter_A'].sum(), df_compare['Potensi_Pemborosan_Liter_B'].sum()
+                        p1, p2, p3 = st.columns(3)
+                        p1.metric("Pemborosan Periode B", f"{waste_b:,.0f} Liter", delta=f"{waste_b - waste_a:,.0f} Liter vs Periode A", delta_color="inverse")
+                        p2.metric("Unit Berubah Status", f"{int(df_compare['Status_Berubah'].sum())} Unit")
+                        p3.metric("Unit Menjadi BOROS", f"{int((df_compare['Perubahan_Status'] == 'EFISIEN → BOROS').sum())} Unit")
+
+                        rename_map_compare = {'Unit_Name': 'Unit', 'Fuel_Ratio_A': 'Fuel_Ratio_A', 'Fuel_Ratio_B': 'Fuel_Ratio_B', 'Group_Benchmark_Median_A': 'Benchmark_A', 'Group_Benchmark_Median_B': 'Benchmark_B', 'Performance_Status_A': 'Status_BBM_A', 'Performance_Status_B': 'Status_BBM_B', 'Potensi_Pemborosan_Liter_A': 'Pemborosan_A', 'Potensi_Pemborosan_Liter_B': 'Pemborosan_B', 'Delta_Fuel_Ratio': 'Delta_Fuel_Ratio', 'Delta_Pemborosan_Liter': 'Delta_Pemborosan'}
+                        cols_compare = ['Unit_Name', 'Jenis_Alat', 'Lokasi', 'Perubahan_Status'] + list(rename_map_compare)[1:]
+
+                        st.markdown("#### Unit dengan Perubahan Status")
+                        df_flip = df_compare[df_compare['Status_Berubah']].sort_values('Delta_Pemborosan_Liter', ascending=False)
+                        if not df_flip.empty:
+                            st.dataframe(df_flip[cols_compare].rename(columns=rename_map_compare), hide_index=True)
+                        else:
+                            st.success("Tidak ada unit yang berubah status antara kedua periode.")
+
+                        st.markdown("#### Perubahan Fuel Ratio Terbesar")
+                        df_delta = df_compare.dropna(subset=['Delta_Fuel_Ratio'])
+                        df_delta = df_delta.reindex(df_delta['Delta_Fuel_Ratio'].abs().sort_values(ascending=False).index).head(20)
+                        if not df_delta.empty:
+                            fig_delta = px.bar(df_delta.sort_values('Delta_Fuel_Ratio'), x='Delta_Fuel_Ratio', y='Unit_Name', orientation='h', color='Delta_Fuel_Ratio',
+                                               color_continuous_scale=['#2ca02c', '#f0f0f0', '#d62728'], color_continuous_midpoint=0, text_auto='.2f',
+                                               title="Selisih Fuel Ratio (Periode B - Periode A)", labels={'Delta_Fuel_Ratio': 'Selisih Fuel Ratio (L/Jam)', 'Unit_Name': 'Unit'},
+                                               hover_data={'Fuel_Ratio_A': ':.2f', 'Fuel_Ratio_B': ':.2f', 'Lokasi': True})
+                            st.plotly_chart(fig_delta, use_container_width=True)
+                        else:
+                            st.warning("Tidak ada unit yang aktif di kedua periode.")
+
+            tampilkan_perbandingan_periode(prefix_index, exclude_anomali, sidebar_selections)
+
+    # Tab H: Heatmap Pemborosan Lokasi/Jenis Alat × Bulan
+    with tab_h:
+        if tab_h.open:
+            @st.fragment
+            def tampilkan_heatmap(monthly_cube, df_active, exclude_anomali, trend_range):
+                st.subheader("Heatmap Pemborosan per Bulan")
+                st.caption("Diiris dari kubus unit × bulan yang diringkas saat pemrosesan; benchmark mengikuti filter, rentang tanggal dan pengaturan anomali di sidebar.")
+
+                if monthly_cube is not None:
+                    h1, h2 = st.columns(2)
+                    dimensi = h1.radio("Kelompokkan Berdasarkan:", ['Lokasi', 'Jenis_Alat'], format_func=lambda d: d.replace('_', ' '), horizontal=True, key='heatmap_dimensi')
+                    metrik = h2.radio("Warna Berdasarkan:", [abbm.HEATMAP_METRIK_WASTE, abbm.HEATMAP_METRIK_RATIO], horizontal=True, key='heatmap_metrik')
+
+                    df_heat = abbm.heatmap_from_cube(monthly_cube, df_active, dimensi, metrik, exclude_anomali, *(trend_range or (None, None)))
+                    if df_heat.empty or df_heat.shape[1] == 0:
+                        st.warning("Tidak ada data bulanan untuk filter yang dipilih.")
+                    else:
+                        if metrik == abbm.HEATMAP_METRIK_WASTE:
+                            warna = dict(color_continuous_scale='Reds', text_auto=',.0f')
+                        else:
+                            warna = dict(color_continuous_scale=['#2ca02c', '#f7f7f7', '#d62728'], color_continuous_midpoint=0, text_auto='.1f')
+                        fig_heat = px.imshow(df_heat, aspect='auto', labels={'x': 'Bulan', 'y': dimensi.replace('_', ' '), 'color': metrik},
+                                             title=f"{metrik} per {dimensi.replace('_', ' ')} dan Bulan", **warna)
+                        fig_heat.update_layout(height=max(400, 28 * len(df_heat) + 150))
+                        st.plotly_chart(fig_heat, use_container_width=True)
+                        if metrik == abbm.HEATMAP_METRIK_RATIO:
+                            st.caption("Nilai positif = pemakaian BBM kelompok di atas benchmark grup HP-nya pada bulan tersebut (lebih boros).")
+                else:
+                    st.warning("Kubus bulanan belum tersedia. Silakan proses ulang data.")
+
+            tampilkan_heatmap(monthly_cube, df_active, exclude_anomali, trend_range)
+
+    # Tab I: Ranking Unit dengan Tren Fuel Ratio Memburuk
+    with tab_i:
+        if tab_i.open:
+            @st.fragment
+            def tampilkan_tren_memburuk(df_trend_global, df_active, trend_range):
+                st.subheader("Unit dengan Tren Fuel Ratio Paling Memburuk")
+                st.caption(f"Kemiringan regresi linear Fuel Ratio bulanan setiap unit (minimal {abbm.TREN_MIN_BULAN} bulan berjam kerja). Signifikan = t-statistik melewati nilai kritis dua sisi 5%.")
+
+                if df_trend_global is not None:
+                    df_slope = hitung_tren_slope(data_key, trend_range, df_trend_global)
+                    df_slope = df_slope[df_slope['Unit_Name'].isin(df_active['Unit_Name'])]
+
+                    r1, r2 = st.columns([1, 3])
+                    hanya_signifikan = r1.checkbox("Hanya yang signifikan", value=False, key='tren_signifikan')
+                    top_n = r2.slider("Jumlah unit ditampilkan:", min_value=5, max_value=50, value=15, step=5, key='tren_top_n')
+
+                    df_memburuk = df_slope[df_slope['Slope_Per_Bulan'] > 0]
+                    if hanya_signifikan: df_memburuk = df_memburuk[df_memburuk['Signifikan']]
+
+                    t1, t2, t3 = st.columns(3)
+                    t1.metric("Unit Dianalisa", f"{len(df_slope)} Unit")
+                    t2.metric("Memburuk Signifikan", f"{int((df_slope['Status_Tren'] == 'MEMBURUK').sum())} Unit")
+                    t3.metric("Membaik Signifikan", f"{int((df_slope['Status_Tren'] == 'MEMBAIK').sum())} Unit")
+
+                    if df_memburuk.empty:
+                        st.success("Tidak ada unit dengan tren Fuel Ratio memburuk untuk filter yang dipilih.")
+                    else:
+                        df_top = df_memburuk.head(top_n)
+                        fig_slope = px.bar(df_top.sort_values('Slope_Persen_Per_Bulan'), x='Slope_Persen_Per_Bulan', y='Unit_Name', orientation='h',
+                                           color='Status_Tren', color_discrete_map={'MEMBURUK': '#d62728', 'STABIL': '#ff7f0e'}, text_auto='.1f',
+                                           title=f"{len(df_top)} Unit dengan Kenaikan Fuel Ratio Tercepat",
+                                           labels={'Slope_Persen_Per_Bulan': 'Kenaikan Fuel Ratio (% per Bulan)', 'Unit_Name': 'Unit', 'Status_Tren': 'Status Tren'},
+                                           hover_data={'Slope_Per_Bulan': ':.2f', 'T_Stat': ':.2f', 'Jumlah_Bulan': True})
+                        fig_slope.update_layout(height=max(400, 25 * len(df_top) + 150))
+                        st.plotly_chart(fig_slope, use_container_width=True)
+
+                        # Pergerakan bulanan 5 unit teratas (padanan Visualisasi_Tren_Memburuk.png)
+                        top_units = df_top['Unit_Name'].head(5).tolist()
+                        df_line = df_trend_global[df_trend_global['Unit_Name'].isin(top_units) & (df_trend_global['Fuel_Ratio'] > 0)]
+                        if trend_range: df_line = df_line[df_line['Bulan'].between(*trend_range)]
+                        fig_line = px.line(df_line.sort_values('Bulan'), x='Bulan', y='Fuel_Ratio', color='Unit_Name', markers=True,
+                                           title=f"{len(top_units)} Unit dengan Tren Efisiensi Paling Buruk",
+                                           labels={'Fuel_Ratio': 'Konsumsi BBM (Liter/Jam)', 'Unit_Name': 'Unit'})
+                        st.plotly_chart(fig_line, use_container_width=True)
+
+                        rename_map_slope = {'Unit_Name': 'Unit', 'Fuel_Ratio_Rata_Rata': 'Rata_Rata_Fuel_Ratio', 'Slope_Per_Bulan': 'Kenaikan_L/Jam_per_Bulan', 'Slope_Persen_Per_Bulan': 'Kenaikan_%_per_Bulan', 'T_Stat': 'T_Stat', 'Status_Tren': 'Status_Tren'}
+                        df_tabel = df_memburuk.merge(df_active[['Unit_Name', 'Jenis_Alat', 'Lokasi']], on='Unit_Name', how='left')
+                        st.dataframe(df_tabel[['Unit_Name', 'Jenis_Alat', 'Lokasi', 'Jumlah_Bulan'] + list(rename_map_slope)[1:]].rename(columns=rename_map_slope).round(2), hide_index=True)
+
+            tampilkan_tren_memburuk(df_trend_global, df_active, trend_range)
+
+    # Tab J: Rekonsiliasi HM Transaksi BBM vs Laporan HMU Cabang
+    with tab_j:
+        if tab_j.open:
+            @st.fragment
+            def tampilkan_rekonsiliasi_hm(rekon_hm, units_view, tanggal_gagal, file_gagal):
+                st.subheader("Rekonsiliasi HM Transaksi BBM vs Laporan HMU Cabang")
+                st.caption(f"Setiap HM pada transaksi BBM dipasangkan dengan HMU unit yang sama pada tanggal yang sama atau ±{hmu.REKON_TOLERANSI_HARI} hari (dipilih selisih terkecil). Selisih ≤ {hmu.REKON_TOLERANSI_JAM:g} jam dianggap cocok.")
+                if file_gagal:
+                    st.warning(f"{len(file_gagal)} laporan HMU gagal dibaca dan dilewati: " + "; ".join(f"{nama} ({pesan})" for nama, pesan in file_gagal.items()))
+                if tanggal_gagal:
+                    st.warning(f"{sum(tanggal_gagal.values()):,} baris laporan HMU dilewati karena tanggalnya tidak terbaca: " + ", ".join(f"{nama} ({n:,})" for nama, n in tanggal_gagal.items()))
+
+                if rekon_hm is not None:
+                    df_rekon, df_rekon_summary = rekon_hm
+                    df_rekon = df_rekon[df_rekon['Unit_Name'].isin(units_view)]
+                    df_rekon_summary = df_rekon_summary[df_rekon_summary['Unit_Name'].isin(units_view)]
+                    jumlah_status = df_rekon['Status_Rekon'].value_counts()
+                    terpasang = len(df_rekon) - jumlah_status.get(hmu.STATUS_REKON_TANPA_HMU, 0)
+
+                    k1, k2, k3, k4 = st.columns(4)
+                    k1.metric("Pembacaan HM BBM", f"{len(df_rekon):,}", help=f"{jumlah_status.get(hmu.STATUS_REKON_TANPA_HMU, 0):,} tanpa pasangan HMU")
+                    k2.metric("Cocok", f"{100 * jumlah_status.get(hmu.STATUS_REKON_COCOK, 0) / terpasang:.1f}%" if terpasang else "-")
+                    k3.metric("BBM > HMU", f"{jumlah_status.get(hmu.STATUS_REKON_BBM_LEBIH, 0):,}")
+                    k4.metric("HMU > BBM", f"{jumlah_status.get(hmu.STATUS_REKON_HMU_LEBIH, 0):,}")
+
+                    rename_map_rekon = {'Unit_Name': 'Unit', 'Date': 'Tanggal', 'Selisih_HM': 'Selisih (BBM - HMU)', 'Status_Rekon': 'Status'}
+                    df_rekon_summary = df_rekon_summary.sort_values(['BBM_Lebih_Besar', 'HMU_Lebih_Besar'], ascending=False)
+                    st.dataframe(df_rekon_summary.rename(columns=rename_map_rekon), hide_index=True)
+
+                    status_pilih = st.multiselect("Tampilkan Status:", hmu.STATUS_REKON, default=[hmu.STATUS_REKON_BBM_LEBIH, hmu.STATUS_REKON_HMU_LEBIH], key='rekon_status')
+                    df_selisih = df_rekon[df_rekon['Status_Rekon'].isin(status_pilih)]
+                    with st.expander(f"Detail {len(df_selisih):,} Pembacaan HM"):
+                        st.dataframe(df_selisih.rename(columns=rename_map_rekon), hide_index=True)
+
+                    st.download_button("Download Laporan Rekonsiliasi HM (.xlsx)",
+                                       data=lambda: abbm.write_excel_stream({'Ringkasan': df_rekon_summary.rename(columns=rename_map_rekon),
+                                                                             'Selisih_HM': df_rekon[df_rekon['Status_Rekon'] != hmu.STATUS_REKON_COCOK].rename(columns=rename_map_rekon)}, io.BytesIO()).getvalue(),
+                                       file_name="Laporan_Rekonsiliasi_HM.xlsx", on_click="ignore",
+                                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+                else:
+                    st.info("Upload laporan HMU cabang (menu 3 di sidebar) lalu proses ulang data untuk menjalankan rekonsiliasi.")
+
+            tampilkan_rekonsiliasi_hm(hasil_hmu['rekon'] if hasil_hmu else None, pd.concat([df_active['Unit_Name'], df_inactive_show['Unit_Name']]), hasil_hmu.get('tanggal_gagal') if hasil_hmu else None, hasil_hmu.get('file_gagal') if hasil_hmu else None)
+
+    # Tab K: Kelengkapan Data Bulanan (Matrix Unit × Bulan)
+    with tab_k:
+        if tab_k.open:
+            @st.fragment
+            def tampilkan_kelengkapan(coverage_bbm, coverage_hmu, units_view, trend_range):
+                st.subheader("Kelengkapan Data Bulanan Setiap Unit")
+                st.caption("Bulan dianggap ada data bila unit memiliki minimal satu pembacaan HM atau pengisian BBM (laporan HMU: minimal satu pembacaan HMU). Rentang bulan mengikuti rentang tanggal di sidebar.")
+
+                sumber_options = ["Transaksi BBM"] + (["Laporan HMU Cabang"] if coverage_hmu is not None else [])
+                sumber = st.radio("Sumber Data:", sumber_options, horizontal=True, key='kelengkapan_sumber')
+                coverage = coverage_bbm if sumber == sumber_options[0] else coverage_hmu
+
+                if coverage is not None:
+                    df_cov = abbm.coverage_summary(coverage, *(trend_range or (None, None)))
+                    if sumber == sumber_options[0]: df_cov = df_cov[df_cov['Unit_Name'].isin(units_view)]
+                    jumlah_status = df_cov['Status_Kelengkapan'].value_counts()
+
+                    c1, c2, c3 = st.columns(3)
+                    c1.metric("Lengkap", f"{jumlah_status.get(abbm.STATUS_LENGKAP, 0)} Unit")
+                    c2.metric("Tidak Lengkap", f"{jumlah_status.get(abbm.STATUS_TIDAK_LENGKAP, 0)} Unit")
+                    c3.metric("Tidak Ada Data", f"{jumlah_status.get(abbm.STATUS_TIDAK_ADA_DATA, 0)} Unit")
+
+                    df_kurang = df_cov[df_cov['Status_Kelengkapan'] != abbm.STATUS_LENGKAP].sort_values(['Bulan_Hilang_Terpanjang', 'Jumlah_Bulan_Hilang'], ascending=False)
+                    if df_kurang.empty:
+                        st.success("Semua unit memiliki data di setiap bulan pada rentang yang dipilih.")
+                    else:
+                        # Peta keberadaan data unit tidak lengkap (dibatasi BAR_MAX_UNITS baris dengan celah terpanjang)
+                        df_peta = df_kurang.head(BAR_MAX_UNITS)
+                        lo = 0 if trend_range is None else np.searchsorted(coverage['bulan'], trend_range[0], side='left')
+                        hi = len(coverage['bulan']) if trend_range is None else np.searchsorted(coverage['bulan'], trend_range[1], side='right')
+                        ada = coverage['ada'][coverage['units'].get_indexer(df_peta['Unit_Name']), lo:hi].astype(int)
+                        fig_cov = px.imshow(ada, x=list(coverage['bulan'][lo:hi]), y=df_peta['Unit_Name'].tolist(), aspect='auto', zmin=0, zmax=1,
+                                            color_continuous_scale=['#d62728', '#2ca02c'], labels={'x': 'Bulan', 'y': 'Unit', 'color': 'Ada Data'},
+                                            title=f"Keberadaan Data Bulanan {len(df_peta)} Unit Tidak Lengkap")
+                        fig_cov.update_layout(height=max(400, 22 * len(df_peta) + 150), coloraxis_showscale=False)
+                        st.plotly_chart(fig_cov, use_container_width=True)
+
+                        rename_map_cov = {'Unit_Name': 'Unit', 'Status_Kelengkapan': 'Status'}
+                        st.dataframe(df_kurang.drop(columns='Mask_Bulan_Hilang').rename(columns=rename_map_cov), hide_index=True)
+                else:
+                    st.warning("Matrix kelengkapan belum tersedia. Silakan proses ulang data.")
+
+            tampilkan_kelengkapan(coverage_bbm, hasil_hmu['coverage'] if hasil_hmu else None, pd.concat([df_active['Unit_Name'], df_inactive_show['Unit_Name']]), trend_range)
+
+    # Tab L: Efisiensi BBM per Container Cabang
+    with tab_l:
+        if tab_l.open:
+            @st.fragment
+            def tampilkan_bbm_per_container(monthly_cube, df_units_view, exclude_anomali, trend_range, df_moves):
+                st.subheader("Efisiensi BBM per Container Setiap Cabang")
+                st.caption(f"Liter BBM unit per Lokasi (depo digabung ke cabang induknya) dibagi jumlah container seluruh status per cabang & bulan. Liter per container 20/40 Feet dibagi menurut TEU (40 Feet = 2 × 20 Feet). Bulan container dianggap tahun {sc.CONTAINER_TAHUN}.")
+
+                if df_moves is not None and monthly_cube is not None:
+                    df_liter = abbm.cube_totals(monthly_cube, df_units_view, 'Lokasi', 'LITER_Non_Anomali' if exclude_anomali else 'LITER', *(trend_range or (None, None)))
+                    df_eff, lokasi_tanpa_cabang = sc.fuel_per_container(df_liter.rename(columns={'LITER_Non_Anomali': 'LITER'}), df_moves)
+                    df_eff_total = sc.fuel_per_container_total(df_eff)
+
+                    if df_eff_total.empty:
+                        st.warning("Tidak ada Lokasi unit yang cocok dengan cabang pada data container untuk filter yang dipilih.")
+                    else:
+                        total_liter, total_teu = df_eff_total['Liter'].sum(), df_eff_total['TEU'].sum()
+                        e1, e2, e3 = st.columns(3)
+                        e1.metric("Total BBM Cabang", f"{total_liter:,.0f} Liter")
+                        e2.metric("Total Container", f"{df_eff_total['Total_Container'].sum():,.0f}", help=f"{total_teu:,.0f} TEU")
+                        e3.metric("Rata-rata BBM", f"{total_liter / total_teu:,.3f} L/TEU" if total_teu > 0 else "-")
+
+                        df_bar = df_eff_total.dropna(subset=['Liter_per_TEU']).sort_values('Liter_per_TEU')
+                        fig_eff = px.bar(df_bar, x='Liter_per_TEU', y='Cabang', orientation='h', color='Liter_per_TEU', color_continuous_scale='Reds', text_auto='.2f',
+                                         title="Liter BBM per TEU Setiap Cabang", labels={'Liter_per_TEU': 'Liter per TEU', 'Cabang': 'Cabang'},
+                                         hover_data={'Liter': ':,.0f', '20 Feet': ':,.0f', '40 Feet': ':,.0f'})
+                        fig_eff.update_layout(height=max(400, 25 * len(df_bar) + 150), coloraxis_showscale=False)
+                        st.plotly_chart(fig_eff, use_container_width=True)
+
+                        cabang_pilih = st.selectbox("Pilih Cabang:", df_bar['Cabang'].iloc[::-1].tolist(), key='sb_cabang_container')
+                        df_bulan = df_eff[df_eff['Cabang'] == cabang_pilih].sort_values('Bulan')
+                        fig_bulan = px.line(df_bulan, x='Bulan', y=['Liter_per_Container_20', 'Liter_per_Container_40'], markers=True,
+                                            title=f"Liter BBM per Container Bulanan - {cabang_pilih}", labels={'value': 'Liter per Container', 'variable': 'Ukuran'})
+                        st.plotly_chart(fig_bulan, use_container_width=True)
+
+                        st.dataframe(df_eff_total.round(3), hide_index=True)
+                        if not lokasi_tanpa_cabang.empty:
+                            st.warning(f"{len(lokasi_tanpa_cabang)} Lokasi tidak ditemukan di data container dan tidak dihitung: " + ", ".join(f"{l} ({v:,.0f} L)" for l, v in lokasi_tanpa_cabang.items()))
+
+                        st.download_button("Download Efisiensi BBM per Container (.xlsx)",
+                                           data=lambda: abbm.write_excel_stream({'Per_Cabang': df_eff_total, 'Per_Cabang_Bulan': df_eff}, io.BytesIO()).getvalue(),
+                                           file_name="Laporan_BBM_per_Container.xlsx", on_click="ignore",
+                                           mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+                else:
+                    st.info("Upload data container cabang (menu 4 di sidebar) untuk menghitung BBM per container.")
+
+            df_moves = hitung_container_cabang(container_hash, sc.CONFIG_VERSION, container_file.getvalue()) if container_file else None
+            tampilkan_bbm_per_container(monthly_cube, pd.concat([df_active, df_inactive_show]), exclude_anomali, trend_range, df_moves)
 
 elif not master_file and not bbm_file:
-    st.info("Silakan upload file berisi data yang dibutuhkan pada menu sebelah kiri untuk memulai analisa.")
\ No newline at end of file
+    st.info("Silakan upload file berisi data yang dibutuhkan pada menu sebelah kiri untuk memulai analisa.")
@@ -0,0 +1,246 @@
+import pandas as pd
+import numpy as np
+import io
+import time
+import tracemalloc
+
+import analisaBBM as abbm
+
+# ==============================================================================
+# 1. KONFIGURASI DATA SINTETIS
+# ==============================================================================
+# Workbook sintetis meniru bentuk file asli tanpa memakai data rahasia:
+# - Master "cost & bbm ... HP & Type.xlsx" Sheet2: baris judul, baris header, satu baris per unit
+# - Transaksi "BBM AAB.xlsx": satu sheet per bulan (JAN..DES); baris 0 = nama unit (merged di atas kolom
+#   unitnya), baris 1 = jenis alat, baris 2 = metrik (HM / LITER / KELUAR / PEMAKAIAN / KET), baris 3+ = harian.
+#   Beberapa tahun ditulis berurutan di sheet bulan yang sama (kolom tanggal yang membedakan tahunnya).
+BULAN_SHEET = ['JAN', 'FEB', 'MAR', 'APR', 'MEI', 'JUN', 'JUL', 'AGT', 'SEP', 'OKT', 'NOV', 'DES']
+
+JENIS_SINTETIS = {
+    # jenis: (daftar merk, daftar HP, daftar kapasitas, jam kerja rata-rata per hari, liter per jam)
+    'FORKLIFT': (['TOYOTA', 'HELI', 'MITSUBISHI', 'KOMATSU'], [70, 100, 125], [3, 5, 7, 10], 6, 4),
+    'REACH STACKER': (['KALMAR', 'SANY', 'HYSTER'], [250, 320], [45], 12, 15),
+    'SIDE LOADER': (['KALMAR', 'HYSTER'], [180, 220], [8, 10], 8, 10),
+    'TOP LOADER': (['KALMAR', 'HYSTER'], [250, 300], [35, 40], 10, 14),
+    'CRANE': (['SHORE CRANE', 'RTG', 'LIEBHERR'], [240, 268, 330], [40, 75, 80], 14, 20),
+    'TRONTON': (['HINO', 'MITSUBISHI FUSO'], [220, 260], [20], 9, 7),
+    'TRAILER': (['HINO', 'VOLVO', 'SCANIA'], [340, 380, 420], [40], 10, 9),
+}
+LOKASI_SINTETIS = ['DEPO MARUNDA', 'DEPO PRIOK', 'DEPO T.LANGON', 'DEPO JAPFA', 'SAMARINDA', 'TIMIKA', 'TUAL',
+                   'BAU-BAU', 'BANJARMASIN', 'KAIMANA', 'BALIKPAPAN', 'KETAPANG', 'JAYAPURA', 'NABIRE', 'PONTIANAK']
+# Kolom non-unit yang harus dilewati pipeline (awalan yang sama dengan daftar pengecualian di process_raw_data)
+KOLOM_SAMPAH = ['GENSET', 'TANGKI', 'KOMPRESSOR', 'MESIN', 'SPBU', 'MOBIL']
+METRIK_LITER = ['LITER', 'KELUAR', 'PEMAKAIAN']
+
+PROPORSI_NAMA_EX = 0.05        # unit dengan header "NAMA LAMA (EX. NAMA MASTER)" (jalur pencocokan EX.)
+PROPORSI_UNIT_LIAR = 0.03      # kolom unit yang tidak ada di master (tidak cocok, ikut dipindai)
+PROPORSI_HM_KOSONG = 0.10      # HM tidak dicatat pada hari tersebut
+PROPORSI_ANOMALI = 0.005       # pengisian ekstrem (mis. 2.000 L)
+
+# ==============================================================================
+# 2. GENERATOR WORKBOOK MASTER & TRANSAKSI BBM
+# ==============================================================================
+def generate_master(n_unit, seed=0):
+    rng = np.random.default_rng(seed)
+    jenis = rng.choice(list(JENIS_SINTETIS), n_unit)
+    rows = []
+    for i, j in enumerate(jenis, start=1):
+        merk_list, hp_list, cap_list = JENIS_SINTETIS[j][:3]
+        merk, cap = rng.choice(merk_list), int(rng.choice(cap_list))
+        # Truk memakai nomor polisi, alat berat memakai nama jenis + merk + kapasitas (nama selalu unik)
+        nama = f"L {9000 + i} {rng.choice(['UR', 'US', 'UT'])}" if j in abbm.TRUCKING_TYPES else f"{j} {merk} {cap}T/{i:04d}"
+        rows.append({'NO.': i, 'NAMA ALAT BERAT': nama, 'DES 2025': rng.choice(LOKASI_SINTETIS), 'ALAT BERAT': j,
+                     'TYPE/MERK': merk, 'CAP': cap, 'HP': int(rng.choice(hp_list))})
+    return pd.DataFrame(rows)
+
+def write_master_workbook(df_master, file_obj):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(file_obj, {'constant_memory': True, 'in_memory': True})
+    worksheet = workbook.add_worksheet('Sheet2')
+    worksheet.write_row(0, 0, [None, 'INVENTORY', 'LOKASI', 'JENIS'])
+    worksheet.write_row(1, 0, list(df_master.columns))
+    for r, row in enumerate(df_master.itertuples(index=False), start=2):
+        worksheet.write_row(r, 0, list(row))
+    workbook.close()
+    return file_obj
+
+def _sheet_columns(df_master, rng):
+    # Susunan kolom satu sheet: (header unit, jenis, [metrik...], indeks unit master atau None)
+    kolom = []
+    for idx, row in enumerate(df_master.itertuples(index=False)):
+        header = row[1]
+        if rng.random() < PROPORSI_NAMA_EX: header = f"{row[3]} LAMA {idx} (EX. {row[1]})"
+        kolom.append((header, row[3], ['HM', rng.choice(METRIK_LITER)] + (['KET'] if rng.random() < 0.2 else []), idx))
+    for k in range(max(1, int(len(df_master) * PROPORSI_UNIT_LIAR))):
+        kolom.append((f"UNIT SEWA {k:03d}", 'LAIN-LAIN', ['HM', 'LITER'], None))
+    for k, nama in enumerate(KOLOM_SAMPAH):
+        kolom.append((f"{nama} {k + 1}", 'NON ALAT', ['LITER'], None))
+    kolom.append(('TOTAL', '', ['LITER'], None))
+    return kolom
+
+def write_bbm_workbook(df_master, file_obj, n_hari=31, n_tahun=1, tahun_awal=2025, seed=0):
+    import xlsxwriter
+
+    rng = np.random.default_rng(seed)
+    kolom = _sheet_columns(df_master, rng)
+    n_unit = len(df_master)
+    jam_rata = np.array([JENIS_SINTETIS[j][3] for j in df_master['ALAT BERAT']], dtype=np.float64)
+    liter_per_jam = np.array([JENIS_SINTETIS[j][4] for j in df_master['ALAT BERAT']], dtype=np.float64) * rng.uniform(0.8, 1.4, n_unit)
+    hm = rng.uniform(1000, 20000, n_unit)
+    tangki = np.zeros(n_unit)
+
+    workbook = xlsxwriter.Workbook(file_obj, {'constant_memory': True, 'in_memory': True})
+    date_format = workbook.add_format({'num_format': 'dd/mm/yyyy'})
+    for bulan_ke, sheet in enumerate(BULAN_SHEET, start=1):
+        worksheet = workbook.add_worksheet(sheet)
+        c = 1
+        worksheet.write(0, 0, 'TANGGAL'); worksheet.write(2, 0, 'TANGGAL')
+        for header, jenis, metrik, _ in kolom:
+            # Header unit di-merge di atas seluruh kolom metriknya (dibaca pandas hanya di kolom pertama)
+            if len(metrik) > 1: worksheet.merge_range(0, c, 0, c + len(metrik) - 1, header)
+            else: worksheet.write(0, c, header)
+            c += len(metrik)
+        c = 1
+        for header, jenis, metrik, _ in kolom:
+            worksheet.write(1, c, jenis); c += len(metrik)
+        worksheet.write_row(2, 1, [m for _, _, metrik, _ in kolom for m in metrik])
+
+        r = 3
+        for tahun in range(tahun_awal, tahun_awal + n_tahun):
+            for tanggal in pd.date_range(f"{tahun}-{bulan_ke:02d}-01", periods=n_hari, freq='D'):
+                if tanggal.month != bulan_ke: break
+                # Jam kerja harian, pengisian saat tangki diperkirakan menipis (tidak setiap hari)
+                kerja = np.where(rng.random(n_unit) < 0.8, rng.gamma(4.0, jam_rata / 4.0), 0.0).round(1)
+                hm += kerja
+                tangki += kerja * liter_per_jam
+                isi = (tangki > 150) & (rng.random(n_unit) < 0.6)
+                liter = np.where(isi, tangki.round(0), 0.0)
+                liter = np.where(isi & (rng.random(n_unit) < PROPORSI_ANOMALI), 2000.0, liter)
+                tangki = np.where(isi, 0.0, tangki)
+                hm_tercatat = rng.random(n_unit) >= PROPORSI_HM_KOSONG
+
+                row = [None]
+                for header, jenis, metrik, idx in kolom:
+                    for m in metrik:
+                        if idx is None: row.append(round(float(rng.uniform(0, 200)), 1) if m != 'HM' and rng.random() < 0.3 else None)
+                        elif m == 'HM': row.append(round(float(hm[idx]), 1) if hm_tercatat[idx] else None)
+                        elif m == 'KET': row.append('ISI' if liter[idx] > 0 else None)
+                        else: row.append(float(liter[idx]) if liter[idx] > 0 else None)
+                worksheet.write_datetime(r, 0, tanggal.to_pydatetime(), date_format)
+                worksheet.write_row(r, 1, row[1:])
+                r += 1
+    workbook.close()
+    return file_obj
+
+def generate_workbooks(n_unit, n_hari=31, n_tahun=1, seed=0):
+    # Pasangan (master, transaksi BBM) dalam memori, siap diberikan ke process_raw_data
+    df_master = generate_master(n_unit, seed)
+    master_buffer = write_master_workbook(df_master, io.BytesIO())
+    bbm_buffer = write_bbm_workbook(df_master, io.BytesIO(), n_hari, n_tahun, seed=seed)
+    master_buffer.seek(0); bbm_buffer.seek(0)
+    return master_buffer, bbm_buffer
+
+# ==============================================================================
+# 3. BENCHMARK WAKTU & MEMORI PER TAHAP
+# ==============================================================================
+# Batas tahap diambil dari callback progress process_raw_data (read/match bergantian per sheet, lalu pivot,
+# benchmark, trend), ditambah tahap pasca-proses yang dijalankan dashboard setelah job selesai.
+# Waktu diukur pada run tanpa tracemalloc; puncak memori diukur pada run terpisah dengan tracemalloc
+# (tracemalloc memperlambat eksekusi sehingga tidak dicampur dengan pengukuran waktu).
+BENCHMARK_SKALA = [(50, 31, 1), (150, 31, 1), (150, 31, 2)]
+TAHAP_PASCA = {
+    'prefix_index': lambda hasil: abbm.build_prefix_index(hasil[3]),
+    'monthly_cube': lambda hasil: abbm.build_monthly_cube(hasil[3]),
+    'trend_per_unit': lambda hasil: abbm.group_trend_by_unit(hasil[2]),
+}
+
+def profile_pipeline(master_bytes, bbm_bytes, ukur_memori=False):
+    tahap_waktu, tahap_memori = {}, {}
+    state = {'stage': None, 't': None}
+
+    def tutup_tahap():
+        if state['stage'] is None: return
+        tahap_waktu[state['stage']] = tahap_waktu.get(state['stage'], 0.0) + time.perf_counter() - state['t']
+        if ukur_memori:
+            _, peak = tracemalloc.get_traced_memory()
+            tahap_memori[state['stage']] = max(tahap_memori.get(state['stage'], 0), peak)
+            tracemalloc.reset_peak()
+
+    def progress(stage, fraction, stats):
+        if stage == state['stage']: return
+        tutup_tahap()
+        state['stage'], state['t'] = stage, time.perf_counter()
+
+    if ukur_memori: tracemalloc.start()
+    try:
+        hasil = abbm.process_raw_data(io.BytesIO(master_bytes), io.BytesIO(bbm_bytes), progress)
+        tutup_tahap()
+        for nama, fungsi in TAHAP_PASCA.items():
+            state['stage'], state['t'] = nama, time.perf_counter()
+            fungsi(hasil)
+            tutup_tahap()
+    finally:
+        if ukur_memori: tracemalloc.stop()
+    return hasil, tahap_waktu, tahap_memori
+
+def run_benchmark(skala=BENCHMARK_SKALA, ulang=1, ukur_memori=True, seed=0, log=print):
+    hasil_rows = []
+    for n_unit, n_hari, n_tahun in skala:
+        t0 = time.perf_counter()
+        master_buffer, bbm_buffer = generate_workbooks(n_unit, n_hari, n_tahun, seed)
+        master_bytes, bbm_bytes = master_buffer.getvalue(), bbm_buffer.getvalue()
+        if log: log(f"Skala {n_unit} unit × {n_hari} hari × {n_tahun} tahun: workbook {len(bbm_bytes) / 2**20:,.1f} MB dibuat dalam {time.perf_counter() - t0:,.1f} dtk")
+
+        # Waktu = median beberapa ulangan; memori dari satu run dengan tracemalloc
+        waktu_runs = []
+        for _ in range(ulang):
+            hasil, tahap_waktu, _ = profile_pipeline(master_bytes, bbm_bytes)
+            waktu_runs.append(tahap_waktu)
+        tahap_memori = profile_pipeline(master_bytes, bbm_bytes, ukur_memori=True)[2] if ukur_memori else {}
+
+        baris_harian = 0 if hasil[3] is None else len(hasil[3])
+        for tahap in abbm.PROSES_TAHAP + list(TAHAP_PASCA):
+            hasil_rows.append({
+                'Unit': n_unit, 'Hari_per_Bulan': n_hari, 'Tahun': n_tahun, 'Baris_Harian': baris_harian,
+                'MB_Workbook': round(len(bbm_bytes) / 2**20, 2), 'Tahap': tahap,
+                'Detik': float(np.median([w.get(tahap, 0.0) for w in waktu_runs])),
+                'Puncak_Memori_MB': tahap_memori[tahap] / 2**20 if tahap in tahap_memori else np.nan,
+            })
+    return pd.DataFrame(hasil_rows)
+
+def format_benchmark(df_bench):
+    # Tabel ringkas: satu baris per skala, kolom = detik tiap tahap + total + puncak memori tertinggi
+    kunci = ['Unit', 'Hari_per_Bulan', 'Tahun', 'Baris_Harian', 'MB_Workbook']
+    urutan = list(dict.fromkeys(df_bench['Tahap']))
+    detik = df_bench.pivot_table(index=kunci, columns='Tahap', values='Detik', sort=False)[urutan]
+    detik['Total_Detik'] = detik.sum(axis=1)
+    detik['Baris_per_Detik'] = detik.index.get_level_values('Baris_Harian') / detik['Total_Detik']
+    detik['Puncak_Memori_MB'] = df_bench.groupby(kunci, sort=False)['Puncak_Memori_MB'].max()
+    return detik.round(2).reset_index()
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark waktu & memori per tahap process_raw_data dengan workbook sintetis")
+    parser.add_argument('--skala', nargs='+', default=None, help="Daftar skala UNITxHARIxTAHUN, mis. 50x31x1 200x31x2")
+    parser.add_argument('--ulang', type=int, default=1, help="Jumlah ulangan pengukuran waktu (diambil median)")
+    parser.add_argument('--tanpa-memori', action='store_true', help="Lewati run tracemalloc")
+    parser.add_argument('--simpan', default=None, help="Simpan hasil mentah ke file CSV")
+    parser.add_argument('--tulis-workbook', default=None, help="Hanya tulis workbook sintetis UNITxHARIxTAHUN ke folder ini")
+    args = parser.parse_args()
+
+    if args.tulis_workbook:
+        import os
+        n_unit, n_hari, n_tahun = map(int, (args.skala or ['50x31x1'])[0].lower().split('x'))
+        df_master = generate_master(n_unit)
+        os.makedirs(args.tulis_workbook, exist_ok=True)
+        with open(os.path.join(args.tulis_workbook, 'Master_Sintetis.xlsx'), 'wb') as f: f.write(write_master_workbook(df_master, io.BytesIO()).getvalue())
+        with open(os.path.join(args.tulis_workbook, 'BBM_Sintetis.xlsx'), 'wb') as f: f.write(write_bbm_workbook(df_master, io.BytesIO(), n_hari, n_tahun).getvalue())
+        print(f"Workbook sintetis ditulis ke {args.tulis_workbook}")
+    else:
+        skala = [tuple(map(int, s.lower().split('x'))) for s in args.skala] if args.skala else BENCHMARK_SKALA
+        df_bench = run_benchmark(skala, ulang=args.ulang, ukur_memori=not args.tanpa_memori)
+        if args.simpan: df_bench.to_csv(args.simpan, index=False)
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(format_benchmark(df_bench).to_string(index=False))
@@ -0,0 +1,295 @@
+import pandas as pd
+import numpy as np
+import os
+import io
+import re
+import glob
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import analisaBBM as abbm
+
+# ==============================================================================
+# 1. KONFIGURASI & NORMALISASI NAMA UNIT
+# ==============================================================================
+HMU_FILE_PATTERN = "*Rpt HMU*"
+HMU_CACHE_DIR = os.path.join(".cache", "hmu")
+HMU_COLUMNS = {'EQUIP NAME': 'Equip_Name', 'PORT': 'Port', 'LOKASI': 'Lokasi', 'JENIS ALAT': 'Jenis_Alat', 'HMU': 'HMU'}
+
+# Versi logika normalisasi; naikkan bila aturan berubah agar cache Parquet lama tidak terpakai
+HMU_PARSER_VERSION = 2
+PARQUET_TERSEDIA = importlib.util.find_spec('pyarrow') is not None
+
+def normalize_unit_name(name):
+    if pd.isna(name): return ""
+    name = str(name).upper().strip()
+
+    # Ganti simbol (/, -, ., _) dengan spasi, perbaiki typo FORKLIF -> FORKLIFT, hapus spasi ganda
+    name = re.sub(r'[/\-._]', ' ', name)
+    name = name.replace('FORKLIF ', 'FORKLIFT ')
+    if name.endswith('FORKLIF'): name = name + 'T'
+    return " ".join(name.split())
+
+def parse_report_range(filename):
+    # "JKT Rpt HMU 01-01-2025-31-01-2025.xlsx" -> (2025-01-01, 2025-01-31)
+    match = re.search(r"(\d{2}-\d{2}-\d{4})-(\d{2}-\d{2}-\d{4})", os.path.basename(filename))
+    if not match: return pd.NaT, pd.NaT
+    return tuple(pd.to_datetime(m, format='%d-%m-%Y') for m in match.groups())
+
+# ==============================================================================
+# 2. BACA & NORMALISASI SATU FILE LAPORAN HMU
+# ==============================================================================
+# Kolom TGL HMU bercampur: teks "dd/mm/yyyy" untuk tanggal 13-31, sedangkan tanggal 1-12 sudah
+# dikonversi Excel menjadi tanggal dengan hari & bulan tertukar (02/01 -> 1 Feb). Sel bertipe tanggal
+# dikembalikan dengan menukar hari & bulan; sel teks dibaca dengan format dd/mm/yyyy. Teks dengan format lain
+# (mis. CSV cabang lain berformat ISO yyyy-mm-dd) dibaca sebagai ISO, lalu sisanya dengan hari di depan.
+def parse_hmu_dates(values):
+    is_text = values.map(lambda v: isinstance(v, str))
+    text = values.where(is_text).str.strip()
+    from_text = pd.to_datetime(text, format='%d/%m/%Y', errors='coerce')
+    sisa = from_text.isna() & text.notna()
+    if sisa.any(): from_text[sisa] = pd.to_datetime(text[sisa], format='ISO8601', errors='coerce')
+    sisa = from_text.isna() & text.notna()
+    if sisa.any(): from_text[sisa] = pd.to_datetime(text[sisa], dayfirst=True, format='mixed', errors='coerce')
+    as_date = pd.to_datetime(values.where(~is_text & values.notna()), errors='coerce')
+    swapped = pd.to_datetime(pd.DataFrame({'year': as_date.dt.year, 'month': as_date.dt.day, 'day': as_date.dt.month}), errors='coerce')
+    return from_text.where(is_text, swapped)
+
+def read_hmu_file(source, name=None):
+    # source = path atau file-like (upload dashboard); name dipakai untuk mengenali CSV/XLSX
+    name = name or source
+    if name.lower().endswith('.csv'): df = pd.read_csv(source, dtype=object)
+    else: df = pd.read_excel(source, engine='openpyxl', dtype=object)
+    df.columns = [str(c).strip().upper() for c in df.columns]
+
+    date_cols = [c for c in df.columns if 'TGL' in c or 'DATE' in c]
+    if 'EQUIP NAME' not in df.columns or 'HMU' not in df.columns or not date_cols:
+        return pd.DataFrame(columns=['Unit_Clean', 'Date'] + list(HMU_COLUMNS.values()))
+
+    df_hmu = df[[c for c in HMU_COLUMNS if c in df.columns]].rename(columns=HMU_COLUMNS)
+    for col in HMU_COLUMNS.values():
+        if col not in df_hmu.columns: df_hmu[col] = None
+    df_hmu['Date'] = parse_hmu_dates(df[date_cols[0]])
+    df_hmu['HMU'] = pd.to_numeric(df_hmu['HMU'], errors='coerce')
+    # Baris berisi tanggal yang tetap tidak terbaca dihitung (disimpan di attrs, ikut tersimpan di cache Parquet)
+    tanggal_gagal = int((df_hmu['Date'].isna() & df[date_cols[0]].notna() & df_hmu['HMU'].notna()).sum())
+    df_hmu = df_hmu.dropna(subset=['Date', 'HMU', 'Equip_Name'])
+
+    for col in ['Equip_Name', 'Port', 'Lokasi', 'Jenis_Alat']:
+        df_hmu[col] = df_hmu[col].astype(str).str.strip().str.upper()
+    # Normalisasi cukup per nama unik, lalu dipetakan balik
+    unique_names = df_hmu['Equip_Name'].unique()
+    df_hmu['Unit_Clean'] = df_hmu['Equip_Name'].map(dict(zip(unique_names, map(normalize_unit_name, unique_names))))
+    df_hmu = df_hmu[['Unit_Clean', 'Date'] + list(HMU_COLUMNS.values())].reset_index(drop=True)
+    df_hmu.attrs['unparsed_dates'] = tanggal_gagal
+    return df_hmu
+
+# ==============================================================================
+# 3. CACHE PARQUET PER FILE (KUNCI = HASH ISI FILE)
+# ==============================================================================
+# File yang isinya tidak berubah dibaca dari cache; menambah satu laporan bulanan baru hanya
+# memproses file itu saja. Tanpa pyarrow, cache dilewati dan file selalu dibaca ulang.
+def hash_path(path):
+    with open(path, 'rb') as f:
+        return abbm.hash_file_bytes(f)
+
+def cache_path_for(file_hash, cache_dir=HMU_CACHE_DIR):
+    return os.path.join(cache_dir, f"{file_hash}_v{HMU_PARSER_VERSION}.parquet")
+
+def read_and_cache_hmu_file(source, cache_file=None, name=None):
+    df_hmu = read_hmu_file(source, name)
+    if cache_file and PARQUET_TERSEDIA:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        df_hmu.to_parquet(tmp_file, index=False)
+        os.replace(tmp_file, cache_file)
+    return df_hmu
+
+# ==============================================================================
+# 4. LOAD SEMUA LAPORAN HMU (PARALEL) + DEDUPLIKASI RENTANG YANG TUMPANG TINDIH
+# ==============================================================================
+def find_hmu_files(base_folder):
+    return sorted(glob.glob(os.path.join(base_folder, "**", f"{HMU_FILE_PATTERN}.xlsx"), recursive=True) +
+                  glob.glob(os.path.join(base_folder, "**", f"{HMU_FILE_PATTERN}.csv"), recursive=True))
+
+def dedupe_overlapping(df_hmu):
+    # Satu pembacaan per unit per tanggal. Bila beberapa file mencakup tanggal yang sama, ambil dari laporan
+    # dengan tanggal akhir paling baru (revisi terakhir), lalu rentang paling sempit (laporan bulanan).
+    span = (df_hmu['Range_End'] - df_hmu['Range_Start']).dt.days
+    order = pd.DataFrame({'end': df_hmu['Range_End'], 'span': span}).fillna({'span': np.inf})
+    df_sorted = df_hmu.assign(_end=order['end'], _span=order['span']).sort_values(['Unit_Clean', 'Date', '_end', '_span'], ascending=[True, True, False, True], kind='stable')
+    return df_sorted.drop_duplicates(['Unit_Clean', 'Date'], keep='first').drop(columns=['_end', '_span']).reset_index(drop=True)
+
+def empty_hmu_frame():
+    return pd.DataFrame(columns=['Unit_Clean', 'Date'] + list(HMU_COLUMNS.values()) + ['Source_File', 'Range_Start', 'Range_End'])
+
+def combine_hmu_frames(names, frames):
+    # Tandai asal file & rentang laporan (dari nama file, cadangan = tanggal min/max isinya), lalu deduplikasi
+    list_hmu = []
+    unparsed_dates = {}
+    for name in names:
+        range_start, range_end = parse_report_range(name)
+        df_f = frames[name]
+        if df_f.attrs.get('unparsed_dates', 0): unparsed_dates[os.path.basename(name)] = df_f.attrs['unparsed_dates']
+        if df_f.empty: continue
+        list_hmu.append(df_f.assign(Source_File=os.path.splitext(os.path.basename(name))[0],
+                                    Range_Start=range_start if pd.notna(range_start) else df_f['Date'].min(),
+                                    Range_End=range_end if pd.notna(range_end) else df_f['Date'].max()))
+    if not list_hmu: return empty_hmu_frame(), {'unparsed_dates': unparsed_dates}
+
+    df_all = pd.concat(list_hmu, ignore_index=True)
+    df_hmu = dedupe_overlapping(df_all)
+    return df_hmu, {'rows': len(df_all), 'duplicates_removed': len(df_all) - len(df_hmu), 'unparsed_dates': unparsed_dates}
+
+def load_hmu_reports(base_folder, cache_dir=HMU_CACHE_DIR, max_workers=None, files=None, progress=None):
+    files = find_hmu_files(base_folder) if files is None else files
+    if not files: return empty_hmu_frame(), {'files': 0, 'from_cache': 0, 'read': 0}
+
+    cache_files = {f: cache_path_for(hash_path(f), cache_dir) if cache_dir and PARQUET_TERSEDIA else None for f in files}
+    frames = {f: pd.read_parquet(c) for f, c in cache_files.items() if c and os.path.exists(c)}
+    to_read = [f for f in files if f not in frames]
+
+    # File yang belum ada di cache dibaca paralel (openpyxl terikat CPU, sehingga memakai proses, bukan thread).
+    # File yang gagal dibaca (rusak / bukan xlsx) dilewati dan dicatat, tidak menggagalkan file lainnya.
+    failed = {}
+    if to_read:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(read_and_cache_hmu_file, f, cache_files[f]): f for f in to_read}
+            for done, future in enumerate(as_completed(futures), start=len(files) - len(to_read) + 1):
+                try: frames[futures[future]] = future.result()
+                except Exception as e: failed[os.path.basename(futures[future])] = str(e)
+                if progress is not None: progress(done, len(files))
+
+    df_hmu, stats = combine_hmu_frames([f for f in files if f in frames], frames)
+    return df_hmu, {'files': len(files), 'from_cache': len(files) - len(to_read), 'read': len(to_read) - len(failed), 'failed': failed, **stats}
+
+def load_hmu_uploads(uploads, cache_dir=HMU_CACHE_DIR, progress=None):
+    # uploads = [(nama file, bytes)] dari dashboard; dibaca berurutan karena sudah berjalan di thread job.
+    # progress(file selesai, jumlah file) dipanggil setelah setiap file
+    frames, from_cache, failed = {}, 0, {}
+    for done, (name, data) in enumerate(uploads, start=1):
+        cache_file = cache_path_for(abbm.hash_file_bytes(io.BytesIO(data)), cache_dir) if cache_dir and PARQUET_TERSEDIA else None
+        if cache_file and os.path.exists(cache_file):
+            frames[name] = pd.read_parquet(cache_file); from_cache += 1
+        else:
+            try: frames[name] = read_and_cache_hmu_file(io.BytesIO(data), cache_file, name)
+            except Exception as e: failed[os.path.basename(name)] = str(e)
+        if progress is not None: progress(done, len(uploads))
+
+    names = [name for name, _ in uploads]
+    if not names: return empty_hmu_frame(), {'files': 0, 'from_cache': 0, 'read': 0}
+    df_hmu, stats = combine_hmu_frames([name for name in names if name in frames], frames)
+    return df_hmu, {'files': len(names), 'from_cache': from_cache, 'read': len(names) - from_cache - len(failed), 'failed': failed, **stats}
+
+# ==============================================================================
+# 5. REKONSILIASI HM TRANSAKSI BBM vs LAPORAN HMU CABANG
+# ==============================================================================
+# Setiap pembacaan HM pada transaksi BBM (HM > 0) dipasangkan dengan pembacaan HMU unit yang sama pada
+# tanggal yang sama, sehari sebelum, atau sehari sesudahnya (as-of join ke dua arah), lalu dipilih kandidat
+# dengan selisih terkecil sehingga salah ketik tanggal satu hari tidak dihitung sebagai selisih HM.
+# Nama unit kedua sumber disamakan dengan abbm.clean_unit_name (huruf & angka saja).
+REKON_TOLERANSI_HARI = 1
+REKON_TOLERANSI_JAM = 1.0
+REKON_CONFIG_VERSION = (HMU_PARSER_VERSION, REKON_TOLERANSI_HARI, REKON_TOLERANSI_JAM)
+
+STATUS_REKON_COCOK = "COCOK"
+STATUS_REKON_BBM_LEBIH = "BBM > HMU"
+STATUS_REKON_HMU_LEBIH = "HMU > BBM"
+STATUS_REKON_TANPA_HMU = "TIDAK ADA HMU"
+STATUS_REKON = [STATUS_REKON_COCOK, STATUS_REKON_BBM_LEBIH, STATUS_REKON_HMU_LEBIH, STATUS_REKON_TANPA_HMU]
+
+def unit_keys(names):
+    unique_names = pd.unique(names)
+    return names.map(dict(zip(unique_names, map(abbm.clean_unit_name, unique_names))))
+
+def hmu_readings(df_hmu):
+    df_ref = pd.DataFrame({'Unit_Key': unit_keys(df_hmu['Unit_Clean']).to_numpy(), 'Tanggal_HMU': df_hmu['Date'].to_numpy(), 'HMU': df_hmu['HMU'].to_numpy(dtype=np.float64)})
+    df_ref = df_ref[df_ref['Unit_Key'] != ''].drop_duplicates(['Unit_Key', 'Tanggal_HMU'], keep='last')
+    return df_ref.sort_values('Tanggal_HMU', kind='stable').reset_index(drop=True)
+
+def asof_hmu(df_left, df_ref, direction, toleransi_hari, allow_exact_matches=True):
+    # df_left sudah terurut per Date; hasil sejajar dengan urutan baris df_left
+    return pd.merge_asof(df_left[['Unit_Key', 'Date']], df_ref, left_on='Date', right_on='Tanggal_HMU', by='Unit_Key',
+                         direction=direction, tolerance=pd.Timedelta(days=toleransi_hari), allow_exact_matches=allow_exact_matches)
+
+def reconcile_hm(df_daily, df_hmu, toleransi_hari=REKON_TOLERANSI_HARI, toleransi_jam=REKON_TOLERANSI_JAM):
+    df_bbm = df_daily.loc[df_daily['HM'] > 0, ['Unit_Name', 'Lokasi', 'Jenis_Alat', 'Date', 'HM']]
+    df_bbm = df_bbm.assign(Unit_Key=unit_keys(df_bbm['Unit_Name'])).sort_values('Date', kind='stable').reset_index(drop=True)
+    df_ref = hmu_readings(df_hmu)
+
+    # Kandidat: tanggal sama, hari sebelumnya, hari sesudahnya (urutan ini = prioritas bila selisihnya sama)
+    kandidat = [asof_hmu(df_bbm, df_ref, 'backward', 0)] + [asof_hmu(df_bbm, df_ref, d, toleransi_hari, allow_exact_matches=False) for d in ['backward', 'forward']]
+    hmu_val = np.column_stack([k['HMU'].to_numpy(dtype=np.float64) for k in kandidat])
+    tgl_val = np.column_stack([k['Tanggal_HMU'].to_numpy(dtype='datetime64[ns]') for k in kandidat])
+
+    selisih = df_bbm['HM'].to_numpy(dtype=np.float64)[:, None] - hmu_val
+    pilih = np.argmin(np.where(np.isnan(selisih), np.inf, np.abs(selisih)), axis=1)
+    baris = np.arange(len(df_bbm))
+    ada_hmu = ~np.isnan(hmu_val[baris, pilih])
+
+    df_rekon = df_bbm.drop(columns='Unit_Key').rename(columns={'HM': 'HM_BBM'})
+    df_rekon['HMU'] = hmu_val[baris, pilih]
+    df_rekon['Tanggal_HMU'] = tgl_val[baris, pilih]
+    df_rekon['Geser_Hari'] = (df_rekon['Tanggal_HMU'] - df_rekon['Date']).dt.days.astype('Int64')
+    df_rekon['Selisih_HM'] = selisih[baris, pilih]
+    df_rekon['Status_Rekon'] = np.select(
+        [~ada_hmu, np.abs(df_rekon['Selisih_HM']) <= toleransi_jam, df_rekon['Selisih_HM'] > 0],
+        [STATUS_REKON_TANPA_HMU, STATUS_REKON_COCOK, STATUS_REKON_BBM_LEBIH], STATUS_REKON_HMU_LEBIH)
+    df_rekon = df_rekon.sort_values(['Unit_Name', 'Date'], kind='stable').reset_index(drop=True)
+
+    # Ringkasan per unit: jumlah per status + besar selisih pada pembacaan yang punya pasangan HMU
+    df_summary = pd.crosstab(df_rekon['Unit_Name'], df_rekon['Status_Rekon']).reindex(columns=STATUS_REKON, fill_value=0)
+    df_summary.columns = ['Cocok', 'BBM_Lebih_Besar', 'HMU_Lebih_Besar', 'Tanpa_HMU']
+    df_summary.insert(0, 'Pembacaan_HM_BBM', df_summary.sum(axis=1))
+    terpasang = df_rekon[df_rekon['Status_Rekon'] != STATUS_REKON_TANPA_HMU]
+    abs_selisih = terpasang['Selisih_HM'].abs().groupby(terpasang['Unit_Name'])
+    df_summary['Persen_Cocok'] = (100 * df_summary['Cocok'] / (df_summary['Pembacaan_HM_BBM'] - df_summary['Tanpa_HMU']).where(lambda n: n > 0)).round(1)
+    df_summary['Selisih_Median'] = terpasang.groupby('Unit_Name')['Selisih_HM'].median().round(1)
+    df_summary['Selisih_Abs_Maks'] = abs_selisih.max().round(1)
+    df_summary = df_summary.rename_axis(columns=None).reset_index()
+    df_summary = df_summary.merge(df_rekon.drop_duplicates('Unit_Name')[['Unit_Name', 'Lokasi', 'Jenis_Alat']], on='Unit_Name', how='left')
+    return df_rekon, df_summary
+
+# ==============================================================================
+# 6. JAM KERJA DARI LAPORAN HMU SEBAGAI SUMBER UTAMA FUEL RATIO
+# ==============================================================================
+# Delta_HM harian dihitung ulang dari pembacaan HMU (as-of ke belakang, toleransi 1 hari) dengan aturan yang
+# sama seperti pipeline BBM (selisih antar pembacaan, < 0 atau > 100 jam dianggap 0). Selisih HMU hanya dipakai
+# bila baris unit sebelumnya juga punya pembacaan HMU baru, sehingga rantai selisih tidak pernah melompati hari
+# yang jamnya sudah dihitung dari BBM. Hari tanpa pembacaan baru (di luar cakupan laporan, atau hanya membawa
+# pembacaan hari sebelumnya dalam toleransi) tetap memakai Delta_HM dari transaksi BBM.
+def apply_hmu_hours(df_daily, df_hmu, toleransi_hari=REKON_TOLERANSI_HARI):
+    df_out = df_daily.sort_values(['Unit_Name', 'Date'], kind='stable').reset_index(drop=True)
+    df_left = pd.DataFrame({'Unit_Key': unit_keys(df_out['Unit_Name']), 'Date': df_out['Date']})
+    urut = np.argsort(df_left['Date'].to_numpy(), kind='stable')
+
+    cocok = asof_hmu(df_left.iloc[urut], hmu_readings(df_hmu), 'backward', toleransi_hari)
+    hm_hmu, tgl_hmu = np.full(len(df_out), np.nan), np.full(len(df_out), np.datetime64('NaT'), dtype='datetime64[ns]')
+    hm_hmu[urut] = cocok['HMU'].to_numpy(dtype=np.float64)
+    tgl_hmu[urut] = cocok['Tanggal_HMU'].to_numpy(dtype='datetime64[ns]')
+    hm_hmu, tgl_hmu = pd.Series(hm_hmu, index=df_out.index), pd.Series(tgl_hmu, index=df_out.index)
+
+    # Pembacaan baru = ada HMU dan tanggal pembacaannya berbeda dari baris unit sebelumnya (bukan bawaan toleransi)
+    unit = df_out['Unit_Name']
+    tgl_sebelum = tgl_hmu.groupby(unit).shift()
+    baru = tgl_hmu.notna() & (tgl_hmu != tgl_sebelum)
+    pakai_hmu = baru & baru.groupby(unit).shift(fill_value=False)
+    delta = hm_hmu.groupby(unit).diff()
+    delta = delta.where((delta >= 0) & (delta <= 100), 0)
+
+    df_out['HM_HMU'] = hm_hmu
+    df_out['Delta_HM_BBM'] = df_out['Delta_HM']
+    df_out['Delta_HM'] = delta.where(pakai_hmu, df_out['Delta_HM'])
+    df_out['Sumber_HM'] = np.where(pakai_hmu, 'HMU', 'BBM')
+    return df_out
+
+def trend_from_daily(df_daily):
+    trend_monthly = df_daily.groupby(['Unit_Name', df_daily['Date'].dt.to_period('M').astype(str).rename('Bulan')]).agg({'LITER': 'sum', 'Delta_HM': 'sum'}).reset_index()
+    trend_monthly['Fuel_Ratio'] = np.where(trend_monthly['Delta_HM'] > 0, trend_monthly['LITER'] / trend_monthly['Delta_HM'].where(trend_monthly['Delta_HM'] > 0), 0)
+    return trend_monthly
+
+def recompute_with_hmu_hours(df_daily, df_hmu, toleransi_hari=REKON_TOLERANSI_HARI):
+    # Keluaran setara process_raw_data: (unit aktif, unit inaktif, tren bulanan, data harian)
+    df_daily_hmu = apply_hmu_hours(df_daily, df_hmu, toleransi_hari)
+    df_active, df_inactive = abbm.compute_benchmark(df_daily_hmu)
+    return df_active, df_inactive, trend_from_daily(df_daily_hmu), df_daily_hmu
@@ -0,0 +1,311 @@
+import pandas as pd
+import numpy as np
+import re
+from typing import NamedTuple
+
+# ==============================================================================
+# 1. KONFIGURASI (DIPINDAH DARI summaryABCabang.ipynb)
+# ==============================================================================
+# Urutan 46 cabang ini sama dengan urutan singkatan pada blok pertama file (AMB, ARA, BAU, ...)
+FULL_BRANCH_NAMES = [
+    "AMBON", "ARAR", "BAU BAU", "BIAK", "BITUNG", "BENGKULU", "BUNGKU", "BATULICIN", "BELAWAN",
+    "BANJARMASIN", "BOEPINANG", "BALIKPAPAN", "BERAU", "BANDA ACEH", "BATAM", "BUATAN", "DOBO",
+    "FAK FAK", "GORONTALO", "JAKARTA", "JAYAPURA", "KAIMANA", "KENDARI", "KETAPANG", "KUALA TANJUNG",
+    "MERAUKE", "MAKASSAR", "MANOKWARI", "NABIRE", "NUNUKAN", "PALU", "PADANG", "PALEMBANG",
+    "PONTIANAK", "PERAWANG", "SURABAYA", "SAMARINDA", "SEMARANG", "SAMPIT", "SORONG", "SERUI",
+    "TANGKIANG", "TIMIKA", "TARAKAN", "TERNATE", "TUAL"
+]
+ADDITIONAL_BRANCHES = ["MERAK", "MARUNI", "OKI"]
+PROCESSING_BRANCH_LIST = FULL_BRANCH_NAMES + ADDITIONAL_BRANCHES
+MANUAL_BRANCH_MAP = {'MRK': 'MERAK', 'MRN': 'MARUNI', 'OKI': 'OKI'}
+
+TARGET_STATUSES = ['FXD', 'FAC', 'STR', 'MTA', 'MAS', 'MTB', 'FTL', 'FOB', 'MXD', 'MTL', 'MOB', 'FIT', 'MIT']
+DOUBLE_COUNT_STATUSES = ['FAC', 'MAS']
+
+# Mapping Ukuran Container (10 CO/DC -> 20 Feet)
+SIZE_MAP = {
+    # 20 Feet
+    '20 CO': '20 Feet', '20 DC': '20 Feet', '20 RH': '20 Feet', '20 RM': '20 Feet', '21 DC': '20 Feet',
+    '20 FT': '20 Feet', '20 HC': '20 Feet', '20 IT': '20 Feet', '20 OT': '20 Feet', '20 RF': '20 Feet',
+    '10 CO': '20 Feet', '10 DC': '20 Feet',
+    # 40 Feet
+    '40 FT': '40 Feet', '40 HC': '40 Feet', '40 RH': '40 Feet', '40 RM': '40 Feet',
+    '40 CO': '40 Feet', '40 DC': '40 Feet', '40 IT': '40 Feet', '40 OT': '40 Feet', '40 RF': '40 Feet',
+    '41 DC': '40 Feet', '45 HC': '40 Feet'
+}
+SIZE_ORDER = ['20 Feet', '40 Feet']
+
+MONTH_MAP = {
+    'Jan': 'Januari', 'Feb': 'Februari', 'Mar': 'Maret', 'Apr': 'April', 'May': 'Mei', 'Jun': 'Juni',
+    'Jul': 'Juli', 'Aug': 'Agustus', 'Sep': 'September', 'Oct': 'Oktober', 'Nov': 'November', 'Dec': 'Desember'
+}
+MONTH_ORDER = list(MONTH_MAP.values())
+
+# Versi parser + konfigurasi; ikut menjadi kunci cache bersama hash isi file (sama seperti pipeline BBM)
+PARSER_VERSION = 1
+CONFIG_VERSION = (PARSER_VERSION, tuple(TARGET_STATUSES), tuple(sorted(SIZE_MAP.items())))
+
+# ==============================================================================
+# 2. PARSER BLOK CURRSTATE / ROW LABELS (SATU KALI LEWAT, STATE MACHINE)
+# ==============================================================================
+# Struktur setiap blok pivot pada sheet:
+#   CURRSTATE   | <status>          <- awal blok
+#   PREV_STATE  | <status sebelumnya>
+#   ...
+#               | <ownership> ...   <- 2 baris sebelum Row Labels
+#               | <bulan> ...       <- 1 baris sebelum Row Labels
+#   Row Labels  | <tipe container>  <- header kolom
+#   <cabang>    | <jumlah> ...      <- baris data sampai CURRSTATE berikutnya
+# Baris dibaca berurutan sekali saja; metadata kolom diambil dari dua baris terakhir yang disimpan.
+class BranchRecord(NamedTuple):
+    branch: str
+    status: str
+    prev_status: str
+    size: str
+    month: str
+    count: float
+
+def _is_empty(val):
+    return val is None or (isinstance(val, float) and np.isnan(val))
+
+def _build_col_map(ownership_row, month_row, type_row):
+    col_map = []
+    curr_own, curr_mon = None, None
+    for c in range(1, len(type_row)):
+        if c < len(ownership_row) and not _is_empty(ownership_row[c]): curr_own = ownership_row[c]
+        if c < len(month_row) and not _is_empty(month_row[c]): curr_mon = month_row[c]
+        if not _is_empty(type_row[c]):
+            col_map.append((c, curr_own, curr_mon, type_row[c]))
+    return col_map
+
+def new_parse_meta():
+    # blocks: (status, prev_status) tiap blok sesuai urutan file; branch_abbr: nama cabang -> singkatan;
+    # skipped: cabang / tipe container / bulan yang tidak dikenali (tidak masuk perhitungan)
+    return {'blocks': [], 'branch_abbr': {}, 'skipped': {'branch': set(), 'container_type': set(), 'month': set()}}
+
+def iter_branch_records(rows, meta=None):
+    meta = new_parse_meta() if meta is None else meta
+    skipped = meta['skipped']
+
+    state = 'SEEK'
+    status = prev_status = None
+    buffer = []
+    col_map = []
+    block1_map = {}
+    first_header_seen = False
+    in_first_block = False
+    first_block_pos = 0
+
+    for row in rows:
+        label = row[0] if len(row) else None
+
+        if label == 'CURRSTATE':
+            state, status, prev_status, buffer = 'META', row[1], None, []
+            in_first_block = False
+            continue
+
+        if state == 'META':
+            if label == 'PREV_STATE':
+                prev_status = row[1]
+            if label == 'Row Labels':
+                ownership_row = buffer[-2] if len(buffer) >= 2 else ()
+                month_row = buffer[-1] if buffer else ()
+                col_map = _build_col_map(ownership_row, month_row, row)
+                if status in TARGET_STATUSES: meta['blocks'].append((status, prev_status))
+                # Blok pertama menjadi acuan singkatan cabang (posisi ke-i -> FULL_BRANCH_NAMES[i])
+                in_first_block, first_block_pos = not first_header_seen, 0
+                first_header_seen = True
+                state = 'DATA'
+            else:
+                buffer = (buffer + [row])[-2:]
+            continue
+
+        if state != 'DATA': continue
+
+        if in_first_block and first_block_pos < len(FULL_BRANCH_NAMES):
+            if not _is_empty(label): block1_map[label] = FULL_BRANCH_NAMES[first_block_pos]
+            first_block_pos += 1
+            if first_block_pos == len(FULL_BRANCH_NAMES):
+                meta['branch_abbr'].update({v: k for k, v in {**block1_map, **MANUAL_BRANCH_MAP}.items()})
+
+        if _is_empty(label) or str(label).lower() == 'grand total': continue
+        if status not in TARGET_STATUSES: continue
+
+        branch = MANUAL_BRANCH_MAP.get(label) or block1_map.get(label) or (label if label in PROCESSING_BRANCH_LIST else None)
+        if branch is None:
+            skipped['branch'].add(label)
+            continue
+
+        for c, _, month_raw, ctype in col_map:
+            val = row[c] if c < len(row) else None
+            if _is_empty(val) or val == 0: continue
+            size, month = SIZE_MAP.get(ctype), MONTH_MAP.get(month_raw)
+            if size is None or month is None:
+                skipped['container_type' if size is None else 'month'].add(ctype if size is None else month_raw)
+                continue
+            yield BranchRecord(branch, status, prev_status, size, month, val)
+
+def iter_workbook_rows(file_obj, sheet_name=None):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_obj, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        yield from worksheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def read_branch_records(file_obj, sheet_name=None):
+    meta = new_parse_meta()
+    records = list(iter_branch_records(iter_workbook_rows(file_obj, sheet_name), meta))
+    if not meta['branch_abbr']: meta['branch_abbr'].update({v: k for k, v in MANUAL_BRANCH_MAP.items()})
+    df_records = pd.DataFrame.from_records(records, columns=BranchRecord._fields)
+    df_records['branch'] = pd.Categorical(df_records['branch'], categories=PROCESSING_BRANCH_LIST)
+    df_records['status'] = pd.Categorical(df_records['status'], categories=TARGET_STATUSES)
+    df_records['size'] = pd.Categorical(df_records['size'], categories=SIZE_ORDER)
+    df_records['month'] = pd.Categorical(df_records['month'], categories=MONTH_ORDER, ordered=True)
+    df_records['count'] = pd.to_numeric(df_records['count'])
+    return df_records, meta
+
+def split_status_labels(df_records, blocks):
+    # Status yang muncul di lebih dari satu blok dipecah menjadi "CURR (PREV)"; urutan kolom mengikuti
+    # TARGET_STATUSES lalu urutan kemunculan blok di file
+    jumlah_blok = pd.Series([b[0] for b in blocks]).value_counts().to_dict()
+    def label(status, prev_status): return f"{status} ({prev_status})" if jumlah_blok.get(status, 0) > 1 else status
+    column_order = [label(s, p) for base in TARGET_STATUSES for s, p in blocks if s == base]
+    labels = [label(s, p) for s, p in zip(df_records['status'].astype(str), df_records['prev_status'])]
+    return pd.Series(labels, index=df_records.index, name='status_split'), column_order
+
+# ==============================================================================
+# 3. AGREGASI CABANG × BULAN × STATUS × UKURAN (SATU KALI GROUPBY)
+# ==============================================================================
+# Seluruh kombinasi dihitung dalam satu groupby lalu di-unstack menjadi tabel lebar
+# [(cabang, bulan) × (status, ukuran)]; sheet tiap cabang cukup mengiris baris cabangnya.
+SHEET_WORKERS = 4
+
+def aggregate_branch_summary(df_records, status_labels=None):
+    status = df_records['status'].astype(str) if status_labels is None else status_labels
+    # FAC & MAS dihitung dua kali (sama dengan perkalian setelah agregasi di notebook)
+    count = df_records['count'].where(~df_records['status'].isin(DOUBLE_COUNT_STATUSES), df_records['count'] * 2)
+    keys = [df_records['branch'].astype(str).rename('Cabang'), df_records['month'].astype(str).rename('Bulan'),
+            status.astype(str).rename('Status'), df_records['size'].astype(str).rename('Ukuran')]
+    return count.groupby(keys).sum().unstack(['Status', 'Ukuran'])
+
+def branch_sheet_table(df_wide, branch, status_order=TARGET_STATUSES):
+    if branch in df_wide.index.get_level_values('Cabang'):
+        df_branch = df_wide.xs(branch, level='Cabang').dropna(axis=1, how='all').reindex(MONTH_ORDER)
+    else:
+        df_branch = pd.DataFrame(index=MONTH_ORDER)
+
+    sorted_cols = [(status, size) for status in status_order for size in SIZE_ORDER if (status, size) in df_branch.columns]
+    df_final = df_branch.reindex(columns=pd.MultiIndex.from_tuples(sorted_cols) if sorted_cols else [])
+    df_final[('Total', '')] = df_final.sum(axis=1)
+    row_total = df_final.sum(axis=0)
+    row_total.name = 'Grand Total'
+    return pd.concat([df_final, row_total.to_frame().T])
+
+def write_branch_summary(df_wide, output_path, status_order=TARGET_STATUSES, branch_abbr=None, branches=PROCESSING_BRANCH_LIST):
+    import xlsxwriter
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Tabel tiap cabang disiapkan paralel; penulisan sheet tetap berurutan karena satu workbook
+    # xlsxwriter tidak aman ditulis dari beberapa thread sekaligus
+    with ThreadPoolExecutor(max_workers=SHEET_WORKERS) as executor:
+        tables = list(executor.map(lambda b: branch_sheet_table(df_wide, b, status_order), branches))
+
+    branch_abbr = branch_abbr or {}
+    workbook = xlsxwriter.Workbook(output_path, {'nan_inf_to_errors': True})
+    header_format = workbook.add_format({'bold': True, 'align': 'center', 'valign': 'vcenter', 'border': 1, 'bg_color': '#D9E1F2'})
+    cell_format = workbook.add_format({'border': 1})
+    total_format = workbook.add_format({'bold': True, 'border': 1, 'bg_color': '#FFF2CC'})  # Kuning muda untuk total
+
+    for branch, df_final in zip(branches, tables):
+        worksheet = workbook.add_worksheet(branch[:31])
+
+        # Metadata cabang + singkatan
+        worksheet.write(1, 1, "Cabang", header_format)
+        worksheet.write(1, 2, branch, header_format)
+        worksheet.write(1, 3, branch_abbr.get(branch, "-"), header_format)
+
+        worksheet.write(2, 0, "Bulan", header_format)
+        worksheet.write(2, 1, "Status Container", header_format)
+        worksheet.write(3, 1, "Ukuran Container", header_format)
+
+        n_bulan = len(df_final) - 1
+        worksheet.write_column(4, 0, list(df_final.index[:n_bulan]), cell_format)
+        worksheet.write(4 + n_bulan, 0, 'Grand Total', total_format)
+
+        for col_idx, (status_lbl, size_lbl) in enumerate(df_final.columns, start=1):
+            is_total_col = status_lbl == 'Total'
+            worksheet.write(2, col_idx, status_lbl, total_format if is_total_col else header_format)
+            worksheet.write(3, col_idx, size_lbl, total_format if is_total_col else header_format)
+
+            vals = df_final.iloc[:, col_idx - 1].to_numpy(dtype=np.float64)
+            body = np.where(np.isnan(vals[:n_bulan]) | (vals[:n_bulan] == 0), 0 if is_total_col else "", vals[:n_bulan].astype(object))
+            worksheet.write_column(4, col_idx, body.tolist(), total_format if is_total_col else cell_format)
+            worksheet.write(4 + n_bulan, col_idx, 0 if np.isnan(vals[n_bulan]) else vals[n_bulan], total_format)
+
+    workbook.close()
+    return output_path
+
+# ==============================================================================
+# 4. EFISIENSI BBM PER CONTAINER (GABUNGAN DENGAN PIPELINE BBM)
+# ==============================================================================
+# Lokasi unit pada master BBM berupa nama cabang atau nama depo. Nama yang sama dengan cabang (tanpa awalan
+# DEPO/CABANG & tanda baca, mis. BAU-BAU = BAU BAU) langsung dipakai; depo dipetakan ke cabang induknya
+# sesuai kolom PORT pada laporan HMU cabang (DEPO MARUNDA = JKT, DEPO T.LANGON = SBY, dst.).
+# File summary container hanya berisi nama bulan, sehingga tahunnya diambil dari CONTAINER_TAHUN.
+CONTAINER_TAHUN = 2025
+LOKASI_BRANCH_MAP = {
+    'DEPO MARUNDA': 'JAKARTA', 'DEPO PRIOK': 'JAKARTA', 'DEPO MM': 'JAKARTA',
+    'BKA': 'SURABAYA', 'DEPO 4': 'SURABAYA', 'DEPO 9': 'SURABAYA', 'DEPO JAPFA': 'SURABAYA', 'DEPO T.LANGON': 'SURABAYA',
+    'DEPO TELUK BAYUR': 'SURABAYA', 'DEPO YONIF': 'SURABAYA', 'TERMINAL TELUK LAMONG': 'SURABAYA',
+}
+# Liter dibagi ke ukuran container menurut TEU: satu container 40 Feet = dua kali jatah container 20 Feet
+TEU_PER_UKURAN = {'20 Feet': 1, '40 Feet': 2}
+
+def _branch_key(name):
+    return re.sub(r'[^A-Z0-9]', '', str(name).upper())
+
+def align_lokasi_to_branch(lokasi, branches=PROCESSING_BRANCH_LIST):
+    branch_by_key = {_branch_key(b): b for b in branches}
+    def cabang(nama):
+        nama = str(nama).strip().upper()
+        if nama in LOKASI_BRANCH_MAP: return LOKASI_BRANCH_MAP[nama]
+        return branch_by_key.get(_branch_key(re.sub(r'^(DEPO|CABANG)\s+', '', nama)))
+    lokasi = pd.Series(lokasi)
+    unique_lokasi = lokasi.unique()
+    return lokasi.map(dict(zip(unique_lokasi, map(cabang, unique_lokasi))))
+
+def container_moves(df_wide, tahun=CONTAINER_TAHUN):
+    # Total container semua status per cabang & bulan, dipisah 20/40 Feet (sama dengan kolom Total per sheet)
+    moves = df_wide.T.groupby(level='Ukuran').sum().T.reindex(columns=SIZE_ORDER).fillna(0)
+    bulan = {nama: f"{tahun}-{i:02d}" for i, nama in enumerate(MONTH_ORDER, start=1)}
+    moves.index = pd.MultiIndex.from_arrays([moves.index.get_level_values('Cabang'), moves.index.get_level_values('Bulan').map(bulan)], names=['Cabang', 'Bulan'])
+    return moves.rename_axis(columns=None)
+
+def _fuel_ratios(df_eff):
+    teu = sum(df_eff[size] * n for size, n in TEU_PER_UKURAN.items())
+    df_eff['Total_Container'] = df_eff[SIZE_ORDER].sum(axis=1)
+    df_eff['TEU'] = teu
+    df_eff['Liter_per_Container'] = df_eff['Liter'] / df_eff['Total_Container'].where(df_eff['Total_Container'] > 0)
+    df_eff['Liter_per_TEU'] = df_eff['Liter'] / teu.where(teu > 0)
+    for size, n in TEU_PER_UKURAN.items(): df_eff[f"Liter_per_Container_{size.split()[0]}"] = df_eff['Liter_per_TEU'] * n
+    return df_eff
+
+def fuel_per_container(df_liter, df_moves):
+    # df_liter: Lokasi, Bulan (YYYY-MM), LITER dari pipeline BBM; df_moves: hasil container_moves
+    cabang = align_lokasi_to_branch(df_liter['Lokasi'].to_numpy())
+    cocok = cabang.notna().to_numpy()
+    unmatched = df_liter[~cocok].groupby('Lokasi')['LITER'].sum()
+
+    liter = df_liter[cocok].groupby([cabang[cocok].to_numpy(), df_liter.loc[cocok, 'Bulan'].to_numpy()])['LITER'].sum()
+    liter.index.names = ['Cabang', 'Bulan']
+    df_eff = liter.rename('Liter').to_frame().join(df_moves, how='left').fillna({size: 0 for size in SIZE_ORDER})
+    df_eff = _fuel_ratios(df_eff[df_eff['Liter'] > 0].copy()).reset_index()
+    return df_eff, unmatched[unmatched > 0]
+
+def fuel_per_container_total(df_eff):
+    # Total rentang per cabang: rasio dihitung ulang dari jumlah liter & container, bukan rata-rata rasio bulanan
+    df_total = df_eff.groupby('Cabang')[['Liter'] + SIZE_ORDER].sum()
+    return _fuel_ratios(df_total).reset_index()